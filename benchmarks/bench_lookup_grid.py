@@ -0,0 +1,103 @@
+"""
+参照テーブル（LookupGrid）のベンチマーク
+
+ルール定義の関数を1回ずつ呼び出す従来の計算方法と、
+参照テーブルを使用するrpa_engine.compute、rpa_vector.compute_arraysの処理速度を比較します。
+
+使用方法:
+    python benchmarks/bench_lookup_grid.py [--rows 200000] [--seed 0]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import rpa_engine  # noqa: E402
+from workloads import calc_rows  # noqa: E402
+
+
+def compute_by_rules(machine, shelf_count, inch, height):
+    """従来の計算方法（ルール定義の関数を毎回呼び出す）"""
+    rules = rpa_engine.current_rules()
+    rpa_engine.validate_height(height, rules)
+    machine_info = rules.machine_data[machine]
+    ring_count = machine_info["rings"][machine_info["inches"].index(inch)]
+    chain_data = machine_info["chain_data"]
+    data1 = machine_info["data1"]
+    A = ((shelf_count * ring_count - data1) / 2 * chain_data) + 60
+    A1 = (shelf_count * ring_count - data1) / 2 * chain_data
+    if machine in ["350", "351"]:
+        D = rpa_engine.calculate_c_value(rules, machine, height, inch) - 160
+        C = rpa_engine.calculate_d_value(rules, machine, height) - 160
+    else:
+        C = rpa_engine.calculate_c_value(rules, machine, height, inch)
+        D = rpa_engine.calculate_d_value(rules, machine, height)
+    H = rpa_engine.calculate_h_value(rules, machine, inch)
+    if machine in ["350", "351"]:
+        terms = rpa_engine.chain_b_terms(machine, inch, height, C, D, H)
+        B = A - terms[0] - terms[1] - terms[2] - terms[3] - terms[4]
+    else:
+        B = rpa_engine.calculate_b_value(rules, machine, height)
+    ST = A1 - machine_info["st"]
+    return rpa_engine.CalcResult(
+        machine,
+        shelf_count,
+        inch,
+        height,
+        ring_count,
+        chain_data,
+        data1,
+        max(0, A),
+        A1,
+        max(0, B),
+        max(0, C),
+        max(0, D),
+        max(0, H),
+        max(0, ST),
+        machine_info["elb"],
+        machine_info["elc"],
+        machine_info["erb"],
+        machine_info["erc"],
+        machine_info["er"],
+        machine_info["el"],
+    )
+
+
+def measure(label, func, count):
+    """関数を実行して所要時間と1秒あたりの件数を表示"""
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {elapsed * 1000:>10.1f} ms  {count / elapsed:>14,.0f} 件/秒")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="参照テーブルのベンチマーク")
+    parser.add_argument("--rows", type=int, default=200000, help="計算する行数")
+    parser.add_argument("--seed", type=int, default=0, help="乱数シード")
+    args = parser.parse_args()
+
+    rows = calc_rows(args.rows, args.seed)
+    print(f"行数: {args.rows:,}")
+
+    baseline = measure("従来（関数呼び出し）", lambda: [compute_by_rules(*row) for row in rows], args.rows)
+    grid = measure("compute（参照テーブル）", lambda: [rpa_engine.compute(*row) for row in rows], args.rows)
+    print(f"  → 高速化: {baseline / grid:.2f}倍")
+
+    try:
+        import rpa_vector
+    except ImportError:
+        print("numpyがインストールされていないため、compute_arraysの計測を省略します")
+        return
+
+    columns = [list(column) for column in zip(*rows)]
+    vector = measure("compute_arrays（一括）", lambda: rpa_vector.compute_arrays(*columns), args.rows)
+    print(f"  → 高速化: {baseline / vector:.2f}倍")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""
+計算サービス（rpa_server）の負荷試験
+
+指定した数の接続（キープアライブ）から一定時間リクエストを送り続け、
+処理量（リクエスト/秒、バッチの場合は件/秒）と応答時間（p50、p99、最大）を表示します。
+入力はworkloads.calc_rowsで生成した有効な計算の入力です。
+
+--min-rpsを指定すると、処理量がそれを下回った場合に終了コード1を返します。
+
+使用方法:
+    python benchmarks/bench_server.py --start-server
+    python benchmarks/bench_server.py --port 8765 --connections 32 --duration 30
+    python benchmarks/bench_server.py --start-server --batch 100 --min-rps 2000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARK_DIR)
+sys.path.insert(0, REPO_DIR)
+
+from run_benchmarks import percentile  # noqa: E402
+from workloads import calc_rows  # noqa: E402
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_CONNECTIONS = 16
+DEFAULT_DURATION = 10.0
+DEFAULT_WARMUP = 1.0
+
+# 生成する入力の種類（実際の入力と同じく、同じ組み合わせが繰り返される）
+DISTINCT_INPUTS = 500
+
+# --start-serverでサービスの起動を待つ時間（秒）
+SERVER_START_TIMEOUT = 30.0
+
+
+def build_requests(host, port, batch, count=DISTINCT_INPUTS, seed=0):
+    """
+    送信するリクエスト（バイト列）の一覧
+
+    Args:
+        host (str): Hostヘッダー
+        port (int): ポート番号
+        batch (int): 0の場合は/calculate、1以上の場合は1リクエストあたりの件数（/calculate/batch）
+        count (int): 生成する入力の数
+        seed (int): 乱数シード
+
+    Returns:
+        list: リクエストのバイト列
+    """
+    items = [
+        {"machine": machine, "shelf_count": shelf_count, "inch": inch, "height": height}
+        for machine, shelf_count, inch, height in calc_rows(count, seed)
+    ]
+    if batch:
+        path = "/calculate/batch"
+        bodies = [{"items": [items[(start + offset) % count] for offset in range(batch)]} for start in range(count)]
+    else:
+        path = "/calculate"
+        bodies = items
+    requests = []
+    for body in bodies:
+        data = json.dumps(body).encode("utf-8")
+        head = (
+            f"POST {path} HTTP/1.1\r\nHost: {host}:{port}\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n\r\n"
+        )
+        requests.append(head.encode("latin-1") + data)
+    return requests
+
+
+async def read_response(reader):
+    """
+    レスポンスの読み込み
+
+    Returns:
+        int: ステータスコード
+    """
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    status = int(lines[0].split(" ")[1])
+    length = 0
+    for line in lines[1:]:
+        name, _, value = line.partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    await reader.readexactly(length)
+    return status
+
+
+async def run_connection(host, port, requests, offset, warmup_end, end, latencies, errors):
+    """1つの接続からリクエストを送り続ける（ウォームアップ中の結果は記録しない）"""
+    reader, writer = await asyncio.open_connection(host, port)
+    index = offset
+    try:
+        while True:
+            start = time.perf_counter()
+            if start >= end:
+                break
+            writer.write(requests[index % len(requests)])
+            index += 1
+            status = await read_response(reader)
+            finished = time.perf_counter()
+            if start >= warmup_end:
+                if status == 200:
+                    latencies.append(finished - start)
+                else:
+                    errors.append(status)
+    finally:
+        writer.close()
+
+
+async def run_load(host, port, requests, connections, duration, warmup):
+    """
+    負荷試験の実行
+
+    Returns:
+        tuple: (成功したリクエストの応答時間（秒）のリスト, 失敗したリクエストのステータスコードのリスト, 計測時間（秒）)
+    """
+    latencies = []
+    errors = []
+    warmup_end = time.perf_counter() + warmup
+    end = warmup_end + duration
+    offset = len(requests) // connections
+    await asyncio.gather(
+        *(
+            run_connection(host, port, requests, index * offset, warmup_end, end, latencies, errors)
+            for index in range(connections)
+        )
+    )
+    return latencies, errors, duration
+
+
+def start_server(port):
+    """
+    計算サービスを別プロセスで起動し、待ち受けを開始するまで待つ
+
+    Returns:
+        subprocess.Popen: サービスのプロセス
+    """
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(REPO_DIR, "rpa_server.py"), "--port", str(port)],
+        cwd=REPO_DIR,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"計算サービスが終了しました（終了コード {process.returncode}）")
+        try:
+            asyncio.run(_probe(port))
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("計算サービスが起動しません")
+
+
+async def _probe(port):
+    """待ち受けているかの確認"""
+    _, writer = await asyncio.open_connection(DEFAULT_HOST, port)
+    writer.close()
+
+
+def main(argv=None):
+    """コマンドラインからの実行"""
+    parser = argparse.ArgumentParser(description="計算サービスの負荷試験")
+    parser.add_argument("--host", default=DEFAULT_HOST, help=f"サービスのアドレス（既定: {DEFAULT_HOST}）")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"ポート番号（既定: {DEFAULT_PORT}）")
+    parser.add_argument("--connections", type=int, default=DEFAULT_CONNECTIONS, help=f"同時接続数（既定: {DEFAULT_CONNECTIONS}）")
+    parser.add_argument("--duration", type=float, default=DEFAULT_DURATION, help=f"計測時間（秒、既定: {DEFAULT_DURATION:g}）")
+    parser.add_argument("--warmup", type=float, default=DEFAULT_WARMUP, help=f"計測前のウォームアップ（秒、既定: {DEFAULT_WARMUP:g}）")
+    parser.add_argument("--batch", type=int, default=0, help="1リクエストあたりの件数（/calculate/batch。既定: 0＝/calculate）")
+    parser.add_argument("--start-server", action="store_true", help="計算サービスを別プロセスで起動して計測する")
+    parser.add_argument("--min-rps", type=float, help="処理量（リクエスト/秒）の下限（下回った場合は終了コード1）")
+    args = parser.parse_args(argv)
+
+    if args.connections <= 0:
+        parser.error("--connections は1以上を指定してください")
+    if args.duration <= 0:
+        parser.error("--duration は0より大きい値を指定してください")
+    if args.batch < 0:
+        parser.error("--batch は0以上を指定してください")
+
+    process = None
+    try:
+        if args.start_server:
+            if args.host != DEFAULT_HOST:
+                parser.error(f"--start-server の場合は --host を指定できません（{DEFAULT_HOST}で起動します）")
+            process = start_server(args.port)
+        requests = build_requests(args.host, args.port, args.batch)
+        latencies, errors, elapsed = asyncio.run(
+            run_load(args.host, args.port, requests, args.connections, args.duration, args.warmup)
+        )
+    except (OSError, RuntimeError) as e:
+        print(f"エラー: {e}", file=sys.stderr)
+        return 1
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    rps = len(latencies) / elapsed
+    endpoint = f"/calculate/batch（{args.batch}件）" if args.batch else "/calculate"
+    print(f"エンドポイント: {endpoint}  接続数: {args.connections}  計測時間: {elapsed:g}秒")
+    print(f"成功: {len(latencies):,}件  失敗: {len(errors):,}件")
+    print(f"処理量: {rps:,.0f} リクエスト/秒" + (f"（{rps * args.batch:,.0f} 件/秒）" if args.batch else ""))
+    if latencies:
+        print(
+            f"応答時間: p50 {percentile(latencies, 50) * 1000:.2f}ms  "
+            f"p99 {percentile(latencies, 99) * 1000:.2f}ms  最大 {max(latencies) * 1000:.2f}ms"
+        )
+    if errors:
+        print(f"失敗したステータスコード: {', '.join(str(status) for status in sorted(set(errors)))}")
+
+    if args.min_rps is not None and rps < args.min_rps:
+        print(f"処理量が下限を下回っています: {rps:,.0f} < {args.min_rps:,.0f} リクエスト/秒", file=sys.stderr)
+        return 1
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,143 @@
+"""
+GUIの起動時のインポート時間の確認
+
+python -X importtime で各GUIモジュールを読み込み、次の2点を確認します。
+- 起動時に読み込んではいけないモジュール（openpyxl、python-docx、pandas、NumPy）を読み込んでいないか
+- インポート時間（累積）が上限を超えていないか（複数回計測した最小値で判定）
+
+どちらかに違反すると終了コード1を返すため、変更後の確認やCIで使用できます。
+読み込んでいた場合は、どのモジュールから読み込まれたか（インポートの経路）を表示します。
+
+使用方法:
+    python benchmarks/check_startup.py
+    python benchmarks/check_startup.py --budget-ms 300 --repeat 5
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 確認するGUIモジュール
+GUI_MODULES = ["rpa_system", "rpa_excel_system", "new_rpa_system"]
+
+# 起動時に読み込んではいけないモジュール（最初の操作の時、または事前読み込みで読み込む）
+DEFERRED_MODULES = ["openpyxl", "docx", "pandas", "numpy"]
+
+# インポート時間（累積）の上限の既定値（ミリ秒）
+DEFAULT_BUDGET_MS = 250
+
+DEFAULT_REPEAT = 3
+
+# "import time:       383 |     279667 |   openpyxl"
+_IMPORTTIME_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)\s*$")
+
+
+def measure(module):
+    """
+    1回の計測
+
+    Args:
+        module (str): モジュール名
+
+    Returns:
+        list: (モジュール名, 累積時間（マイクロ秒）, 階層) のリスト（-X importtimeの出力順。子が親より先）
+    """
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"{module} を読み込めません:\n{completed.stderr.strip()[-1000:]}")
+    imports = []
+    for line in completed.stderr.splitlines():
+        match = _IMPORTTIME_RE.match(line)
+        if match:
+            # 階層は名前の前の空白（最上位は1つ、以降2つずつ）
+            imports.append((match.group(4), int(match.group(2)), (len(match.group(3)) - 1) // 2))
+    return imports
+
+
+def import_chain(imports, index):
+    """
+    モジュールを読み込んだ経路
+
+    Args:
+        imports (list): measure()の結果
+        index (int): 対象のモジュールの位置
+
+    Returns:
+        list: 最上位から対象までのモジュール名
+    """
+    chain = [imports[index][0]]
+    depth = imports[index][2]
+    # 親は後に出力される、1つ浅い階層の最初のモジュール
+    for name, _, level in imports[index + 1:]:
+        if level < depth:
+            if name not in chain:
+                chain.append(name)
+            depth = level
+    return list(reversed(chain))
+
+
+def check(module, budget_ms, repeat):
+    """
+    1つのGUIモジュールの確認
+
+    Args:
+        module (str): モジュール名
+        budget_ms (float): インポート時間の上限（ミリ秒）
+        repeat (int): 計測回数
+
+    Returns:
+        tuple: (インポート時間（ミリ秒、最小値）, 違反内容のリスト)
+    """
+    # 1回目は.pycの作成を含むため除外する
+    measure(module)
+    best = None
+    problems = []
+    for _ in range(repeat):
+        imports = measure(module)
+        total = next(elapsed for name, elapsed, level in imports if name == module and level == 0) / 1000
+        best = total if best is None else min(best, total)
+
+    for index, (name, _, _) in enumerate(imports):
+        if name in DEFERRED_MODULES:
+            problems.append(f"起動時に {name} を読み込んでいます: {' → '.join(import_chain(imports, index))}")
+    if best > budget_ms:
+        problems.append(f"インポート時間が上限を超えています: {best:.1f}ms > {budget_ms:.0f}ms")
+    return best, problems
+
+
+def main(argv=None):
+    """コマンドラインからの実行"""
+    parser = argparse.ArgumentParser(description="GUIの起動時のインポート時間の確認")
+    parser.add_argument("modules", nargs="*", default=GUI_MODULES, help="確認するモジュール（既定: GUIの3モジュール）")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS, help=f"インポート時間の上限（既定: {DEFAULT_BUDGET_MS}ms）")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help=f"計測回数（最小値で判定。既定: {DEFAULT_REPEAT}）")
+    args = parser.parse_args(argv)
+
+    if args.repeat <= 0:
+        parser.error("--repeat は1以上を指定してください")
+
+    failed = False
+    for module in args.modules:
+        try:
+            elapsed, problems = check(module, args.budget_ms, args.repeat)
+        except RuntimeError as e:
+            print(f"エラー: {e}", file=sys.stderr)
+            return 1
+        print(f"{module:<20} {elapsed:8.1f}ms {'NG' if problems else 'OK'}", file=sys.stderr)
+        for problem in problems:
+            print(f"  {problem}", file=sys.stderr)
+        failed = failed or bool(problems)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,392 @@
+"""
+ベンチマークスイート
+
+計算、計算履歴のExcel出力、検査表（Excel）への書き込み、Word文書のキー文字列置換の処理速度を計測し、
+結果をJSONで出力します。データはworkloads.pyで生成するため、外部のファイルは不要です。
+
+各ケースは別プロセスで実行し、処理量（件/秒）、1件あたりの処理時間（p50、p99）、
+最大メモリ使用量（peak RSS）を記録します。保存したJSONを--compareに指定すると、変更前後の結果を比較できます。
+
+使用方法:
+    python benchmarks/run_benchmarks.py -o before.json
+    python benchmarks/run_benchmarks.py --profile full -o after.json --compare before.json
+    python benchmarks/run_benchmarks.py --case word_replace --case excel_fill
+"""
+
+import argparse
+import importlib
+import json
+import math
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARK_DIR)
+sys.path.insert(0, REPO_DIR)
+
+import workloads  # noqa: E402
+
+# 結果のJSONの形式のバージョン
+RESULT_VERSION = 1
+
+# ケースごとの大きさ（quick: 変更ごとの確認用、full: 本番相当の件数）
+PROFILES = {
+    "quick": {
+        "calc_scalar": [20000],
+        "export_history": [1000, 20000],
+        "excel_fill": [0, 20000],
+        "word_replace": [100, 1000],
+        "validate_orders": [20000],
+    },
+    "full": {
+        "calc_scalar": [200000],
+        "export_history": [1000, 100000, 1000000],
+        "excel_fill": [0, 20000, 200000],
+        "word_replace": [100, 1000, 10000],
+        "validate_orders": [200000],
+    },
+}
+
+# 処理時間を計測する単位の件数（1件ずつ計測すると計測自体の時間が大きくなる処理）
+CALC_SAMPLE_SIZE = 100
+
+# --compareで処理量の低下とみなす割合の既定値
+DEFAULT_THRESHOLD = 0.10
+
+# 計測前に読み込んでおくモジュール（処理速度だけを比較する。GUIの起動時のインポート時間はcheck_startup.pyで確認）
+PRELOAD_MODULES = ["numpy", "pandas", "openpyxl", "lxml.etree"]
+
+
+# ==================== 計測 ====================
+
+
+class Recorder:
+    """1件（または一定件数ごと）の処理時間の記録"""
+
+    def __init__(self):
+        self.latencies = []
+        self.items = 0
+        self.elapsed = 0.0
+
+    def time(self, func, items=1):
+        """
+        処理時間の計測
+
+        Args:
+            func (callable): 計測する処理
+            items (int): 処理の件数（処理時間は1件あたりに換算して記録）
+
+        Returns:
+            処理の戻り値
+        """
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        self.elapsed += elapsed
+        self.items += items
+        self.latencies.append(elapsed / items)
+        return result
+
+
+def percentile(values, p):
+    """パーセンタイル（最近傍順位法）"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(p / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def peak_rss_mb():
+    """このプロセスの最大メモリ使用量（MB。取得できない場合はNone）"""
+    try:
+        import resource
+    except ImportError:
+        resource = None
+    if resource is not None:
+        usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linuxはキロバイト、macOSはバイト
+        return usage / (1024 * 1024) if sys.platform == "darwin" else usage / 1024
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return psutil.Process().memory_info().peak_wset / (1024 * 1024)
+
+
+# ==================== ケース ====================
+
+
+def case_calc_scalar(size, workdir, repeat):
+    """rpa_systemの計算（compute、結果の整形）を1件ずつ実行"""
+    from rpa_engine import compute
+    from rpa_system import format_result
+
+    rows = workloads.calc_rows(size)
+    recorder = Recorder()
+    for _ in range(repeat):
+        for start in range(0, len(rows), CALC_SAMPLE_SIZE):
+            sample = rows[start:start + CALC_SAMPLE_SIZE]
+            recorder.time(lambda: [format_result(compute(*row)) for row in sample], len(sample))
+    return recorder, {"unit": "rows"}
+
+
+def case_export_history(size, workdir, repeat):
+    """RPAExcelSystem.export_to_excelと同じ処理（計算履歴のExcel出力）"""
+    from rpa_engine import compute
+    from rpa_export import write_history_xlsx
+    from rpa_history import HistoryStore
+
+    setup_start = time.perf_counter()
+    rows = workloads.calc_rows(min(size, 10000))
+    history = HistoryStore()
+    for index in range(size):
+        history.append(compute(*rows[index % len(rows)]))
+    setup = time.perf_counter() - setup_start
+
+    recorder = Recorder()
+    output = os.path.join(workdir, "history.xlsx")
+    for _ in range(repeat):
+        recorder.time(lambda: write_history_xlsx(output, history, history.widths.widths()), size)
+    history.close()
+    return recorder, {"unit": "rows", "setup_s": setup, "output_bytes": os.path.getsize(output)}
+
+
+def case_excel_fill(size, workdir, repeat):
+    """NewRPASystem.write_to_excelと同じ処理（テンプレートへの書き込み、受注ごとに保存）"""
+    from rpa_excel_template import check_sheet_values, clear_templates, get_template
+
+    template_path = workloads.write_check_workbook(os.path.join(workdir, "check1.xlsx"), size)
+    orders = workloads.order_rows(50)
+    clear_templates()
+
+    # 初回はテンプレートの読み込み・コンパイルを含む
+    setup_start = time.perf_counter()
+    get_template(template_path)
+    setup = time.perf_counter() - setup_start
+
+    recorder = Recorder()
+    for _ in range(repeat):
+        for index, (username, model, manufacturing, order) in enumerate(orders):
+            output = os.path.join(workdir, f"out_{index}.xlsx")
+            values = check_sheet_values(username, model, manufacturing, order)
+            recorder.time(lambda: get_template(template_path).fill(values, output))
+    return recorder, {"unit": "orders", "setup_s": setup, "template_bytes": os.path.getsize(template_path)}
+
+
+def case_word_replace(size, workdir, repeat):
+    """NewRPASystem.replace_text_in_word（コンパイル済みテンプレートによる置換）"""
+    from new_rpa_system import NewRPASystem
+    from rpa_word import INSPECTION_KEY
+
+    template_path = workloads.write_inspection_docx(os.path.join(workdir, "check2.docx"), size)
+    # GUIを作成せずに置換の処理だけを呼び出す
+    system = NewRPASystem.__new__(NewRPASystem)
+
+    setup_start = time.perf_counter()
+    count, _ = system.replace_text_in_word(template_path, INSPECTION_KEY, "O0000/J00000000100")
+    setup = time.perf_counter() - setup_start
+
+    recorder = Recorder()
+    for _ in range(repeat):
+        for order, manufacturing in [(f"O{index:04d}", f"J000{index:04d}0100") for index in range(20)]:
+            recorder.time(lambda: system.replace_text_in_word(template_path, INSPECTION_KEY, f"{order}/{manufacturing}"))
+    return recorder, {
+        "unit": "documents",
+        "setup_s": setup,
+        "replacements": count,
+        "template_bytes": os.path.getsize(template_path),
+    }
+
+
+def case_validate_orders(size, workdir, repeat):
+    """受注一覧の一括検証（CSVの読み込みを含む）"""
+    from rpa_validate import ORDER_FIELDS, read_orders_frame, validate_orders
+
+    orders_path = workloads.write_orders_csv(os.path.join(workdir, "orders.csv"), size)
+
+    def run():
+        frame = read_orders_frame(orders_path)
+        return validate_orders(*(frame[field] for field in ORDER_FIELDS)).error_count
+
+    recorder = Recorder()
+    for _ in range(repeat):
+        errors = recorder.time(run, size)
+    return recorder, {"unit": "rows", "errors": errors}
+
+
+CASES = {
+    "calc_scalar": case_calc_scalar,
+    "export_history": case_export_history,
+    "excel_fill": case_excel_fill,
+    "word_replace": case_word_replace,
+    "validate_orders": case_validate_orders,
+}
+
+
+def run_case(name, size, repeat):
+    """
+    ケースの実行（このプロセスで実行）
+
+    Returns:
+        dict: 計測結果
+    """
+    for module in PRELOAD_MODULES:
+        importlib.import_module(module)
+    workdir = tempfile.mkdtemp(prefix=f"rpa_bench_{name}_")
+    # Word文書の置換結果など、相対パスで出力する処理の出力先も作業フォルダーにする
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        recorder, extra = CASES[name](size, workdir, repeat)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    latencies = recorder.latencies
+    result = {
+        "case": name,
+        "size": size,
+        "repeat": repeat,
+        "items": recorder.items,
+        "elapsed_s": recorder.elapsed,
+        "throughput_per_s": recorder.items / recorder.elapsed if recorder.elapsed > 0 else None,
+        "latency_ms": {
+            "p50": percentile(latencies, 50) * 1000,
+            "p99": percentile(latencies, 99) * 1000,
+            "mean": sum(latencies) / len(latencies) * 1000,
+        },
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    result.update(extra)
+    return result
+
+
+def run_case_process(name, size, repeat):
+    """ケースを別プロセスで実行（最大メモリ使用量をケースごとに計測するため）"""
+    completed = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", name, str(size), str(repeat)],
+        capture_output=True,
+        text=True,
+        encoding="utf-8",
+    )
+    if completed.returncode != 0:
+        return {"case": name, "size": size, "error": completed.stderr.strip().splitlines()[-1:] or ["不明なエラー"]}
+    return json.loads(completed.stdout)
+
+
+# ==================== 結果 ====================
+
+
+def git_commit():
+    """現在のコミット（gitがない場合はNone）"""
+    try:
+        completed = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True, check=True
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return completed.stdout.strip()
+
+
+def environment():
+    """実行環境の情報"""
+    return {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+
+
+def format_result(result):
+    """1ケースの結果の表示"""
+    label = f"{result['case']}[{result['size']}]"
+    if "error" in result:
+        return f"{label:<28} エラー: {' '.join(result['error'])}"
+    rss = f"{result['peak_rss_mb']:8.1f} MB" if result["peak_rss_mb"] is not None else "       - MB"
+    return (
+        f"{label:<28} {result['throughput_per_s']:>14,.1f} {result['unit']}/s"
+        f"  p50 {result['latency_ms']['p50']:>10.3f} ms  p99 {result['latency_ms']['p99']:>10.3f} ms  {rss}"
+    )
+
+
+def compare(results, baseline, threshold):
+    """
+    前回の結果との比較
+
+    Args:
+        results (list): 今回の結果
+        baseline (dict): 前回の結果のJSON
+        threshold (float): 処理量の低下とみなす割合
+
+    Returns:
+        list: 処理量が低下したケース
+    """
+    previous = {(result["case"], result["size"]): result for result in baseline.get("results", [])}
+    regressions = []
+    print(f"\n比較: {baseline.get('environment', {}).get('commit')} → 今回", file=sys.stderr)
+    for result in results:
+        before = previous.get((result["case"], result["size"]))
+        if before is None or "error" in result or "error" in before:
+            continue
+        ratio = result["throughput_per_s"] / before["throughput_per_s"]
+        mark = ""
+        if ratio < 1 - threshold:
+            mark = "  ← 低下"
+            regressions.append(result)
+        print(f"{result['case']}[{result['size']}]".ljust(28) + f" 処理量 {ratio:6.2f}倍{mark}", file=sys.stderr)
+    return regressions
+
+
+def main(argv=None):
+    """コマンドラインからの実行"""
+    parser = argparse.ArgumentParser(description="ベンチマークスイート")
+    parser.add_argument("--profile", choices=list(PROFILES), default="quick", help="ケースの大きさ（既定: quick）")
+    parser.add_argument("--case", action="append", choices=list(CASES), help="実行するケース（複数指定可。既定: すべて）")
+    parser.add_argument("--size", type=int, action="append", help="ケースの大きさ（プロファイルの値の代わりに使用）")
+    parser.add_argument("--repeat", type=int, default=3, help="各ケースの繰り返し回数（既定: 3）")
+    parser.add_argument("-o", "--output", default=None, help="結果のJSONの出力ファイル（'-'で標準出力）")
+    parser.add_argument("--compare", default=None, help="比較する前回の結果のJSON")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="処理量の低下とみなす割合（既定: 0.10）")
+    parser.add_argument("--child", nargs=3, metavar=("CASE", "SIZE", "REPEAT"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        name, size, repeat = args.child
+        json.dump(run_case(name, int(size), int(repeat)), sys.stdout)
+        return 0
+
+    results = []
+    for name in args.case or list(CASES):
+        for size in args.size or PROFILES[args.profile][name]:
+            # 大きなケースは繰り返し回数を減らす（1回で十分な件数になる）
+            repeat = 1 if name == "export_history" and size >= 1000000 else args.repeat
+            result = run_case_process(name, size, repeat)
+            results.append(result)
+            print(format_result(result), file=sys.stderr)
+
+    report = {"version": RESULT_VERSION, "environment": environment(), "profile": args.profile, "results": results}
+    if args.output == "-":
+        json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+    elif args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    status = 1 if any("error" in result for result in results) else 0
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.threshold):
+            status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
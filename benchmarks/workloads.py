@@ -0,0 +1,235 @@
+"""
+ベンチマーク用のデータ生成
+
+計算の入力行、受注一覧（CSV）、検査表のExcelテンプレート、Word文書を乱数で生成します。
+外部のファイルを使用せずに、同じシードから常に同じデータを作成します。
+
+使用方法:
+    python benchmarks/workloads.py orders 10000 orders.csv
+    python benchmarks/workloads.py calc 100000 input.csv
+    python benchmarks/workloads.py xlsx 100000 check1.xlsx
+    python benchmarks/workloads.py docx 1000 check2.docx
+"""
+
+import argparse
+import csv
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rpa_engine import current_rules  # noqa: E402
+from rpa_excel_template import CHECK_SHEET_CELLS, FIELD_LABELS  # noqa: E402
+from rpa_validate import ORDER_FIELDS  # noqa: E402
+from rpa_word import INSPECTION_KEY  # noqa: E402
+
+# 計算の入力ファイルの列
+CALC_COLUMNS = ["機種", "棚数", "インチ数", "高さ"]
+
+# 生成するWord文書の表の大きさ
+TABLE_ROWS = 4
+TABLE_COLUMNS = 3
+
+# 本文の段落の文章
+_SENTENCES = [
+    "チェーンガイドの取付位置を確認すること。",
+    "ボルトの締付トルクは規定値の範囲内であること。",
+    "フレームの歪み、傷、塗装の剥がれがないこと。",
+    "検査結果を記録し、責任者の確認を受けること。",
+]
+
+
+def calc_rows(count, seed=0):
+    """
+    有効な計算の入力行
+
+    Args:
+        count (int): 行数
+        seed (int): 乱数シード
+
+    Returns:
+        list: (機種, 棚数, インチ数, 高さ) のリスト
+    """
+    rng = random.Random(seed)
+    rules = current_rules()
+    machines = list(rules.machine_data)
+    rows = []
+    for _ in range(count):
+        machine = rng.choice(machines)
+        inch = rng.choice(rules.machine_data[machine]["inches"])
+        height = rules.min_height + rules.height_resolution * rng.randint(0, 20)
+        rows.append((machine, rng.randint(4, 40), inch, height))
+    return rows
+
+
+def order_rows(count, seed=0, invalid_ratio=0.05):
+    """
+    受注一覧の行
+
+    Args:
+        count (int): 行数
+        seed (int): 乱数シード
+        invalid_ratio (float): 入力規則に違反する行の割合
+
+    Returns:
+        list: (ユーザ名, 型番, 製造番号, 受注番号) のリスト
+    """
+    rng = random.Random(seed)
+    rows = []
+    for _ in range(count):
+        serial = f"{rng.randint(0, 9999):04d}"
+        row = [
+            rng.choice(["山田", "佐藤", "マキシンコー", "鈴木工業"]),
+            f"{rng.choice(['200', '201', '350', '351'])}-{rng.randint(0, 9999):04d}.{rng.randint(0, 999999):06d}",
+            f"J000{serial}0{rng.randint(1, 9)}00",
+            f"{rng.choice('ONT')}{serial}",
+        ]
+        if rng.random() < invalid_ratio:
+            # 規則違反（空欄、形式、製造番号と受注番号の不一致）のいずれか
+            column = rng.randrange(len(row))
+            row[column] = rng.choice(["", row[column][:-1], row[column] + "X"])
+        rows.append(tuple(row))
+    return rows
+
+
+def write_csv(path, header, rows):
+    """CSVファイルの出力（Excelでそのまま開けるBOM付きUTF-8）"""
+    with open(path, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+    return path
+
+
+def write_orders_csv(path, count, seed=0):
+    """受注一覧のCSVファイルを生成"""
+    return write_csv(path, ORDER_FIELDS, order_rows(count, seed))
+
+
+def write_calc_csv(path, count, seed=0):
+    """計算の入力ファイル（CSV）を生成"""
+    return write_csv(path, CALC_COLUMNS, calc_rows(count, seed))
+
+
+def write_check_workbook(path, filler_cells, seed=0):
+    """
+    検査表のExcelテンプレートを生成
+
+    CHECK_SHEET_CELLSの3シートに見出しを書き込み、テンプレートの大きさを変えるため
+    各シートの下側に数値・文字列の入ったセル（合計filler_cells個）を追加します。
+
+    Args:
+        path (str): 出力ファイル
+        filler_cells (int): 追加するセルの数（全シートの合計）
+        seed (int): 乱数シード
+    """
+    from openpyxl import Workbook
+
+    rng = random.Random(seed)
+    workbook = Workbook()
+    workbook.remove(workbook.active)
+    per_sheet = filler_cells // len(CHECK_SHEET_CELLS)
+    columns = 10
+    for sheet_name, cells in CHECK_SHEET_CELLS.items():
+        worksheet = workbook.create_sheet(sheet_name)
+        worksheet["A1"] = sheet_name
+        for coordinate, field in cells.items():
+            worksheet[coordinate] = f"{FIELD_LABELS[field]}："
+        for index in range(per_sheet):
+            row, column = divmod(index, columns)
+            value = rng.choice(_SENTENCES) if column == 0 else rng.randint(0, 10000)
+            worksheet.cell(row=10 + row, column=1 + column, value=value)
+    workbook.save(path)
+    return path
+
+
+def write_inspection_docx(path, paragraphs, seed=0):
+    """
+    検査表のWord文書を生成
+
+    段落数に応じて、表、テキストボックス、ヘッダー・フッター（セクションごと）を追加します。
+    キー文字列（検査対象情報）は段落、表のセル、テキストボックス、ヘッダーに配置し、
+    一部は複数のrunに分割します（Wordで編集した文書と同じ状態）。
+
+    Args:
+        path (str): 出力ファイル
+        paragraphs (int): 本文の段落数
+        seed (int): 乱数シード
+    """
+    from docx import Document
+    from docx.enum.section import WD_SECTION
+    from docx.oxml import parse_xml
+
+    rng = random.Random(seed)
+    document = Document()
+    # 表とテキストボックスは50段落ごと、セクションは500段落ごとに1つ
+    object_interval = 50
+    sections = max(1, paragraphs // 500)
+
+    for section_index in range(sections):
+        if section_index:
+            document.add_section(WD_SECTION.NEW_PAGE)
+        section = document.sections[-1]
+        section.header.is_linked_to_previous = False
+        section.header.paragraphs[0].text = f"検査表 {section_index + 1} {INSPECTION_KEY}"
+        section.footer.is_linked_to_previous = False
+        section.footer.paragraphs[0].text = f"{section_index + 1}ページ"
+
+        start = paragraphs * section_index // sections
+        end = paragraphs * (section_index + 1) // sections
+        for index in range(start, end):
+            paragraph = document.add_paragraph(rng.choice(_SENTENCES))
+            if index % 20 == 0:
+                # キー文字列を複数のrunに分割して配置
+                paragraph.add_run("対象: 検査")
+                paragraph.add_run("対象")
+                paragraph.add_run("情報").bold = True
+            if index % object_interval == 0:
+                table = document.add_table(rows=TABLE_ROWS, cols=TABLE_COLUMNS)
+                for row in table.rows:
+                    for cell in row.cells:
+                        cell.text = str(rng.randint(0, 1000))
+                table.cell(0, 0).text = INSPECTION_KEY
+                document.add_paragraph()._p.append(parse_xml(_text_box_xml(f"{INSPECTION_KEY}（{index}）")))
+    document.save(path)
+    return path
+
+
+def _text_box_xml(text):
+    """テキストボックス（VML）を含むrun"""
+    return (
+        '<w:r xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main" '
+        'xmlns:v="urn:schemas-microsoft-com:vml">'
+        '<w:pict><v:shape type="#_x0000_t202" style="width:200pt;height:40pt"><v:textbox>'
+        f"<w:txbxContent><w:p><w:r><w:t>{text}</w:t></w:r></w:p></w:txbxContent>"
+        "</v:textbox></v:shape></w:pict></w:r>"
+    )
+
+
+# ==================== コマンドライン ====================
+
+GENERATORS = {
+    "orders": write_orders_csv,
+    "calc": write_calc_csv,
+    "xlsx": write_check_workbook,
+    "docx": write_inspection_docx,
+}
+
+
+def main(argv=None):
+    """コマンドラインからの実行"""
+    parser = argparse.ArgumentParser(description="ベンチマーク用のデータ生成")
+    parser.add_argument("kind", choices=list(GENERATORS), help="orders: 受注一覧、calc: 計算の入力、xlsx: Excelテンプレート、docx: Word文書")
+    parser.add_argument("size", type=int, help="行数（orders、calc）、追加セル数（xlsx）、段落数（docx）")
+    parser.add_argument("output", help="出力ファイル")
+    parser.add_argument("--seed", type=int, default=0, help="乱数シード")
+    args = parser.parse_args(argv)
+
+    GENERATORS[args.kind](args.output, args.size, args.seed)
+    print(f"生成しました: {args.output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -13,16 +13,36 @@
 
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
-import re
-import openpyxl
-from openpyxl import Workbook, load_workbook
+import logging
 import os
 from datetime import datetime
-from docx import Document
-from docx.shared import Inches
-import subprocess
 import sys
 
+from rpa_word import INSPECTION_KEY, inspection_replacements, order_processed_path, processed_path
+from rpa_word_template import WordTemplate
+from rpa_excel_template import check_sheet_values, get_template
+from rpa_convert import ConversionError, get_service as get_conversion_service
+from rpa_jobs import EXCEL, FAILED, GUI_BATCH, WORD, JobError, JobQueue, JobRunner
+from rpa_logging import setup_logging
+from rpa_metrics import operation, start_exporter, timed
+from rpa_prewarm import schedule_prewarm
+from rpa_tasks import TaskPanel, TaskRunner
+from rpa_validate import (
+    MANUFACTURING_PATTERN,
+    MANUFACTURING_SERIAL,
+    MESSAGES,
+    MODEL_PATTERN,
+    ORDER_PATTERN,
+    ORDER_SERIAL,
+    USERNAME_PATTERN,
+    consistency_message,
+)
+
+logger = logging.getLogger(__name__)
+
+# 起動後に読み込んでおくモジュール（Excel書き込みで使用）
+PREWARM_MODULES = ["openpyxl"]
+
 
 class NewRPASystem:
     """
@@ -67,6 +87,20 @@ class NewRPASystem:
         # 結果表示
         self.create_result_display(main_frame)
 
+        # Excel書き込み・Word処理はバックグラウンドで実行し、進捗を表示
+        self.task_runner = TaskRunner(self.root)
+        self.task_panel = TaskPanel(main_frame, self.task_runner)
+        self.task_panel.grid(row=5, column=0, columnspan=2, sticky=(tk.W, tk.E))
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+
+        # 書類の作成はジョブキューに記録してから実行し、前回中断したジョブは起動後に再開する
+        self.job_queue = JobQueue()
+        self.job_runner = JobRunner(self.job_queue)
+        self.root.after_idle(self.resume_jobs)
+
+        # openpyxlとテンプレートは最初の操作の時に読み込むため、ウィンドウの表示後に読み込んでおく
+        schedule_prewarm(self.root, PREWARM_MODULES, [self.prewarm_templates])
+
         # グリッドの重み設定
         main_frame.columnconfigure(1, weight=1)
         main_frame.rowconfigure(4, weight=1)
@@ -299,16 +333,14 @@ class NewRPASystem:
             dict: 検証結果 {"valid": bool, "message": str}
         """
         if not username:
-            return {"valid": False, "message": "ユーザ名を入力してください。"}
+            return {"valid": False, "message": MESSAGES["username_empty"]}
 
         if not username.strip():
-            return {"valid": False, "message": "ユーザ名は空白のみでは入力できません。"}
+            return {"valid": False, "message": MESSAGES["username_blank"]}
 
         # 日本語文字のチェック（ひらがな、カタカナ、漢字、英数字、記号）
-        import re
-
-        if not re.search(r"[\u3040-\u309F\u30A0-\u30FF\u4E00-\u9FAF\uFF00-\uFFEF]", username):
-            return {"valid": False, "message": "ユーザ名には日本語文字を含む必要があります。"}
+        if not USERNAME_PATTERN.search(username):
+            return {"valid": False, "message": MESSAGES["username_not_japanese"]}
 
         return {"valid": True, "message": ""}
 
@@ -323,15 +355,11 @@ class NewRPASystem:
             dict: 検証結果 {"valid": bool, "message": str}
         """
         if not model:
-            return {"valid": False, "message": "型番を入力してください。"}
+            return {"valid": False, "message": MESSAGES["model_empty"]}
 
         # 型番の形式: 200,201,350,351の4種類+"-"+4桁数字+"."+6桁数字
-        model_pattern = r"^(200|201|350|351)-\d{4}\.\d{6}$"
-        if not re.match(model_pattern, model):
-            return {
-                "valid": False,
-                "message": "型番の形式が正しくありません。\n形式: 200,201,350,351のいずれか-4桁数字.6桁数字\n例: 201-2312.003000",
-            }
+        if not MODEL_PATTERN.match(model):
+            return {"valid": False, "message": MESSAGES["model_format"]}
 
         return {"valid": True, "message": ""}
 
@@ -346,15 +374,11 @@ class NewRPASystem:
             dict: 検証結果 {"valid": bool, "message": str}
         """
         if not manufacturing:
-            return {"valid": False, "message": "製造番号を入力してください。"}
+            return {"valid": False, "message": MESSAGES["manufacturing_empty"]}
 
         # 製造番号の形式: J000から始まり、4桁の数字、最後に0n00（nは1-9）
-        manufacturing_pattern = r"^J000\d{4}0[1-9]00$"
-        if not re.match(manufacturing_pattern, manufacturing):
-            return {
-                "valid": False,
-                "message": "製造番号の形式が正しくありません。\n形式: J000+4桁数字+0+1-9+00\n例: J00023150100",
-            }
+        if not MANUFACTURING_PATTERN.match(manufacturing):
+            return {"valid": False, "message": MESSAGES["manufacturing_format"]}
 
         return {"valid": True, "message": ""}
 
@@ -369,12 +393,11 @@ class NewRPASystem:
             dict: 検証結果 {"valid": bool, "message": str}
         """
         if not order:
-            return {"valid": False, "message": "受注番号を入力してください。"}
+            return {"valid": False, "message": MESSAGES["order_empty"]}
 
         # 受注番号の形式: O,N,Tのいずれか+4桁数字
-        order_pattern = r"^[ONT]\d{4}$"
-        if not re.match(order_pattern, order):
-            return {"valid": False, "message": "受注番号の形式が正しくありません。\n形式: O/N/T+4桁数字\n例: O2315"}
+        if not ORDER_PATTERN.match(order):
+            return {"valid": False, "message": MESSAGES["order_format"]}
 
         return {"valid": True, "message": ""}
 
@@ -390,14 +413,11 @@ class NewRPASystem:
             dict: 検証結果 {"valid": bool, "message": str}
         """
         # 製造番号の5-8文字目（J000の後の4桁数字）と受注番号の1-4文字目（O/N/T+3桁数字）が一致する必要がある
-        manufacturing_middle = manufacturing[4:8]  # J000の後の4桁数字（例：2315）
-        order_prefix = order[1:5]  # 受注番号の1-4文字目（O/N/T+3桁数字）（例：2315）
+        manufacturing_middle = manufacturing[MANUFACTURING_SERIAL]  # J000の後の4桁数字（例：2315）
+        order_prefix = order[ORDER_SERIAL]  # 受注番号の1-4文字目（O/N/T+3桁数字）（例：2315）
 
         if manufacturing_middle != order_prefix:
-            return {
-                "valid": False,
-                "message": f"製造番号と受注番号が一致しません。\n製造番号の5-8文字目: {manufacturing_middle}\n受注番号の1-4文字目: {order_prefix}\nこれらは同じである必要があります。",
-            }
+            return {"valid": False, "message": consistency_message(manufacturing, order)}
 
         return {"valid": True, "message": ""}
 
@@ -501,58 +521,52 @@ class NewRPASystem:
     def write_to_excel(self, username, model, manufacturing, order, file_path=None):
         """Excelファイルにデータを書き込み"""
         try:
-            # デフォルトでcheck1.xlsxファイルを使用
+            file_path = self.resolve_excel_file(file_path)
             if not file_path:
-                file_path = "check1.xlsx"
-                if not os.path.exists(file_path):
-                    messagebox.showerror("エラー", f"ファイルが見つかりません: {file_path}\n既存のExcelファイルを配置してください。")
-                    return False
-
-            # Excelファイルを開く
-            wb = load_workbook(file_path)
-
-            # 組立チェック表の書き込み
-            if "組立チェック表" in wb.sheetnames:
-                ws1 = wb["組立チェック表"]
-                ws1["B4"] = f"ユーザー名：{username}"
-                ws1["B5"] = f"機種-型番：{model}"
-                ws1["F4"] = f"受注番号：{order}"
-                ws1["F5"] = f"製造番号：{manufacturing}"
-
-            # フレームテスト検査表の書き込み
-            if "フレームテスト検査表" in wb.sheetnames:
-                ws2 = wb["フレームテスト検査表"]
-                ws2["B3"] = f"ユーザー名：{username}"
-                ws2["B4"] = f"機種-型番：{model}"
-                ws2["F2"] = f"受注番号：{order}"
-                ws2["F3"] = f"製造番号：{manufacturing}"
-
-            # フレーム組立検査表の書き込み
-            if "フレーム組立検査表" in wb.sheetnames:
-                ws3 = wb["フレーム組立検査表"]
-                ws3["B3"] = f"ユーザー名：{username}"
-                ws3["B4"] = f"機種-型番：{model}"
-                ws3["F2"] = f"受注番号：{order}"
-                ws3["F3"] = f"製造番号：{manufacturing}"
-
-            # 新しいファイル名を生成（タイムスタンプ付き）
-            base_name = os.path.splitext(file_path)[0]
-            extension = os.path.splitext(file_path)[1]
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            new_file_path = f"{base_name}_processed_{timestamp}{extension}"
-            
-            # 新しいファイルとして保存
-            wb.save(new_file_path)
-
-            messagebox.showinfo("成功", f"Excelファイルにデータを書き込みました:\n元ファイル: {os.path.basename(file_path)}\n新ファイル: {os.path.basename(new_file_path)}")
+                return False
+
+            with operation("write_to_excel").time():
+                new_file_path = self.fill_excel_file(file_path, username, model, manufacturing, order)
+            self.show_excel_written(file_path, new_file_path)
             return True, new_file_path
 
         except Exception as e:
-            messagebox.showerror("エラー", f"Excelファイルの書き込みに失敗しました:\n{str(e)}")
+            self.show_excel_error(e)
             return False, None
 
+    def resolve_excel_file(self, file_path=None):
+        """書き込むExcelファイルの決定（見つからない場合はエラーを表示してNone）"""
+        # デフォルトでcheck1.xlsxファイルを使用
+        if not file_path:
+            file_path = "check1.xlsx"
+            if not os.path.exists(file_path):
+                messagebox.showerror("エラー", f"ファイルが見つかりません: {file_path}\n既存のExcelファイルを配置してください。")
+                return None
+        return file_path
+
+    def fill_excel_file(self, file_path, username, model, manufacturing, order):
+        """
+        Excelファイルへの書き込み（画面を操作しないため、ワーカースレッドから呼び出せる）
+
+        Returns:
+            str: 新ファイルのパス
+        """
+        # 読み込み済みのテンプレート（ファイルが更新されていれば読み込み直す）に書き込み、
+        # 新しいファイル名（タイムスタンプ付き）で保存
+        new_file_path = order_processed_path(file_path, order, manufacturing)
+        get_template(file_path).fill(check_sheet_values(username, model, manufacturing, order), new_file_path)
+        return new_file_path
+
+    def show_excel_written(self, file_path, new_file_path):
+        """Excel書き込み完了のメッセージ"""
+        messagebox.showinfo("成功", f"Excelファイルにデータを書き込みました:\n元ファイル: {os.path.basename(file_path)}\n新ファイル: {os.path.basename(new_file_path)}")
+
+    def show_excel_error(self, error):
+        """Excel書き込み失敗のメッセージ"""
+        messagebox.showerror("エラー", f"Excelファイルの書き込みに失敗しました:\n{str(error)}")
+
     def write_to_excel_direct(self):
-        """入力データを直接Excelに書き込み"""
+        """入力データを直接Excelに書き込み（書き込みはバックグラウンドで実行）"""
         try:
             # 入力値の取得
             username = self.username_var.get().strip()
@@ -566,25 +580,43 @@ class NewRPASystem:
                 messagebox.showerror("入力エラー", validation_result["message"])
                 return
 
-            # Excelファイルに書き込み
-            success, new_file_path = self.write_to_excel(username, model, manufacturing, order)
+            file_path = self.resolve_excel_file()
+            if not file_path:
+                return
 
-            if success:
-                # 結果表示エリアに更新
-                self.display_result(username, model, manufacturing, order)
+            # Excelファイルに書き込み（同じファイルへの書き込みは登録順に1件ずつ）
+            inputs = {"username": username, "model": model, "manufacturing": manufacturing, "order": order}
+            # 受注ごとに別の出力ファイル（同じ秒に登録した受注が同じジョブにならない）
+            new_file_path = order_processed_path(file_path, order, manufacturing)
+            self.task_runner.submit(
+                f"Excel書き込み（{order}）",
+                lambda task: self.run_document_job(EXCEL, file_path, inputs, new_file_path),
+                key=os.path.abspath(file_path),
+                on_done=lambda job: self.finish_excel_direct(
+                    username, model, manufacturing, order, file_path, job.output_path
+                ),
+                on_error=self.show_excel_error,
+            )
 
-                # 追加のExcel書き込み完了メッセージ
-                excel_result = f"""\n\n📊 Excel書き込み完了:
-✅ 元ファイル: check1.xlsx
+        except Exception as e:
+            messagebox.showerror("エラー", f"Excel書き込み中にエラーが発生しました: {str(e)}")
+
+    def finish_excel_direct(self, username, model, manufacturing, order, file_path, new_file_path):
+        """Excel書き込み完了後の表示"""
+        self.show_excel_written(file_path, new_file_path)
+
+        # 結果表示エリアに更新
+        self.display_result(username, model, manufacturing, order)
+
+        # 追加のExcel書き込み完了メッセージ
+        excel_result = f"""\n\n📊 Excel書き込み完了:
+✅ 元ファイル: {os.path.basename(file_path)}
 ✅ 新ファイル: {os.path.basename(new_file_path)}
 ✅ 組立チェック表: B4,B5,F4,F5セルにデータを書き込み
 ✅ フレームテスト検査表: B3,B4,F2,F3セルにデータを書き込み  
 ✅ フレーム組立検査表: B3,B4,F2,F3セルにデータを書き込み"""
 
-                self.result_text.insert(tk.END, excel_result)
-
-        except Exception as e:
-            messagebox.showerror("エラー", f"Excel書き込み中にエラーが発生しました: {str(e)}")
+        self.result_text.insert(tk.END, excel_result)
 
     # ==================== Word操作メソッド ====================
 
@@ -595,98 +627,32 @@ class NewRPASystem:
         )
         return file_path if file_path else None
 
+    @timed("replace_text_in_word")
     def replace_text_in_word(self, file_path, search_text, replace_text):
-        """Wordファイル内のテキストを置換"""
-        try:
-            # Wordファイルを開く
-            doc = Document(file_path)
-
-            # 置換回数をカウント
-            replacement_count = 0
-
-            # 段落内のテキストを置換
-            for paragraph in doc.paragraphs:
-                if search_text in paragraph.text:
-                    # 段落内のすべてのrunをチェック
-                    for run in paragraph.runs:
-                        if search_text in run.text:
-                            run.text = run.text.replace(search_text, replace_text)
-                            replacement_count += 1
-
-            # テーブル内のテキストも置換
-            for table in doc.tables:
-                for row in table.rows:
-                    for cell in row.cells:
-                        for paragraph in cell.paragraphs:
-                            for run in paragraph.runs:
-                                if search_text in run.text:
-                                    run.text = run.text.replace(search_text, replace_text)
-                                    replacement_count += 1
-
-            # テキストボックスや図形内のテキストも置換
-            # 1. インライン図形
-            for shape in doc.inline_shapes:
-                if hasattr(shape, 'text_frame') and shape.text_frame:
-                    for paragraph in shape.text_frame.paragraphs:
-                        for run in paragraph.runs:
-                            if search_text in run.text:
-                                run.text = run.text.replace(search_text, replace_text)
-                                replacement_count += 1
-            
-            # 2. フローティング図形（テキストボックス、図形など）
-            for paragraph in doc.paragraphs:
-                for run in paragraph.runs:
-                    # 図形内のテキストを検索
-                    if hasattr(run, '_element') and run._element.tag.endswith('drawing'):
-                        # 図形内のテキストを処理
-                        for text_elem in run._element.iter():
-                            if text_elem.tag.endswith('t'):  # テキスト要素
-                                if search_text in text_elem.text:
-                                    text_elem.text = text_elem.text.replace(search_text, replace_text)
-                                    replacement_count += 1
-            
-            # 3. XMLレベルでの包括的な検索（図形内のテキスト）
-            try:
-                # 文書全体のXMLを検索
-                for elem in doc._element.iter():
-                    if elem.tag.endswith('t'):  # テキスト要素
-                        if elem.text and search_text in elem.text:
-                            elem.text = elem.text.replace(search_text, replace_text)
-                            replacement_count += 1
-            except Exception as xml_error:
-                print(f"XML検索エラー（無視）: {xml_error}")
-
-            # ヘッダーとフッター内のテキストも置換
-            for section in doc.sections:
-                # ヘッダー
-                if section.header:
-                    for paragraph in section.header.paragraphs:
-                        for run in paragraph.runs:
-                            if search_text in run.text:
-                                run.text = run.text.replace(search_text, replace_text)
-                                replacement_count += 1
-                
-                # フッター
-                if section.footer:
-                    for paragraph in section.footer.paragraphs:
-                        for run in paragraph.runs:
-                            if search_text in run.text:
-                                run.text = run.text.replace(search_text, replace_text)
-                                replacement_count += 1
-
-            # 新しいファイル名を生成（タイムスタンプ付き）
-            base_name = os.path.splitext(file_path)[0]
-            extension = os.path.splitext(file_path)[1]
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            new_file_path = f"{base_name}_processed_{timestamp}{extension}"
-            
-            # 新しいファイルとして保存
-            doc.save(new_file_path)
-
-            return replacement_count, new_file_path
+        """Wordファイル内のテキストを置換（キー文字列が1つの場合）"""
+        counts, new_file_path = self.replace_placeholders_in_word(file_path, {search_text: replace_text})
+        return counts[search_text], new_file_path
+
+    def replace_placeholders_in_word(self, file_path, replacements):
+        """
+        Wordファイル内の複数のキー文字列をまとめて置換
+
+        テンプレートはコンパイル済みのもの（テンプレートと同じフォルダーにキャッシュ）を使用し、
+        キー文字列を含むパートだけを書き換えます（画像などはそのままコピー）。
 
+        Args:
+            file_path (str): Wordファイル
+            replacements (dict): キー文字列 → 置換後の文字列
+
+        Returns:
+            tuple: (キー文字列ごとの置換回数, 新ファイルのパス)
+        """
+        try:
+            template = WordTemplate.load(file_path, replacements)
+            new_file_path = processed_path(file_path)
+            return template.fill(replacements, new_file_path), new_file_path
         except Exception as e:
-            print(f"Wordファイル処理エラー: {str(e)}")
+            logger.exception("Wordファイル処理エラー: %s", file_path)
             raise Exception(f"Wordファイルの処理中にエラーが発生しました: {str(e)}")
 
     def get_model_type(self, model):
@@ -704,99 +670,129 @@ class NewRPASystem:
         else:
             return "unknown"
 
+    @timed("convert_doc_to_docx")
     def convert_doc_to_docx(self, doc_path, docx_path):
-        """docファイルをdocxファイルに変換"""
+        """docファイルをdocxファイルに変換（失敗した場合は理由をlast_conversion_errorに保持）"""
+        self.last_conversion_error = ""
         try:
-            # まずLibreOfficeを使用して変換を試行
-            cmd = [
-                'soffice',
-                '--headless',
-                '--convert-to', 'docx',
-                '--outdir', os.path.dirname(docx_path),
-                doc_path
-            ]
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
-            
-            if result.returncode == 0 and os.path.exists(docx_path):
-                return True
-            else:
-                # LibreOfficeが利用できない場合は、ファイルをコピーして拡張子を変更
-                import shutil
-                shutil.copy2(doc_path, docx_path)
-                if os.path.exists(docx_path):
-                    return True
-                return False
-        except Exception as e:
-            print(f"変換エラー: {str(e)}")
-            try:
-                # フォールバック: ファイルをコピーして拡張子を変更
-                import shutil
-                shutil.copy2(doc_path, docx_path)
-                return os.path.exists(docx_path)
-            except Exception as e2:
-                print(f"フォールバック変換エラー: {str(e2)}")
-                return False
+            get_conversion_service().convert_file(doc_path, docx_path)
+            return True
+        except ConversionError as e:
+            logger.warning("変換エラー: %s", e)
+            self.last_conversion_error = str(e)
+            return False
+
+    def prepare_word_file(self, file_path=None, task=None):
+        """
+        処理するWordファイルの決定（check2.docがある場合は.docxに変換）
+
+        画面を操作しないため、ワーカースレッドから呼び出せます。
+
+        Args:
+            file_path (str): Wordファイル（省略時はcheck2.docx、check2.doc）
+            task (Task): 進捗の通知先
+
+        Returns:
+            tuple: (Wordファイル, 変換元の.docファイル（変換していない場合はNone）)
+
+        Raises:
+            FileNotFoundError: ファイルが見つからない場合
+            ConversionError: .docの変換に失敗した場合
+        """
+        if file_path:
+            return file_path, None
+
+        # デフォルトでcheck2.docxファイルを使用
+        docx_file = "check2.docx"
+        doc_file = "check2.doc"
+
+        if os.path.exists(docx_file):
+            return docx_file, None
+        if os.path.exists(doc_file):
+            # .docファイルが存在する場合は.docxに変換を試行
+            if task is not None:
+                task.report(0, 2, f"{doc_file}を変換中")
+            if self.convert_doc_to_docx(doc_file, docx_file):
+                return docx_file, doc_file
+            raise ConversionError(
+                f"ファイル変換に失敗しました。\n{self.last_conversion_error}\n\n"
+                f"{doc_file}を手動で.docx形式に変換してください。"
+            )
+        raise FileNotFoundError(f"ファイルが見つかりません:\n{docx_file} または {doc_file}")
+
+    def build_word_file(self, task, order, manufacturing, file_path=None):
+        """
+        Wordファイルの作成（ワーカースレッド）
+
+        Returns:
+            tuple: (Wordファイル, 変換元の.docファイル, キー文字列ごとの置換回数, 新ファイルのパス)
+        """
+        file_path, converted_from = self.prepare_word_file(file_path, task)
+        task.report(1, 2, "キー文字列を置換中")
+
+        # すべてのキー文字列を1回の走査で置換し、1回だけ保存
+        inputs = {"manufacturing": manufacturing, "order": order}
+        job = self.run_document_job(WORD, file_path, inputs, order_processed_path(file_path, order, manufacturing))
+        return file_path, converted_from, job.result["counts"], job.output_path
+
+    def show_word_result(self, file_path, new_file_path, counts, order, manufacturing):
+        """
+        Word処理の結果のメッセージ
+
+        Returns:
+            tuple: (置換したか, 新ファイルのパス)
+        """
+        # 置換対象のキー文字列と置換後の文字列（検査対象情報 → 受注番号/製造番号）
+        replacements = inspection_replacements(order, manufacturing)
+        replacement_text = replacements[INSPECTION_KEY]
+        key_strings = list(replacements)
+        total_replacements = sum(counts.values())
+
+        if total_replacements > 0:
+            messagebox.showinfo(
+                "成功",
+                f"Wordファイルの処理が完了しました:\n"
+                f"元ファイル: {os.path.basename(file_path)}\n"
+                f"新ファイル: {os.path.basename(new_file_path)}\n"
+                f"置換回数: {total_replacements}回\n"
+                f"置換内容: {replacement_text}",
+            )
+            return True, new_file_path
+        else:
+            messagebox.showwarning(
+                "警告",
+                f"置換対象のキー文字列が見つかりませんでした。\n"
+                f"検索対象キー文字列: {', '.join(key_strings)}",
+            )
+            return False, None
+
+    def show_word_error(self, error):
+        """Word処理の失敗のメッセージ"""
+        if isinstance(error, (FileNotFoundError, ConversionError)):
+            messagebox.showerror("エラー", str(error))
+        else:
+            messagebox.showerror("エラー", f"Wordファイルの処理に失敗しました:\n{str(error)}")
 
     def process_word_file(self, username, model, manufacturing, order, file_path=None):
         """Wordファイルを処理してキー文字列を置換"""
         try:
-            # デフォルトでcheck2.docxファイルを使用
-            if not file_path:
-                docx_file = "check2.docx"
-                doc_file = "check2.doc"
-                
-                if os.path.exists(docx_file):
-                    file_path = docx_file
-                elif os.path.exists(doc_file):
-                    # .docファイルが存在する場合は.docxに変換を試行
-                    if self.convert_doc_to_docx(doc_file, docx_file):
-                        file_path = docx_file
-                        messagebox.showinfo("情報", f"ファイルを変換しました: {doc_file} → {docx_file}")
-                    else:
-                        messagebox.showerror("エラー", f"ファイル変換に失敗しました。\n{doc_file}を手動で.docx形式に変換してください。")
-                        return False
-                else:
-                    messagebox.showerror("エラー", f"ファイルが見つかりません:\n{docx_file} または {doc_file}")
-                    return False
-
-            # 置換用のテキストを生成
-            replacement_text = f"{order}/{manufacturing}"
-
-            # 置換対象のキー文字列（検査対象情報のみ）
-            key_strings = ["検査対象情報"]
-
-            total_replacements = 0
-
-            # キー文字列を置換
-            new_file_path = None
-            for key_string in key_strings:
-                count, new_file_path = self.replace_text_in_word(file_path, key_string, replacement_text)
-                total_replacements += count
-
-            if total_replacements > 0:
-                messagebox.showinfo(
-                    "成功",
-                    f"Wordファイルの処理が完了しました:\n"
-                    f"元ファイル: {os.path.basename(file_path)}\n"
-                    f"新ファイル: {os.path.basename(new_file_path)}\n"
-                    f"置換回数: {total_replacements}回\n"
-                    f"置換内容: {replacement_text}",
-                )
-                return True, new_file_path
-            else:
-                messagebox.showwarning(
-                    "警告",
-                    f"置換対象のキー文字列が見つかりませんでした。\n"
-                    f"検索対象キー文字列: {', '.join(key_strings)}",
+            # 処理時間にはメッセージの表示（確認待ち）を含めない
+            with operation("process_word_file").time():
+                file_path, converted_from = self.prepare_word_file(file_path)
+                counts, new_file_path = self.replace_placeholders_in_word(
+                    file_path, inspection_replacements(order, manufacturing)
                 )
-                return False, None
+            if converted_from:
+                messagebox.showinfo("情報", f"ファイルを変換しました: {converted_from} → {file_path}")
+
+            return self.show_word_result(file_path, new_file_path, counts, order, manufacturing)
 
         except Exception as e:
-            messagebox.showerror("エラー", f"Wordファイルの処理に失敗しました:\n{str(e)}")
+            self.show_word_error(e)
             return False, None
 
     def process_word_direct(self):
-        """入力データを直接Wordファイルに適用"""
+        """入力データを直接Wordファイルに適用（変換・置換はバックグラウンドで実行）"""
         try:
             # 入力値の取得
             username = self.username_var.get().strip()
@@ -810,27 +806,109 @@ class NewRPASystem:
                 messagebox.showerror("入力エラー", validation_result["message"])
                 return
 
-            # Wordファイルを処理
-            success, new_file_path = self.process_word_file(username, model, manufacturing, order)
+            # Wordファイルを処理（変換結果を共有するため、Word処理は登録順に1件ずつ）
+            self.task_runner.submit(
+                f"Word処理（{order}）",
+                self.build_word_file,
+                order,
+                manufacturing,
+                key="word",
+                on_done=lambda outcome: self.finish_word_direct(username, model, manufacturing, order, *outcome),
+                on_error=self.show_word_error,
+            )
+
+        except Exception as e:
+            messagebox.showerror("エラー", f"Word処理中にエラーが発生しました: {str(e)}")
+
+    def finish_word_direct(self, username, model, manufacturing, order, file_path, converted_from, counts, new_file_path):
+        """Word処理完了後の表示"""
+        if converted_from:
+            messagebox.showinfo("情報", f"ファイルを変換しました: {converted_from} → {file_path}")
 
-            if success:
-                # 結果表示エリアに更新
-                self.display_result(username, model, manufacturing, order)
+        success, new_file_path = self.show_word_result(file_path, new_file_path, counts, order, manufacturing)
 
-                # 追加のWord処理完了メッセージ
-                word_result = f"""\n\n📝 Word処理完了:
-✅ 元ファイル: check2.docx
+        if success:
+            # 結果表示エリアに更新
+            self.display_result(username, model, manufacturing, order)
+
+            # 追加のWord処理完了メッセージ
+            word_result = f"""\n\n📝 Word処理完了:
+✅ 元ファイル: {os.path.basename(file_path)}
 ✅ 新ファイル: {os.path.basename(new_file_path)}
 ✅ キー文字列「検査対象情報」を「{order}/{manufacturing}」に置換
 ✅ 新しいファイルとして保存されました"""
 
-                self.result_text.insert(tk.END, word_result)
+            self.result_text.insert(tk.END, word_result)
 
-        except Exception as e:
-            messagebox.showerror("エラー", f"Word処理中にエラーが発生しました: {str(e)}")
+    # ==================== ジョブキュー ====================
+
+    def run_document_job(self, kind, template_path, inputs, output_path):
+        """
+        書類作成ジョブをキューに登録して実行（ワーカースレッド）
+
+        キューに記録してから作成するため、途中で終了しても次回の起動時に再開されます。
+
+        Args:
+            kind (str): ジョブの種類（EXCEL、WORD）
+            template_path (str): テンプレート
+            inputs (dict): 入力値
+            output_path (str): 出力ファイル
+
+        Returns:
+            Job: 完了したジョブ
+
+        Raises:
+            JobError: 作成に失敗した場合
+        """
+        job_id = self.job_queue.enqueue(kind, template_path, inputs, output_path, GUI_BATCH)
+        job = self.job_runner.run_id(job_id)
+        if job.state == FAILED:
+            raise JobError(job.error)
+        return job
+
+    def prewarm_templates(self):
+        """既定のテンプレート（check1.xlsx、check2.docx）の読み込み（事前読み込みのスレッド）"""
+        for kind, template_path in ((EXCEL, "check1.xlsx"), (WORD, "check2.docx")):
+            if os.path.exists(template_path):
+                self.job_runner.load_template(kind, template_path)
+
+    def resume_jobs(self):
+        """前回中断したジョブの再開（バックグラウンドで実行）"""
+        self.task_runner.submit(
+            "中断したジョブの再開",
+            self.run_pending_jobs,
+            on_done=self.show_resumed_jobs,
+            on_error=lambda e: messagebox.showerror("エラー", f"中断したジョブの再開に失敗しました:\n{str(e)}"),
+        )
+
+    def run_pending_jobs(self, task):
+        """
+        待機中のジョブの実行（ワーカースレッド）
+
+        Returns:
+            tuple: (完了件数, 失敗件数)
+        """
+        return self.job_runner.run_pending(
+            GUI_BATCH,
+            progress=lambda job: task.report(0, None, os.path.basename(job.output_path)),
+            should_stop=lambda: task.cancelled,
+        )
+
+    def show_resumed_jobs(self, outcome):
+        """再開したジョブの結果を表示"""
+        done, failed = outcome
+        if done or failed:
+            self.result_text.insert(
+                tk.END, f"\n\n🔁 中断していたジョブを再開しました:\n✅ 完了: {done}件\n❌ 失敗: {failed}件"
+            )
 
     # ==================== メイン実行メソッド ====================
 
+    def on_close(self):
+        """ウィンドウを閉じる（実行中・待機中の処理はキャンセル）"""
+        self.task_runner.close()
+        self.root.destroy()
+
     def run(self):
         """GUIの実行"""
         self.root.mainloop()
@@ -839,5 +917,7 @@ class NewRPASystem:
 # ==================== メイン実行部分 ====================
 
 if __name__ == "__main__":
+    setup_logging()
+    start_exporter()
     rpa = NewRPASystem()
     rpa.run()
@@ -0,0 +1,587 @@
+"""
+検査表一括計算（コマンドライン版）
+
+sample_data.csvと同じ形式（機種,棚数,インチ数,高さ）の入力ファイルを
+チャンク単位で読み込みながら計算し、結果をCSVまたはJSON Linesで逐次出力します。
+メモリ使用量はチャンクサイズで決まるため、数百万行のファイルも処理できます。
+不正な行はダイアログを表示せず、理由を付けてリジェクトファイルに出力します。
+
+使用方法:
+    python rpa_batch.py sample_data.csv -o results.csv
+    python rpa_batch.py orders.csv -o results.jsonl --format jsonl --rejects rejects.csv
+    python rpa_batch.py history.csv -o results.csv --workers 32
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+
+import numpy as np
+
+from rpa_engine import current_grid, current_rules
+from rpa_vector import RESULT_COLUMNS, compute_arrays, grid_arrays
+
+# 入力ファイルの列
+INPUT_COLUMNS = ["機種", "棚数", "インチ数", "高さ"]
+
+# 出力ファイルの列（行番号、入力値、計算結果）
+OUTPUT_COLUMNS = ["line", "machine", "shelf_count", "inch", "height"] + RESULT_COLUMNS
+
+# リジェクトファイルの列
+REJECT_COLUMNS = ["line"] + INPUT_COLUMNS + ["reason"]
+
+# 出力形式
+OUTPUT_FORMATS = ["csv", "jsonl"]
+
+DEFAULT_CHUNK_SIZE = 10000
+
+# 配列で計算できる高さの範囲（rpa_vectorはint64で計算する。棚数の上限はGridArrays.max_shelf_count）
+INT64_MIN = int(np.iinfo(np.int64).min)
+INT64_MAX = int(np.iinfo(np.int64).max)
+
+# ==================== 入力・検証 ====================
+
+
+def read_chunks(stream, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    入力CSVをチャンク単位で読み込み
+
+    1行目はヘッダー（機種,棚数,インチ数,高さ）として読み飛ばします。
+
+    Args:
+        stream: 入力ファイルオブジェクト
+        chunk_size (int): 1チャンクの行数
+
+    Yields:
+        list: (行番号, 列のリスト) のリスト
+    """
+    reader = csv.reader(stream)
+    header = next(reader, None)
+    if header is None:
+        return
+    _check_header(header)
+
+    chunk = []
+    for fields in reader:
+        if not fields:
+            continue
+        chunk.append((reader.line_num, fields))
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def iter_input_rows(file_path, encoding="utf-8-sig"):
+    """
+    入力ファイル（CSVまたはExcel）を1行ずつ読み込み
+
+    Excelファイルは最初のシートを読み込み専用モードで開きます。
+    どちらの形式も1行目はヘッダー（機種,棚数,インチ数,高さ）です。
+
+    Args:
+        file_path (str): 入力ファイル（.csv, .xlsx）
+        encoding (str): CSVファイルの文字コード
+
+    Yields:
+        tuple: (行番号, 列のリスト)。列の値は文字列
+    """
+    if os.path.splitext(file_path)[1].lower() in [".xlsx", ".xlsm"]:
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            rows = workbook.worksheets[0].iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                return
+            _check_header([_cell_text(value) for value in header])
+            for line, values in enumerate(rows, start=2):
+                fields = [_cell_text(value) for value in values]
+                while fields and fields[-1] == "":
+                    fields.pop()
+                if fields:
+                    yield line, fields
+        finally:
+            workbook.close()
+    else:
+        with open(file_path, encoding=encoding, newline="") as stream:
+            for chunk in read_chunks(stream):
+                yield from chunk
+
+
+def _cell_text(value):
+    """Excelのセル値を文字列に変換（整数値の小数は整数として扱う）"""
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _check_header(header):
+    """ヘッダー行の確認"""
+    if [column.strip() for column in header] != INPUT_COLUMNS:
+        raise ValueError(f"入力ファイルのヘッダーが正しくありません: {','.join(header)}（期待値: {','.join(INPUT_COLUMNS)}）")
+
+
+def _parse_int(value):
+    """整数に変換（変換できない場合はNone）"""
+    try:
+        return int(value.strip())
+    except (AttributeError, ValueError):
+        return None
+
+
+def parse_row(fields, rules=None, max_shelf_count=None):
+    """
+    入力行の検証
+
+    Args:
+        fields (list): 列のリスト（機種, 棚数, インチ数, 高さ）
+        rules (RuleSet): 計算ルール（省略時は現在のルール）
+        max_shelf_count (int): 棚数の絶対値の上限（省略時は現在の参照テーブルのGridArrays.max_shelf_count）
+
+    Returns:
+        tuple: ((機種, 棚数, インチ数, 高さ), 理由のリスト)。理由が空なら有効な行
+    """
+    if len(fields) != len(INPUT_COLUMNS):
+        return None, [f"列数が{len(INPUT_COLUMNS)}ではありません（{len(fields)}列）"]
+
+    reasons = []
+    machine = fields[0].strip()
+    shelf_count = _parse_int(fields[1])
+    inch = _parse_int(fields[2])
+    height = _parse_int(fields[3])
+
+    rules = rules or current_rules()
+    if max_shelf_count is None:
+        max_shelf_count = grid_arrays().max_shelf_count
+    machine_info = rules.machine_data.get(machine)
+    if machine_info is None:
+        reasons.append(f"無効な機種です: {machine}")
+
+    if shelf_count is None:
+        reasons.append(f"棚数が数値ではありません: {fields[1]}")
+    elif not -max_shelf_count <= shelf_count <= max_shelf_count:
+        reasons.append(f"棚数が大きすぎます（絶対値は{max_shelf_count}まで）: {fields[1].strip()}")
+
+    if inch is None:
+        reasons.append(f"インチ数が数値ではありません: {fields[2]}")
+    elif machine_info is not None and inch not in machine_info["inches"]:
+        reasons.append(f"インチ数{inch}は機種{machine}では使用できません")
+
+    if height is None:
+        reasons.append(f"高さが数値ではありません: {fields[3]}")
+    elif not INT64_MIN <= height <= INT64_MAX:
+        reasons.append(f"高さが大きすぎます: {fields[3].strip()}")
+    elif height < rules.min_height:
+        reasons.append(f"高さは最小{rules.min_height}mm以上です: {height}")
+    elif (height - rules.min_height) % rules.height_resolution != 0:
+        reasons.append(f"高さは{rules.min_height}mmから{rules.height_resolution}mm刻みです: {height}")
+
+    return (machine, shelf_count, inch, height), reasons
+
+
+def calculate_chunk(chunk):
+    """
+    1チャンク分の検証と計算
+
+    Args:
+        chunk (list): (行番号, 列のリスト) のリスト
+
+    Returns:
+        tuple: (結果行のリスト, リジェクト行のリスト)。
+            結果行はOUTPUT_COLUMNSの順、リジェクト行はREJECT_COLUMNSの順
+    """
+    # チャンクの途中でルールファイルが読み込み直されても、検証と計算は同じルールで行う
+    grid = current_grid()
+    rules = grid.rules
+    valid_machine_inches = rules.machine_inches
+    min_height = rules.min_height
+    height_resolution = rules.height_resolution
+    max_shelf_count = grid_arrays(grid).max_shelf_count
+
+    valid_lines = []
+    valid_inputs = []
+    rejects = []
+    for line, fields in chunk:
+        # 有効な行は簡易チェックのみで通し、不正な行だけparse_rowで理由を求める
+        try:
+            machine, shelf_count, inch, height = fields
+            values = (machine.strip(), int(shelf_count), int(inch), int(height))
+        except ValueError:
+            values = None
+        if (
+            values is not None
+            and (values[0], values[2]) in valid_machine_inches
+            and -max_shelf_count <= values[1] <= max_shelf_count
+            and min_height <= values[3] <= INT64_MAX
+            and (values[3] - min_height) % height_resolution == 0
+        ):
+            valid_lines.append(line)
+            valid_inputs.append(values)
+        else:
+            _, reasons = parse_row(fields, rules, max_shelf_count)
+            rejects.append([line] + _pad_fields(fields) + ["; ".join(reasons)])
+
+    if not valid_inputs:
+        return [], rejects
+
+    machines, shelf_counts, inches, heights = zip(*valid_inputs)
+    results = compute_arrays(list(machines), list(shelf_counts), list(inches), list(heights), grid)
+    columns = [_column_values(results[column]) for column in RESULT_COLUMNS]
+    valid = results["valid"].tolist()
+
+    records = []
+    for index, line in enumerate(valid_lines):
+        if not valid[index]:
+            rejects.append([line] + list(valid_inputs[index]) + ["B値が定義されていない組み合わせです"])
+            continue
+        records.append([line] + list(valid_inputs[index]) + [column[index] for column in columns])
+
+    rejects.sort(key=lambda reject: reject[0])
+    return records, rejects
+
+
+def _column_values(values):
+    """計算結果の配列をリストに変換（整数値はintにして小数点なしで出力する）"""
+    integral = values == np.floor(values)
+    if integral.all():
+        return values.astype(np.int64).tolist()
+    return [int(value) if is_integral else value for value, is_integral in zip(values.tolist(), integral.tolist())]
+
+
+def _pad_fields(fields):
+    """リジェクト行の入力列を4列にそろえる"""
+    fields = list(fields[: len(INPUT_COLUMNS)])
+    return fields + [""] * (len(INPUT_COLUMNS) - len(fields))
+
+
+# ==================== 出力 ====================
+
+
+def format_csv(records):
+    """
+    結果行をCSVのテキストに変換
+
+    Args:
+        records (list): 結果行のリスト（OUTPUT_COLUMNSの順）
+
+    Returns:
+        str: CSVテキスト（ヘッダーなし）
+    """
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(records)
+    return buffer.getvalue()
+
+
+def format_jsonl(records):
+    """
+    結果行をJSON Linesのテキストに変換
+
+    Args:
+        records (list): 結果行のリスト（OUTPUT_COLUMNSの順）
+
+    Returns:
+        str: JSON Linesテキスト
+    """
+    return "".join(json.dumps(dict(zip(OUTPUT_COLUMNS, record)), ensure_ascii=False) + "\n" for record in records)
+
+
+RESULT_FORMATTERS = {"csv": format_csv, "jsonl": format_jsonl}
+
+
+def _open_output(path, encoding):
+    """出力先を開く（"-"は標準出力）"""
+    if path == "-":
+        return sys.stdout, False
+    return open(path, "w", encoding=encoding, newline=""), True
+
+
+# ==================== 並列実行 ====================
+
+
+def _init_worker():
+    """
+    ワーカープロセスの初期化
+
+    参照テーブルはモジュール読み込み時に1プロセス1回だけ構築され、ルールファイルが更新された場合は
+    各ワーカーが次のチャンクの計算時に読み込み直します（ワーカーの再起動は不要）。
+    ここで小さな計算を1回行い、最初のタスクの前に準備を済ませます。
+    """
+    compute_arrays(["200"], [1], [10], [current_rules().min_height])
+
+
+def _calculate_chunk_task(output_format, chunk):
+    """
+    ワーカープロセスで1チャンクを計算
+
+    出力テキストへの変換もワーカーで行い、親プロセスは読み書きだけを行います。
+
+    Returns:
+        tuple: (出力テキスト, 成功行数, リジェクトのCSVテキスト, リジェクト行数, プロセスID, 所要時間)
+    """
+    start = time.perf_counter()
+    records, rejects = calculate_chunk(chunk)
+    text = RESULT_FORMATTERS[output_format](records)
+    return text, len(records), format_csv(rejects), len(rejects), os.getpid(), time.perf_counter() - start
+
+
+def _fail_chunk(chunk, error):
+    """
+    ワーカーの異常終了などで計算できなかったチャンクを全行リジェクトにする
+
+    Returns:
+        tuple: (チャンク, 出力テキスト, 成功行数, リジェクトのCSVテキスト, リジェクト行数)
+    """
+    reason = f"ワーカーエラー: {error.__class__.__name__}: {error}"
+    rejects = [[line] + _pad_fields(fields) + [reason] for line, fields in chunk]
+    return chunk, "", 0, format_csv(rejects), len(rejects)
+
+
+class SerialChunkRunner:
+    """チャンクを現在のプロセスで順に計算"""
+
+    def __init__(self, output_format):
+        """
+        Args:
+            output_format (str): 出力形式（"csv" または "jsonl"）
+        """
+        self.task = partial(_calculate_chunk_task, output_format)
+        self.worker_stats = {}
+        self.failed_chunks = 0
+
+    def map(self, chunks):
+        """
+        チャンクの計算
+
+        Args:
+            chunks: チャンクのイテレータ
+
+        Yields:
+            tuple: (チャンク, 出力テキスト, 成功行数, リジェクトのCSVテキスト, リジェクト行数)
+        """
+        for chunk in chunks:
+            text, ok, reject_text, rejected, pid, elapsed = self.task(chunk)
+            _add_worker_stats(self.worker_stats, pid, len(chunk), elapsed)
+            yield chunk, text, ok, reject_text, rejected
+
+    def close(self):
+        """終了処理"""
+
+
+class ParallelChunkRunner:
+    """
+    チャンクをプロセスプールで並列に計算
+
+    実行中のチャンク数を workers * 2 までに制限してメモリ使用量を一定に保ち、
+    結果は入力の順序で返します。ワーカーが異常終了した場合は、そのチャンクだけを
+    単独のプロセスで再実行し、それでも失敗した場合はそのチャンクのみをリジェクトにします。
+    """
+
+    def __init__(self, output_format, workers, task=_calculate_chunk_task):
+        """
+        Args:
+            output_format (str): 出力形式（"csv" または "jsonl"）
+            workers (int): ワーカープロセス数
+            task (callable): チャンクを計算する関数（_calculate_chunk_taskと同じ引数・戻り値）
+        """
+        self.workers = workers
+        self.task = partial(task, output_format)
+        self.worker_stats = {}
+        self.failed_chunks = 0
+        self.pool = self._create_pool(workers)
+
+    def _create_pool(self, workers):
+        return ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+
+    def map(self, chunks):
+        """
+        チャンクの計算
+
+        Args:
+            chunks: チャンクのイテレータ
+
+        Yields:
+            tuple: (チャンク, 出力テキスト, 成功行数, リジェクトのCSVテキスト, リジェクト行数)
+        """
+        pending = deque()
+        for chunk in chunks:
+            pending.append((chunk, *self._submit(chunk)))
+            if len(pending) >= self.workers * 2:
+                yield self._collect(*pending.popleft())
+        while pending:
+            yield self._collect(*pending.popleft())
+
+    def _submit(self, chunk):
+        """チャンクの投入（(Future, 投入したプール) を返す）"""
+        pool = self.pool
+        try:
+            return pool.submit(self.task, chunk), pool
+        except BrokenProcessPool:
+            self._restart_pool(pool)
+            return self.pool.submit(self.task, chunk), self.pool
+
+    def _collect(self, chunk, future, pool):
+        try:
+            text, ok, reject_text, rejected, pid, elapsed = future.result()
+        except BrokenProcessPool:
+            # 同じプールの他のチャンクが原因の可能性があるため、単独のプロセスで再実行する
+            self._restart_pool(pool)
+            try:
+                with self._create_pool(1) as retry_pool:
+                    text, ok, reject_text, rejected, pid, elapsed = retry_pool.submit(self.task, chunk).result()
+            except Exception as e:
+                self.failed_chunks += 1
+                return _fail_chunk(chunk, e)
+        except Exception as e:
+            self.failed_chunks += 1
+            return _fail_chunk(chunk, e)
+
+        _add_worker_stats(self.worker_stats, pid, len(chunk), elapsed)
+        return chunk, text, ok, reject_text, rejected
+
+    def _restart_pool(self, broken_pool):
+        """
+        異常終了したプールを作り直す
+
+        同じプールの実行中のチャンクはすべてBrokenProcessPoolになるため、
+        作り直し済み（broken_poolが現在のプールではない）の場合は何もしません。
+
+        Args:
+            broken_pool (ProcessPoolExecutor): BrokenProcessPoolを送出したプール
+        """
+        if broken_pool is not self.pool:
+            return
+        broken_pool.shutdown(wait=False, cancel_futures=True)
+        self.pool = self._create_pool(self.workers)
+
+    def close(self):
+        """終了処理"""
+        self.pool.shutdown()
+
+
+def _add_worker_stats(worker_stats, pid, rows, elapsed):
+    """ワーカーごとの処理行数と計算時間を集計"""
+    stats = worker_stats.setdefault(pid, {"rows": 0, "chunks": 0, "busy": 0.0})
+    stats["rows"] += rows
+    stats["chunks"] += 1
+    stats["busy"] += elapsed
+
+
+# ==================== 実行 ====================
+
+
+def run_batch(input_path, output_path, output_format="csv", rejects_path=None, chunk_size=DEFAULT_CHUNK_SIZE,
+              encoding="utf-8-sig", workers=1):
+    """
+    一括計算の実行
+
+    Args:
+        input_path (str): 入力CSVファイル（"-"は標準入力）
+        output_path (str): 出力ファイル（"-"は標準出力）
+        output_format (str): 出力形式（"csv" または "jsonl"）
+        rejects_path (str): リジェクトファイル（Noneの場合は出力ファイル名から生成）
+        chunk_size (int): 1チャンクの行数
+        encoding (str): 入力ファイルの文字コード
+        workers (int): ワーカープロセス数（1の場合は現在のプロセスで計算）
+
+    Returns:
+        dict: 処理件数と所要時間 {"rows", "ok", "rejected", "elapsed", "failed_chunks", "workers"}。
+            "workers"はプロセスIDごとの {"rows", "chunks", "busy"}
+    """
+    if rejects_path is None:
+        base = "rejects" if output_path == "-" else os.path.splitext(output_path)[0]
+        rejects_path = f"{base}_rejects.csv"
+
+    stats = {"rows": 0, "ok": 0, "rejected": 0, "elapsed": 0.0}
+    start = time.perf_counter()
+
+    input_stream = sys.stdin if input_path == "-" else open(input_path, encoding=encoding, newline="")
+    output_stream, close_output = _open_output(output_path, "utf-8")
+    runner = ParallelChunkRunner(output_format, workers) if workers > 1 else SerialChunkRunner(output_format)
+    try:
+        with open(rejects_path, "w", encoding="utf-8", newline="") as rejects_stream:
+            if output_format == "csv":
+                csv.writer(output_stream).writerow(OUTPUT_COLUMNS)
+            csv.writer(rejects_stream).writerow(REJECT_COLUMNS)
+
+            for chunk, text, ok, reject_text, rejected in runner.map(read_chunks(input_stream, chunk_size)):
+                output_stream.write(text)
+                rejects_stream.write(reject_text)
+                stats["rows"] += len(chunk)
+                stats["ok"] += ok
+                stats["rejected"] += rejected
+    finally:
+        runner.close()
+        if input_stream is not sys.stdin:
+            input_stream.close()
+        if close_output:
+            output_stream.close()
+        else:
+            output_stream.flush()
+
+    stats["elapsed"] = time.perf_counter() - start
+    stats["rejects_path"] = rejects_path
+    stats["failed_chunks"] = runner.failed_chunks
+    stats["workers"] = runner.worker_stats
+    return stats
+
+
+def main(argv=None):
+    """コマンドラインからの実行"""
+    parser = argparse.ArgumentParser(description="検査表一括計算")
+    parser.add_argument("input", help="入力CSVファイル（機種,棚数,インチ数,高さ）。'-'で標準入力")
+    parser.add_argument("-o", "--output", default="-", help="出力ファイル。'-'で標準出力（既定）")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default="csv", help="出力形式（既定: csv）")
+    parser.add_argument("--rejects", help="リジェクトファイル（既定: <出力ファイル名>_rejects.csv）")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="1チャンクの行数")
+    parser.add_argument("--encoding", default="utf-8-sig", help="入力ファイルの文字コード（既定: utf-8-sig）")
+    parser.add_argument("--workers", type=int, default=1, help="ワーカープロセス数（既定: 1）")
+    args = parser.parse_args(argv)
+
+    if args.chunk_size <= 0:
+        parser.error("--chunk-size は1以上を指定してください")
+    if args.workers <= 0:
+        parser.error("--workers は1以上を指定してください")
+
+    try:
+        stats = run_batch(
+            args.input, args.output, args.format, args.rejects, args.chunk_size, args.encoding, args.workers
+        )
+    except (OSError, ValueError) as e:
+        print(f"エラー: {e}", file=sys.stderr)
+        return 1
+
+    rate = stats["rows"] / stats["elapsed"] if stats["elapsed"] > 0 else 0.0
+    print(
+        f"処理完了: {stats['rows']}行（成功 {stats['ok']}行、リジェクト {stats['rejected']}行）"
+        f" {stats['elapsed']:.2f}秒 {rate:,.0f}行/秒",
+        file=sys.stderr,
+    )
+    for number, (pid, worker) in enumerate(sorted(stats["workers"].items()), start=1):
+        worker_rate = worker["rows"] / worker["busy"] if worker["busy"] > 0 else 0.0
+        print(
+            f"  ワーカー{number} (PID {pid}): {worker['rows']}行 {worker['chunks']}チャンク"
+            f" 計算時間 {worker['busy']:.2f}秒 {worker_rate:,.0f}行/秒",
+            file=sys.stderr,
+        )
+    if stats["failed_chunks"]:
+        print(f"失敗したチャンク: {stats['failed_chunks']}件（リジェクトに出力）", file=sys.stderr)
+    if stats["rejected"]:
+        print(f"リジェクト: {stats['rejects_path']}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
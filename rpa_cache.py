@@ -0,0 +1,314 @@
+"""
+計算結果のキャッシュ
+
+GUIの計算ボタンや一括処理では、同じ (機種, 棚数, インチ数, 高さ) の組み合わせが繰り返し計算されます。
+ResultCacheは計算結果をLRU（最近使われていないものから削除）で保持し、同じ入力の計算を省略します。
+キーには入力値に加えて計算ルールのハッシュ（RuleSet.digest）を使用するため、
+ルールファイルが更新されると以前の計算結果は使用されません。
+
+永続化（任意）:
+    ResultStoreを指定すると計算結果をSQLiteのファイルに保存し、次回の起動時やルールファイルの切り替え時に、
+    そのルールの最近の計算結果をまとめて読み込みます。1件の計算（数マイクロ秒）はSQLiteの1回の検索より
+    速いため、計算のたびにファイルを検索することはせず、読み込みはルールごとに1回、
+    書き込みはSTORE_FLUSH_ENTRIES件ごと（と終了時）にまとめて行います。
+
+ヒット数、ミス数、削除数はstats()と、rpa_metricsのカウンター（rpa_cache_hits_total など）で確認できます。
+
+環境変数（get_cache()で使用）:
+    RPA_CACHE_SIZE: メモリに保持する件数（既定: 1024。0の場合はキャッシュしない）
+    RPA_CACHE_DB: 計算結果を保存するファイル（既定: 保存しない）
+"""
+
+import atexit
+import json
+import logging
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from rpa_engine import CalcResult, compute, current_grid
+from rpa_metrics import CACHE_EVICTION_METRIC, CACHE_HIT_METRIC, CACHE_MISS_METRIC, REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# 環境変数
+CACHE_SIZE_ENV = "RPA_CACHE_SIZE"
+CACHE_DB_ENV = "RPA_CACHE_DB"
+
+# メモリに保持する件数の既定値（実際の入力は数百種類程度）
+DEFAULT_MAX_ENTRIES = 1024
+
+# ファイルに保持する件数の上限（古いものから削除）
+STORE_MAX_ENTRIES = 100000
+
+# ファイルにまとめて書き込む件数
+STORE_FLUSH_ENTRIES = 256
+
+# ファイルの形式のバージョン（PRAGMA user_version）
+SCHEMA_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY,
+    rules TEXT NOT NULL,
+    machine TEXT NOT NULL,
+    shelf_count INTEGER NOT NULL,
+    inch INTEGER NOT NULL,
+    height INTEGER NOT NULL,
+    result TEXT NOT NULL,
+    UNIQUE (rules, machine, shelf_count, inch, height)
+);
+"""
+
+
+class ResultStore:
+    """
+    計算結果のファイル（SQLite）
+
+    書き込みはadd()でためておき、flush()でまとめて書き込みます。
+    複数のスレッドから呼び出せます（接続は1つをロックで排他）。
+    """
+
+    def __init__(self, path, max_entries=STORE_MAX_ENTRIES):
+        """
+        ファイルを開く（なければ作成）
+
+        Args:
+            path (str): ファイル
+            max_entries (int): 保持する件数の上限
+
+        Raises:
+            sqlite3.Error: ファイルを開けない、または対応していない形式の場合
+        """
+        self.path = os.path.abspath(path)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._pending = []
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._connection = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        version = self._connection.execute("PRAGMA user_version").fetchone()[0]
+        if version > SCHEMA_VERSION:
+            self._connection.close()
+            raise sqlite3.DatabaseError(f"キャッシュの形式（{version}）に対応していません: {self.path}")
+        if version < SCHEMA_VERSION:
+            self._connection.executescript(_SCHEMA)
+            self._connection.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+
+    def load(self, rules, limit):
+        """
+        保存済みの計算結果の読み込み
+
+        Args:
+            rules (str): 計算ルールのハッシュ
+            limit (int): 読み込む件数の上限（新しいものから）
+
+        Returns:
+            list: ((機種, 棚数, インチ数, 高さ), CalcResult) のリスト（古い順）
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT machine, shelf_count, inch, height, result FROM results WHERE rules = ? ORDER BY id DESC LIMIT ?",
+                (rules, limit),
+            ).fetchall()
+        return [
+            ((machine, shelf_count, inch, height), CalcResult(*json.loads(result)))
+            for machine, shelf_count, inch, height, result in reversed(rows)
+        ]
+
+    def add(self, rules, key, result):
+        """
+        計算結果の追加（STORE_FLUSH_ENTRIES件たまったら書き込む）
+
+        Args:
+            rules (str): 計算ルールのハッシュ
+            key (tuple): (機種, 棚数, インチ数, 高さ)
+            result (CalcResult): 計算結果
+        """
+        with self._lock:
+            self._pending.append((rules,) + tuple(key) + (json.dumps(result),))
+            if len(self._pending) < STORE_FLUSH_ENTRIES:
+                return
+        self.flush()
+
+    def flush(self):
+        """ためておいた計算結果の書き込み（上限を超えた古い計算結果は削除）"""
+        with self._lock:
+            pending, self._pending = self._pending, []
+            if not pending:
+                return
+            connection = self._connection
+            try:
+                connection.execute("BEGIN IMMEDIATE")
+                connection.executemany(
+                    "INSERT OR REPLACE INTO results (rules, machine, shelf_count, inch, height, result) VALUES (?, ?, ?, ?, ?, ?)",
+                    pending,
+                )
+                connection.execute(
+                    "DELETE FROM results WHERE id <= (SELECT MAX(id) FROM results) - ?", (self.max_entries,)
+                )
+                connection.execute("COMMIT")
+            except sqlite3.Error as e:
+                if connection.in_transaction:
+                    connection.execute("ROLLBACK")
+                logger.warning("計算結果のキャッシュを保存できません（無視）: %s", e)
+
+    def close(self):
+        """ためておいた計算結果を書き込んで閉じる"""
+        self.flush()
+        with self._lock:
+            self._connection.close()
+
+
+class ResultCache:
+    """
+    計算結果のLRUキャッシュ
+
+    compute()はrpa_engine.compute()と同じ引数・戻り値で、キャッシュにあれば計算を省略します。
+    入力が不正な場合（CalculationError）はキャッシュせず、毎回例外を送出します。
+    複数のスレッドから呼び出せます。
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, store=None, name="calculation"):
+        """
+        Args:
+            max_entries (int): メモリに保持する件数（0の場合はキャッシュしない）
+            store (ResultStore): 計算結果を保存するファイル（Noneの場合は保存しない）
+            name (str): メトリクスのラベル（cache）
+        """
+        self.max_entries = max_entries
+        self.store = store
+        self._entries = OrderedDict()
+        # キャッシュしている計算結果の計算ルールのハッシュ
+        self._rules = None
+        self._lock = threading.Lock()
+        self._hits = REGISTRY.counter(CACHE_HIT_METRIC, cache=name)
+        self._misses = REGISTRY.counter(CACHE_MISS_METRIC, cache=name)
+        self._evictions = REGISTRY.counter(CACHE_EVICTION_METRIC, cache=name)
+
+    def compute(self, machine, shelf_count, inch, height, grid=None):
+        """
+        検査表の計算（キャッシュにあれば計算を省略）
+
+        Args:
+            machine (str): 機種コード
+            shelf_count (int): 棚数
+            inch (int): インチ数
+            height (int): 高さ(mm)
+            grid (LookupGrid): 計算に使用する参照テーブル（省略時は現在のルールのもの）
+
+        Returns:
+            CalcResult: 計算結果（キャッシュにあった場合は前回と同じオブジェクト）
+
+        Raises:
+            CalculationError: rpa_engine.compute()と同じ
+        """
+        # キーと計算に同じ参照テーブルを使用する（途中でルールファイルが読み込み直されても混ざらない）
+        grid = grid or current_grid()
+        if self.max_entries <= 0:
+            return compute(machine, shelf_count, inch, height, grid)
+
+        rules = grid.rules.digest
+        key = (machine, shelf_count, inch, height)
+        with self._lock:
+            if rules != self._rules:
+                self._switch_rules(rules)
+            result = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+        if result is not None:
+            self._hits.inc()
+            return result
+
+        self._misses.inc()
+        result = compute(machine, shelf_count, inch, height, grid)
+        with self._lock:
+            if rules == self._rules:
+                self._entries[key] = result
+                if len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self._evictions.inc()
+        if self.store is not None:
+            self.store.add(rules, key, result)
+        return result
+
+    def _switch_rules(self, rules):
+        """計算ルールが変わった時に、キャッシュを空にして保存済みの計算結果を読み込む（ロック中に呼び出す）"""
+        self._entries.clear()
+        self._rules = rules
+        if self.store is None:
+            return
+        try:
+            self.store.flush()
+            self._entries.update(self.store.load(rules, self.max_entries))
+        except (sqlite3.Error, ValueError, TypeError) as e:
+            logger.warning("保存済みの計算結果を読み込めません（無視）: %s", e)
+
+    def stats(self):
+        """
+        キャッシュの状況
+
+        Returns:
+            dict: hits, misses, evictions（同じnameのキャッシュの合計）, size（メモリに保持している件数）
+        """
+        return {
+            "hits": self._hits.value,
+            "misses": self._misses.value,
+            "evictions": self._evictions.value,
+            "size": len(self._entries),
+        }
+
+    def clear(self):
+        """メモリのキャッシュを空にする（保存済みの計算結果は削除しない）"""
+        with self._lock:
+            self._entries.clear()
+            self._rules = None
+
+    def close(self):
+        """保存していない計算結果をファイルに書き込む"""
+        if self.store is not None:
+            self.store.close()
+            self.store = None
+
+
+_CACHE = None
+_CACHE_LOCK = threading.Lock()
+
+
+def default_store():
+    """
+    環境変数RPA_CACHE_DBで指定したファイル
+
+    Returns:
+        ResultStore: ファイル（指定がない、または開けない場合はNone）
+    """
+    path = os.environ.get(CACHE_DB_ENV)
+    if not path:
+        return None
+    try:
+        return ResultStore(path)
+    except (OSError, sqlite3.Error) as e:
+        logger.warning("計算結果のキャッシュのファイルを使用できません（無視）: %s", e)
+        return None
+
+
+def get_cache():
+    """
+    アプリケーション全体で共有するキャッシュ（初回呼び出し時に作成、終了時に保存）
+
+    Returns:
+        ResultCache: キャッシュ
+    """
+    global _CACHE
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            try:
+                max_entries = int(os.environ.get(CACHE_SIZE_ENV) or DEFAULT_MAX_ENTRIES)
+            except ValueError:
+                logger.warning("%sが整数ではありません。既定値（%d件）を使用します", CACHE_SIZE_ENV, DEFAULT_MAX_ENTRIES)
+                max_entries = DEFAULT_MAX_ENTRIES
+            _CACHE = ResultCache(max_entries, default_store())
+            atexit.register(_CACHE.close)
+        return _CACHE
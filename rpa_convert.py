@@ -0,0 +1,595 @@
+"""
+旧形式のWord文書（.doc）の変換サービス
+
+LibreOffice（soffice --headless --convert-to docx）の起動は1回あたり数秒かかるため、
+ファイルを1件ずつ変換せず、複数のファイルをまとめて1回の起動で変換します。
+ワーカーごとにLibreOfficeのユーザープロファイルを作成して使い続けるため、
+2回目以降の起動ではプロファイルの初期化も省略されます（同時に複数起動しても競合しない）。
+
+同時に起動する変換プロセスの数はworkersで制限します。
+変換できなかったファイルは理由とともに失敗として報告します（.docの内容を.docxとしてコピーすることはしない）。
+
+変換コマンドは差し替え可能です（command引数、または環境変数RPA_CONVERTER_COMMAND）。
+コマンド中の {profile} はワーカーのプロファイルのURL、{outdir} は出力フォルダーに置き換えられ、
+末尾に変換するファイルが追加されます。コマンドは各ファイルを "<出力フォルダー>/<ファイル名>.docx" に出力してください。
+
+変換結果は変換元の内容（SHA-256）と変換コマンドのバージョンをキーにキャッシュするため、
+同じ内容のファイル（別フォルダーのコピーなど）を二度変換することはありません（ConversionCache）。
+
+使用方法:
+    python rpa_convert.py check2.doc old/*.doc -o converted --workers 2
+"""
+
+import argparse
+import atexit
+import hashlib
+import logging
+import os
+import shlex
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import NamedTuple
+
+from rpa_logging import setup_logging
+from rpa_metrics import stage, start_exporter
+from rpa_word_template import file_digest
+
+logger = logging.getLogger(__name__)
+
+# 既定の変換コマンド
+DEFAULT_COMMAND = [
+    "soffice",
+    "--headless",
+    "--norestore",
+    "-env:UserInstallation={profile}",
+    "--convert-to",
+    "docx",
+    "--outdir",
+    "{outdir}",
+]
+
+# 変換コマンドを指定する環境変数（shlex形式）
+COMMAND_ENV = "RPA_CONVERTER_COMMAND"
+
+DEFAULT_WORKERS = 1
+DEFAULT_BATCH_SIZE = 20
+
+# 変換のタイムアウト（起動分 + 1ファイルあたり）
+STARTUP_TIMEOUT = 60
+FILE_TIMEOUT = 30
+
+# 変換結果のキャッシュ（フォルダー、合計サイズの上限(MB)を指定する環境変数）
+CACHE_DIR_ENV = "RPA_CONVERT_CACHE"
+CACHE_MAX_MB_ENV = "RPA_CONVERT_CACHE_MAX_MB"
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "rpa_convert")
+DEFAULT_CACHE_BYTES = 1024 * 1024 * 1024
+
+# キャッシュフォルダー全体を調べ直す間隔（秒）。その間は合計サイズを追加した分から見積もる
+CACHE_SWEEP_SECONDS = 600
+
+# 上限を超えた時に削除して減らす合計サイズ（上限に対する割合。上限付近で追加のたびに走査しないため）
+CACHE_EVICT_TARGET = 0.9
+
+# 作成中の一時ファイルの接頭辞（_copy_file。キャッシュのファイルとして数えない）
+_TEMP_PREFIX = ".tmp_"
+
+# エラーメッセージに含める標準エラー出力の長さ
+_MAX_ERROR_OUTPUT = 500
+
+# 処理時間の計測（変換コマンドの1回の起動。複数のファイルをまとめて変換した場合も1件）
+_CONVERSION = stage("conversion")
+
+
+class ConversionError(Exception):
+    """変換に失敗した場合の例外"""
+
+
+class ConversionResult(NamedTuple):
+    """1ファイルの変換結果"""
+
+    source: str
+    target: str
+    ok: bool
+    error: str = ""
+
+
+def default_command():
+    """
+    変換コマンドの取得
+
+    Returns:
+        list: 環境変数RPA_CONVERTER_COMMANDが設定されていればその内容、なければDEFAULT_COMMAND
+    """
+    command = os.environ.get(COMMAND_ENV)
+    return shlex.split(command) if command else list(DEFAULT_COMMAND)
+
+
+class ConversionService:
+    """
+    .doc → .docx の変換サービス
+
+    convert()に渡したファイルをbatch_size件ずつに分け、最大workers個の変換プロセスで並行して変換します。
+    """
+
+    def __init__(
+        self, command=None, workers=DEFAULT_WORKERS, batch_size=DEFAULT_BATCH_SIZE, timeout=FILE_TIMEOUT, cache=None
+    ):
+        """
+        Args:
+            command (list): 変換コマンド（省略時はdefault_command()）
+            workers (int): 同時に起動する変換プロセスの最大数
+            batch_size (int): 1回の起動で変換するファイル数の上限
+            timeout (float): 1ファイルあたりのタイムアウト秒数
+            cache (ConversionCache): 変換結果のキャッシュ（Noneの場合はキャッシュしない）
+        """
+        if workers < 1:
+            raise ValueError("workers は1以上を指定してください")
+        if batch_size < 1:
+            raise ValueError("batch_size は1以上を指定してください")
+        self.command = list(command) if command else default_command()
+        self.workers = workers
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.cache = cache
+        self._version = None
+        self._version_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rpa-convert")
+        self._profiles = threading.local()
+        self._profile_root = tempfile.mkdtemp(prefix="rpa_convert_")
+        self._closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """ワーカーを停止し、プロファイルを削除"""
+        if self._closed:
+            return
+        self._closed = True
+        self._executor.shutdown(wait=True)
+        shutil.rmtree(self._profile_root, ignore_errors=True)
+
+    # ==================== 変換 ====================
+
+    def convert(self, jobs):
+        """
+        複数のファイルを変換
+
+        キャッシュがある場合、変換済みのファイル（内容と変換コマンドのバージョンが同じもの）はキャッシュからコピーし、
+        内容が同じファイルが複数あれば1回だけ変換します。
+
+        Args:
+            jobs: (変換元の.doc, 出力先の.docx) のリスト
+
+        Returns:
+            list: ConversionResult（jobsと同じ順）
+        """
+        if self._closed:
+            raise ConversionError("変換サービスは終了しています")
+        jobs = [(os.path.abspath(source), os.path.abspath(target)) for source, target in jobs]
+        if self.cache is None:
+            results = self._convert_uncached(jobs)
+            return [results[job] for job in jobs]
+
+        results = {}
+        pending = {}
+        for source, target in jobs:
+            if not os.path.isfile(source):
+                results[(source, target)] = ConversionResult(source, target, False, f"ファイルが見つかりません: {source}")
+                continue
+            key = self.cache.key(file_digest(source), self.version())
+            if self.cache.get(key, target):
+                results[(source, target)] = ConversionResult(source, target, True)
+            else:
+                pending.setdefault(key, []).append((source, target))
+
+        converted = self._convert_uncached([group[0] for group in pending.values()])
+        for key, group in pending.items():
+            first = converted[group[0]]
+            results[group[0]] = first
+            if first.ok:
+                self.cache.put(key, first.target)
+            for source, target in group[1:]:
+                if first.ok:
+                    _copy_file(first.target, target)
+                    results[(source, target)] = ConversionResult(source, target, True)
+                else:
+                    error = f"同じ内容のファイル（{first.source}）の変換に失敗しました: {first.error}"
+                    results[(source, target)] = ConversionResult(source, target, False, error)
+        return [results[job] for job in jobs]
+
+    def _convert_uncached(self, jobs):
+        """変換プロセスで変換（(変換元, 出力先) → ConversionResult）"""
+        futures = [self._executor.submit(self._convert_batch, batch) for batch in self._batches(jobs)]
+        results = {}
+        for future in futures:
+            for result in future.result():
+                results[(result.source, result.target)] = result
+        return results
+
+    def version(self):
+        """
+        変換コマンドのバージョン（キャッシュのキーに使用）
+
+        "<コマンド> --version" の出力の1行目です（同じバージョンのLibreOfficeなら、インストール先が違っても同じ値）。
+        取得できない場合はコマンド自体を使用します。
+        """
+        with self._version_lock:
+            if self._version is None:
+                try:
+                    completed = subprocess.run(
+                        [self.command[0], "--version"], capture_output=True, text=True, timeout=STARTUP_TIMEOUT
+                    )
+                    output = completed.stdout.strip() if completed.returncode == 0 else ""
+                except (OSError, subprocess.TimeoutExpired):
+                    output = ""
+                self._version = output.splitlines()[0] if output else shlex.join(self.command)
+            return self._version
+
+    def convert_file(self, source, target):
+        """
+        1ファイルの変換
+
+        Args:
+            source (str): 変換元の.doc
+            target (str): 出力先の.docx
+
+        Raises:
+            ConversionError: 変換に失敗した場合
+        """
+        result = self.convert([(source, target)])[0]
+        if not result.ok:
+            raise ConversionError(result.error)
+
+    def _batches(self, jobs):
+        """
+        1回の起動で変換するファイルの組に分割
+
+        LibreOfficeは "<出力フォルダー>/<ファイル名>.docx" に出力するため、
+        ファイル名が同じものは別の組にします。
+        """
+        batches = []
+        for job in jobs:
+            stem = Path(job[0]).stem
+            for batch in batches:
+                if len(batch) < self.batch_size and stem not in {Path(source).stem for source, _ in batch}:
+                    batch.append(job)
+                    break
+            else:
+                batches.append([job])
+        return batches
+
+    def _profile_url(self):
+        """このワーカーのLibreOfficeプロファイル（ワーカーごとに作成して使い続ける）"""
+        profile = getattr(self._profiles, "path", None)
+        if profile is None:
+            profile = tempfile.mkdtemp(prefix="profile_", dir=self._profile_root)
+            self._profiles.path = profile
+        return Path(profile).as_uri()
+
+    def _convert_batch(self, batch):
+        """1回の起動で変換"""
+        results = []
+        missing = [(source, target) for source, target in batch if not os.path.isfile(source)]
+        for source, target in missing:
+            results.append(ConversionResult(source, target, False, f"ファイルが見つかりません: {source}"))
+        batch = [job for job in batch if job not in missing]
+        if not batch:
+            return results
+
+        with tempfile.TemporaryDirectory(prefix="out_", dir=self._profile_root) as outdir:
+            replacements = {"{profile}": self._profile_url(), "{outdir}": outdir}
+            command = [_substitute(argument, replacements) for argument in self.command]
+            command += [source for source, _ in batch]
+            timeout = STARTUP_TIMEOUT + self.timeout * len(batch)
+            try:
+                with _CONVERSION.time():
+                    completed = subprocess.run(command, capture_output=True, text=True, timeout=timeout)
+                failure = None if completed.returncode == 0 else f"終了コード {completed.returncode}"
+                output = (completed.stderr or completed.stdout or "").strip()[-_MAX_ERROR_OUTPUT:]
+            except FileNotFoundError:
+                failure, output = f"変換コマンドが見つかりません: {command[0]}", ""
+            except subprocess.TimeoutExpired:
+                failure, output = f"タイムアウトしました（{timeout}秒）", ""
+
+            for source, target in batch:
+                converted = os.path.join(outdir, f"{Path(source).stem}.docx")
+                if os.path.isfile(converted) and zipfile.is_zipfile(converted):
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    shutil.move(converted, target)
+                    results.append(ConversionResult(source, target, True))
+                else:
+                    reason = failure or "変換結果のファイルが作成されませんでした"
+                    if output:
+                        reason = f"{reason}: {output}"
+                    results.append(ConversionResult(source, target, False, reason))
+        return results
+
+
+class ConversionCache:
+    """
+    変換結果のキャッシュ
+
+    変換元の内容（SHA-256）と変換コマンドのバージョンをキーに、変換後の.docxを
+    "<キャッシュフォルダー>/<キーの先頭2文字>/<キー>.docx" に保存します。
+    ファイルの追加は一時ファイルからの置き換えで行うため、複数のマシンで共有フォルダーを使用できます。
+    合計サイズがmax_bytesを超えると、最後に使用した日時（ファイルの更新日時）が古いものから
+    max_bytes × CACHE_EVICT_TARGET 以下になるまで削除します。
+    共有フォルダーを毎回走査しないよう、合計サイズは最後に調べた値に追加した分を足して見積もり、
+    見積もりが上限を超えた時と、CACHE_SWEEP_SECONDSごと（他のマシンの追加分を反映）にだけ走査します。
+    """
+
+    def __init__(self, directory, max_bytes=DEFAULT_CACHE_BYTES):
+        """
+        Args:
+            directory (str): キャッシュフォルダー
+            max_bytes (int): キャッシュの合計サイズの上限
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        # 合計サイズの見積もり（Noneの場合は未走査）と次に走査する時刻（time.monotonic）
+        self._estimated_bytes = None
+        self._next_sweep = 0.0
+
+    @staticmethod
+    def key(source_digest, version):
+        """
+        キャッシュのキー
+
+        Args:
+            source_digest (str): 変換元のSHA-256
+            version (str): 変換コマンドのバージョン
+
+        Returns:
+            str: "<変換元のSHA-256>-<バージョンのSHA-256の先頭16文字>"
+        """
+        return f"{source_digest}-{hashlib.sha256(version.encode('utf-8')).hexdigest()[:16]}"
+
+    def path(self, key):
+        """キーに対応するキャッシュファイル"""
+        return os.path.join(self.directory, key[:2], f"{key}.docx")
+
+    def get(self, key, target):
+        """
+        キャッシュから出力先にコピー
+
+        Args:
+            key (str): キャッシュのキー
+            target (str): 出力先
+
+        Returns:
+            bool: キャッシュにあった場合True（ない、または読み込めない場合はFalse。変換し直す）
+        """
+        path = self.path(key)
+        try:
+            _copy_file(path, target)
+            # 最後に使用した日時として更新日時を更新（LRUの削除順に使用）
+            os.utime(path)
+        except OSError as e:
+            # 共有フォルダーに接続できない、権限がないなどの場合もキャッシュにないものとして変換する
+            if not isinstance(e, FileNotFoundError):
+                logger.warning("変換結果のキャッシュを読み込めません（変換します）: %s", e)
+            with self._lock:
+                self.misses += 1
+            return False
+        with self._lock:
+            self.hits += 1
+        return True
+
+    def put(self, key, converted):
+        """
+        変換結果をキャッシュに追加（保存できない場合は警告をログに出力して無視）
+
+        Args:
+            key (str): キャッシュのキー
+            converted (str): 変換後の.docx
+        """
+        path = self.path(key)
+        try:
+            _copy_file(converted, path)
+            size = os.path.getsize(path)
+        except OSError as e:
+            logger.warning("変換結果をキャッシュに保存できません（無視）: %s", e)
+            return
+        with self._lock:
+            self.stores += 1
+            if self._estimated_bytes is not None:
+                self._estimated_bytes += size
+            sweep = (
+                self._estimated_bytes is None
+                or self._estimated_bytes > self.max_bytes
+                or time.monotonic() >= self._next_sweep
+            )
+        if sweep:
+            self.evict()
+
+    def _entries(self):
+        """キャッシュファイルの一覧（パス, サイズ, 更新日時）"""
+        entries = []
+        for directory, _, files in os.walk(self.directory):
+            for name in files:
+                # 他のプロセスが作成中の一時ファイルは対象外（削除すると置き換えに失敗する）
+                if not name.endswith(".docx") or name.startswith(_TEMP_PREFIX):
+                    continue
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def evict(self):
+        """
+        合計サイズがmax_bytesを超えていれば、max_bytes × CACHE_EVICT_TARGET 以下になるまで古いものから削除
+
+        削除できないファイルは警告をログに出力して残します。
+        """
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        if total <= self.max_bytes:
+            entries = []
+        for path, size, _ in sorted(entries, key=lambda entry: entry[2]):
+            if total <= self.max_bytes * CACHE_EVICT_TARGET:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                # 別のマシン・プロセスが削除済み
+                pass
+            except OSError as e:
+                logger.warning("変換結果のキャッシュを削除できません（無視）: %s", e)
+                continue
+            else:
+                with self._lock:
+                    self.evictions += 1
+            total -= size
+        with self._lock:
+            self._estimated_bytes = total
+            self._next_sweep = time.monotonic() + CACHE_SWEEP_SECONDS
+
+    def stats(self):
+        """
+        キャッシュの統計
+
+        Returns:
+            dict: hits, misses, stores, evictions（このプロセスでの回数）, entries, bytes（現在の件数と合計サイズ）
+        """
+        entries = self._entries()
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "entries": len(entries),
+                "bytes": sum(size for _, size, _ in entries),
+            }
+
+
+def _copy_file(source, target):
+    """
+    ファイルのコピー（出力先には完成したファイルだけが現れるよう、一時ファイルから置き換える）
+
+    Raises:
+        FileNotFoundError: コピー元がない場合
+    """
+    directory = os.path.dirname(target)
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(prefix=_TEMP_PREFIX, suffix=".docx", dir=directory)
+    try:
+        with open(source, "rb") as src, os.fdopen(fd, "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        os.replace(temp_path, target)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def _substitute(argument, replacements):
+    """コマンド引数の {profile} {outdir} を置き換え"""
+    for placeholder, value in replacements.items():
+        argument = argument.replace(placeholder, value)
+    return argument
+
+
+# ==================== 共有の変換サービス ====================
+
+_SERVICE = None
+_SERVICE_LOCK = threading.Lock()
+
+
+def default_cache():
+    """
+    既定の変換結果キャッシュ
+
+    フォルダーは環境変数RPA_CONVERT_CACHE（複数のマシンで共有する場合は共有フォルダーを指定）、
+    なければ ~/.cache/rpa_convert です。作成できない場合はキャッシュしません。
+
+    Returns:
+        ConversionCache: キャッシュ（作成できない場合はNone）
+    """
+    directory = os.environ.get(CACHE_DIR_ENV) or DEFAULT_CACHE_DIR
+    max_mb = os.environ.get(CACHE_MAX_MB_ENV)
+    try:
+        max_bytes = int(max_mb) * 1024 * 1024 if max_mb else DEFAULT_CACHE_BYTES
+        return ConversionCache(directory, max_bytes)
+    except (OSError, ValueError) as e:
+        logger.warning("変換結果のキャッシュを使用できません（無視）: %s", e)
+        return None
+
+
+def get_service():
+    """
+    アプリケーション全体で共有する変換サービス（初回呼び出し時に作成、終了時に停止）
+
+    Returns:
+        ConversionService: 変換サービス
+    """
+    global _SERVICE
+    with _SERVICE_LOCK:
+        if _SERVICE is None:
+            _SERVICE = ConversionService(cache=default_cache())
+            atexit.register(_SERVICE.close)
+        return _SERVICE
+
+
+def main(argv=None):
+    """コマンドラインからの実行"""
+    parser = argparse.ArgumentParser(description=".doc → .docx の一括変換")
+    parser.add_argument("sources", nargs="+", help="変換する.docファイル")
+    parser.add_argument("-o", "--output-dir", default=".", help="出力フォルダー（既定: カレントフォルダー）")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="同時に起動する変換プロセス数（既定: 1）")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="1回の起動で変換するファイル数")
+    parser.add_argument("--command", help=f"変換コマンド（既定: 環境変数{COMMAND_ENV}、なければsoffice）")
+    parser.add_argument("--no-cache", action="store_true", help="変換結果のキャッシュを使用しない")
+    args = parser.parse_args(argv)
+
+    if args.workers <= 0:
+        parser.error("--workers は1以上を指定してください")
+    if args.batch_size <= 0:
+        parser.error("--batch-size は1以上を指定してください")
+
+    jobs = [(source, os.path.join(args.output_dir, f"{Path(source).stem}.docx")) for source in args.sources]
+    command = shlex.split(args.command) if args.command else None
+    start = time.perf_counter()
+    cache = None if args.no_cache else default_cache()
+    with ConversionService(command, args.workers, args.batch_size, cache=cache) as service:
+        results = service.convert(jobs)
+    elapsed = time.perf_counter() - start
+
+    failed = [result for result in results if not result.ok]
+    print(f"変換完了: {len(results) - len(failed)}件（失敗 {len(failed)}件） {elapsed:.2f}秒", file=sys.stderr)
+    if cache is not None:
+        stats = cache.stats()
+        print(
+            f"キャッシュ: ヒット {stats['hits']}件、ミス {stats['misses']}件、追加 {stats['stores']}件、"
+            f"削除 {stats['evictions']}件（{stats['entries']}件 {stats['bytes'] / 1024 / 1024:.1f}MB）",
+            file=sys.stderr,
+        )
+    for result in failed:
+        print(f"  失敗: {result.source}: {result.error}", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    setup_logging()
+    start_exporter()
+    sys.exit(main())
@@ -0,0 +1,206 @@
+"""
+Word文書（.docx）のキー文字列置換（zipを直接処理する高速版）
+
+python-docxで文書全体を読み込まず、.docxをzipファイルとして直接処理します。
+
+- 本文、ヘッダー、フッター、脚注、文末脚注のパートだけを対象に、バイト列のままキー文字列を検索します
+- キー文字列を含むパートだけをXMLとして解析して置換します（置換の仕様はrpa_word.replace_in_elementと同じ）
+- それ以外のパート（画像、スタイル、フォントなど）は展開せず、圧縮済みのデータをそのまま出力先にコピーします
+
+画像の多い検査マニュアルでも、処理時間はキー文字列を含むパートの大きさだけで決まります。
+"""
+
+import copy
+import os
+import posixpath
+import re
+import struct
+import zipfile
+from html import escape
+
+from lxml import etree
+
+from rpa_word import STORY_RELATIONSHIPS, compile_placeholders, processed_path, replace_in_element
+
+# パッケージのリレーションシップ
+PACKAGE_RELS = "_rels/.rels"
+OFFICE_DOCUMENT = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"
+PR_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+
+# XMLのタグを除去する（run分割されたキー文字列の検出用）
+_TAG_RE = re.compile(rb"<[^>]*>")
+
+# ローカルファイルヘッダー（固定部分の長さ、ファイル名長・拡張フィールド長の位置）
+_LOCAL_HEADER_SIZE = 30
+_LOCAL_HEADER_LENGTHS = struct.Struct("<HH")
+_LOCAL_HEADER_LENGTHS_OFFSET = 26
+
+# データディスクリプタのフラグ
+_DATA_DESCRIPTOR_FLAG = 0x08
+
+# 圧縮済みデータをコピーする単位
+_COPY_BLOCK_SIZE = 1024 * 1024
+
+
+def patch_word_file(file_path, mapping, output_path=None):
+    """
+    Wordファイルのキー文字列をまとめて置換し、新しいファイルに出力
+
+    Args:
+        file_path (str): 元ファイル（.docx）
+        mapping (dict): キー文字列 → 置換後の文字列
+        output_path (str): 出力ファイル（省略時はrpa_word.processed_path(file_path)）
+
+    Returns:
+        tuple: (キー文字列ごとの置換回数, 出力ファイル)
+    """
+    if output_path is None:
+        output_path = processed_path(file_path)
+    try:
+        with zipfile.ZipFile(file_path) as source, zipfile.ZipFile(output_path, "w") as target:
+            counts = patch_docx(source, target, mapping)
+    except BaseException:
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        raise
+    return counts, output_path
+
+
+def patch_docx(source, target, mapping):
+    """
+    zipファイル間でキー文字列を置換しながらパートを出力
+
+    Args:
+        source (zipfile.ZipFile): 元の.docx
+        target (zipfile.ZipFile): 出力先（書き込みモード）
+        mapping (dict): キー文字列 → 置換後の文字列
+
+    Returns:
+        dict: キー文字列ごとの置換回数
+    """
+    pattern = compile_placeholders(mapping)
+    counts = dict.fromkeys(mapping, 0)
+    stories = story_part_names(source)
+    needles = placeholder_needles(mapping)
+
+    for info in source.infolist():
+        if info.filename in stories:
+            data = source.read(info)
+            if may_contain(data, needles):
+                root = etree.fromstring(data)
+                if replace_in_element(root, mapping, pattern, counts):
+                    target.writestr(new_part_info(info), etree.tostring(root, encoding="UTF-8", standalone=True))
+                    continue
+        copy_compressed(source, target, info)
+
+    return counts
+
+
+def story_part_names(source):
+    """
+    置換対象のパート名（本文、ヘッダー、フッター、脚注、文末脚注）
+
+    Args:
+        source (zipfile.ZipFile): .docx
+
+    Returns:
+        set: zip内のパート名
+    """
+    names = set(source.namelist())
+    document = next(iter(_related_parts(source, "", PACKAGE_RELS, (OFFICE_DOCUMENT,))), None)
+    if document is None or document not in names:
+        raise ValueError("Word文書の本文が見つかりません")
+
+    directory, file_name = posixpath.split(document)
+    rels = posixpath.join(directory, "_rels", f"{file_name}.rels")
+    stories = {document}
+    if rels in names:
+        stories.update(part for part in _related_parts(source, directory, rels, STORY_RELATIONSHIPS) if part in names)
+    return stories
+
+
+def _related_parts(source, directory, rels_name, reltypes):
+    """リレーションシップから指定した種類のパート名を取得"""
+    root = etree.fromstring(source.read(rels_name))
+    for rel in root.iter(f"{{{PR_NS}}}Relationship"):
+        if rel.get("Type") not in reltypes or rel.get("TargetMode") == "External":
+            continue
+        target = rel.get("Target")
+        if target.startswith("/"):
+            yield target.lstrip("/")
+        else:
+            yield posixpath.normpath(posixpath.join(directory, target))
+
+
+def placeholder_needles(keys):
+    """
+    バイト列検索用のキー文字列
+
+    XML上ではキー文字列の & < > はエスケープされているため、エスケープしてからUTF-8に変換します。
+
+    Args:
+        keys: キー文字列
+
+    Returns:
+        list: UTF-8のバイト列
+    """
+    return [escape(key, quote=False).encode("utf-8") for key in keys if key]
+
+
+def may_contain(data, needles):
+    """
+    パートにキー文字列が含まれる可能性があるか
+
+    run分割されたキー文字列も見落とさないよう、タグを除いたテキストでも検索します
+    （段落をまたいで一致する場合もあるが、その場合は解析後の照合で除外される）。
+    """
+    if any(needle in data for needle in needles):
+        return True
+    text = _TAG_RE.sub(b"", data)
+    return any(needle in text for needle in needles)
+
+
+def new_part_info(info):
+    """置換したパートの出力用ZipInfo（名前、日時、圧縮方式は元のまま）"""
+    new_info = zipfile.ZipInfo(info.filename, info.date_time)
+    new_info.compress_type = info.compress_type
+    new_info.external_attr = info.external_attr
+    return new_info
+
+
+def copy_compressed(source, target, info):
+    """
+    パートを展開せずに、圧縮済みのデータのまま出力先にコピー
+
+    zipfileには圧縮済みデータを直接書き込むAPIがないため、
+    ZipFile.writestrと同じ手順でローカルファイルヘッダーとデータを書き込み、中央ディレクトリに登録します。
+
+    Args:
+        source (zipfile.ZipFile): 元のzip
+        target (zipfile.ZipFile): 出力先のzip（書き込みモード）
+        info (zipfile.ZipInfo): コピーするパート
+    """
+    source_file = source.fp
+    source_file.seek(info.header_offset + _LOCAL_HEADER_LENGTHS_OFFSET)
+    name_length, extra_length = _LOCAL_HEADER_LENGTHS.unpack(source_file.read(_LOCAL_HEADER_LENGTHS.size))
+    source_file.seek(info.header_offset + _LOCAL_HEADER_SIZE + name_length + extra_length)
+
+    # サイズとCRCはローカルファイルヘッダーに書くため、データディスクリプタは使わない
+    new_info = copy.copy(info)
+    new_info.flag_bits &= ~_DATA_DESCRIPTOR_FLAG
+    zip64 = new_info.file_size > zipfile.ZIP64_LIMIT or new_info.compress_size > zipfile.ZIP64_LIMIT
+
+    target_file = target.fp
+    new_info.header_offset = target_file.tell()
+    target_file.write(new_info.FileHeader(zip64))
+    remaining = info.compress_size
+    while remaining > 0:
+        block = source_file.read(min(_COPY_BLOCK_SIZE, remaining))
+        if not block:
+            raise zipfile.BadZipFile(f"{info.filename} のデータが途中で終わっています")
+        target_file.write(block)
+        remaining -= len(block)
+
+    target.start_dir = target_file.tell()
+    target.filelist.append(new_info)
+    target.NameToInfo[new_info.filename] = new_info
@@ -0,0 +1,510 @@
+"""
+検査表計算エンジン
+
+チェーンガイドの検査表の計算ロジックをGUIから切り離したモジュールです。
+tkinterに依存せず、機種、棚数、インチ数、高さからA値、B値、C値、D値、H値、
+スタビ値およびエンドフレーム仕様を計算します。
+
+機種データ、B値・C値・D値・H値のテーブル、高さの制約はルールファイル（rpa_rules.json）から読み込み、
+参照テーブル（LookupGrid）にコンパイルして使用します。ルールファイルが更新されると
+次の計算時に読み込み直して参照テーブルを丸ごと差し替えます（rpa_rules.RuleWatcher）。
+
+参照テーブルは読み取り専用で、計算関数は1回の計算の中で同じ参照テーブルだけを使用するため、
+複数スレッドから同時に呼び出しても安全です。
+"""
+
+from array import array
+from typing import NamedTuple
+
+from rpa_rules import RuleWatcher
+
+
+# ==================== 例外・結果クラス ====================
+
+
+class CalculationError(ValueError):
+    """
+    入力値が計算ルールに合わない場合の例外
+
+    title属性はGUIでエラーダイアログを表示する際のタイトルです。
+    """
+
+    title = "エラー"
+
+
+class HeightError(CalculationError):
+    """高さが最小値未満、または分解能の刻みに合わない場合の例外"""
+
+    title = "高さエラー"
+
+
+class CalcResult(NamedTuple):
+    """
+    計算結果
+
+    入力条件、チェーンガイド計算結果（A, A1, B, C, D, H, ST）および
+    エンドフレーム仕様（ELB, ELC, ERB, ERC, EB, EC）を保持します。
+    """
+
+    machine: str
+    shelf_count: int
+    inch: int
+    height: int
+    ring_count: int
+    chain_data: float
+    data1: int
+    A: float
+    A1: float
+    B: float
+    C: float
+    D: float
+    H: float
+    ST: float
+    ELB: float
+    ELC: float
+    ERB: float
+    ERC: float
+    EB: float
+    EC: float
+
+    @property
+    def needs_drawing_check(self):
+        """B値の図面確認が必要か（350, 351で高さ4000以下の場合）"""
+        return self.machine in ["350", "351"] and self.height <= 4000
+
+
+# ==================== 計算関数 ====================
+
+
+def compute(machine, shelf_count, inch, height, grid=None):
+    """
+    検査表の計算
+
+    参照テーブル（current_grid()）から値を読み出し、棚数に比例するA値のみを計算します。
+
+    Args:
+        machine (str): 機種コード ("200", "201", "350", "351")
+        shelf_count (int): 棚数
+        inch (int): インチ数
+        height (int): 高さ(mm)
+        grid (LookupGrid): 参照テーブル（省略時は現在の参照テーブル。キャッシュのキーと同じものを使う場合に指定）
+
+    Returns:
+        CalcResult: 計算結果
+
+    Raises:
+        CalculationError: 機種、インチ数が無効な場合、またはB値が定義されない組み合わせの場合
+        HeightError: 高さが範囲外、または刻みに合わない場合
+    """
+    if not machine:
+        raise CalculationError("機種を選択してください")
+
+    grid = grid or current_grid()
+    validate_height(height, grid.rules)
+
+    ring_count, C, D, H, b_mode, B, b_terms, machine_row = grid.cells[grid.cell_index(machine, inch, height)]
+    chain_data, data1, st, elb, elc, erb, erc, er, el = machine_row
+
+    # A値の計算
+    A = ((shelf_count * ring_count - data1) / 2 * chain_data) + 60
+    A1 = (shelf_count * ring_count - data1) / 2 * chain_data
+
+    # B値の計算（200, 201は固定値、350, 351はA値から項を引く）
+    if b_mode == B_MODE_CHAIN:
+        t0, t1, t2, t3, t4 = b_terms
+        B = A - t0 - t1 - t2 - t3 - t4
+    elif b_mode == B_MODE_UNDEFINED:
+        raise CalculationError(f"機種{machine}、インチ数{inch}、高さ{height}mmのB値は定義されていません")
+
+    ST = A1 - st
+
+    # 出力値が0以下の場合は0に設定
+    return CalcResult(
+        machine,
+        shelf_count,
+        inch,
+        height,
+        ring_count,
+        chain_data,
+        data1,
+        max(0, A),
+        A1,
+        max(0, B),
+        C,
+        D,
+        H,
+        max(0, ST),
+        elb,
+        elc,
+        erb,
+        erc,
+        er,
+        el,
+    )
+
+
+def validate_height(height, rules=None):
+    """
+    高さの検証
+
+    Args:
+        height (int): 高さ(mm)
+        rules (RuleSet): 計算ルール（省略時は現在のルール）
+
+    Raises:
+        HeightError: 最小値未満、または分解能の刻みに合わない場合
+    """
+    rules = rules or current_rules()
+    if height < rules.min_height:
+        raise HeightError(f"高さは最小{rules.min_height}mm以上で入力してください")
+
+    if (height - rules.min_height) % rules.height_resolution != 0:
+        raise HeightError(
+            f"高さは{rules.min_height}mmから{rules.height_resolution}mm刻みで入力してください\n"
+            f"例: {rules.height_examples()}..."
+        )
+
+
+# ==================== ルール定義 ====================
+# 以下の関数は計算ルールの定義です。ルールファイルの読み込み時に参照テーブル（LookupGrid）を
+# 構築するために使用され、compute()からは直接呼び出されません。
+# テーブルの値はルールファイル、計算式はこのモジュールで定義します。
+
+
+def chain_b_terms(machine, inch, height, C, D, H):
+    """
+    B値の計算式（350, 351の場合）
+
+    B値は A - t0 - t1 - t2 - t3 - t4 として計算されます。
+    項の順序は元の計算式と同じで、浮動小数点の丸めも元の式と一致します。
+
+    Args:
+        machine (str): 機種コード ("350", "351")
+        inch (int): インチ数
+        height (int): 高さ(mm)
+        C (int): C値（0クランプ前）
+        D (int): D値（0クランプ前）
+        H (int): H値
+
+    Returns:
+        tuple: A値から順に引く5つの項。B値が定義されない場合はNone
+    """
+    if machine == "351":
+        if inch in [10, 12] and height < 4000:
+            if D <= 0:
+                terms = (C, 160 * 2, H, -63)  # A - C - 160 * 2 - H + 63
+            elif C <= 0:
+                terms = (D, 160 * 2, H, -63)  # A - D - 160 * 2 - H + 63
+            else:
+                return None
+        elif C <= 0 and D <= 0:
+            terms = (160, H, 37)
+        else:
+            terms = (C, D, 160 * 3, H, 37)
+    else:  # 350
+        if C <= 0 and D <= 0:
+            terms = (160, H, 37)
+        elif C <= 0:
+            terms = (D, 160 * 2, H, 37)
+        elif D <= 0:
+            terms = (C, 160 * 2, H, 37)
+        else:
+            terms = (C, D, 160 * 3, H, 37)
+    return terms + (0,) * (B_TERM_COUNT - len(terms))
+
+
+def calculate_b_value(rules, machine, height):
+    """
+    B値の計算（200, 201の場合）
+
+    Args:
+        rules (RuleSet): 計算ルール
+        machine (str): 機種コード ("200", "201", "350", "351")
+        height (int): 高さ(mm)
+
+    Returns:
+        int: 計算されたB値（ルールファイルのb_valuesで、高さ以下の最大の段の値。該当しない場合は0）
+    """
+    for min_height, value in rules.b_values.get(machine, ()):
+        if height >= min_height:
+            return value
+    return 0
+
+
+def calculate_h_value(rules, machine, inch):
+    """
+    H値の計算（350, 351のみ使用）
+
+    Args:
+        rules (RuleSet): 計算ルール
+        machine (str): 機種コード ("350", "351")
+        inch (int): インチ数
+
+    Returns:
+        int: 計算されたH値（ルールファイルのh_valuesにない場合は0）
+    """
+    return rules.h_values.get(machine, {}).get(inch, 0)
+
+
+def calculate_c_value(rules, machine, height, inch):
+    """
+    C値の計算
+
+    Args:
+        rules (RuleSet): 計算ルール
+        machine (str): 機種コード
+        height (int): 高さ(mm)
+        inch (int): インチ数（c_inch_valuesが定義された段でのみ使用）
+
+    Returns:
+        int: 計算されたC値
+    """
+    # 高さからHインデックスを計算
+    h_index = height_to_h_index(rules, height)
+
+    c_values = rules.c_values.get(machine, {})
+    if h_index not in c_values:
+        return 0
+    # インチ数によってC値が異なる段（機種351のH3〜H5など）
+    inch_values = rules.c_inch_values.get(machine, {}).get(h_index)
+    if inch_values is not None and inch in inch_values:
+        return inch_values[inch]
+    return c_values[h_index]
+
+
+def calculate_d_value(rules, machine, height):
+    """
+    D値の計算
+
+    Args:
+        rules (RuleSet): 計算ルール
+        machine (str): 機種コード
+        height (int): 高さ(mm)
+
+    Returns:
+        int: 計算されたD値
+    """
+    # 高さからHインデックスを計算
+    h_index = height_to_h_index(rules, height)
+    return rules.d_values.get(machine, {}).get(h_index, 0)
+
+
+def height_to_h_index(rules, height):
+    """
+    高さからHインデックスを計算
+
+    Args:
+        rules (RuleSet): 計算ルール
+        height (int): 高さ(mm)
+
+    Returns:
+        int: Hインデックス（既定のルールでは3-17。対象範囲の上限の高さちょうどの場合のみ18）
+    """
+    # 対象範囲の下限（3000）から始まり、高さの刻み（250）ごとに1つ増える
+    if height < rules.h_index_min_height:
+        return rules.h_index_first  # 最小値
+    elif height > rules.h_index_max_height:
+        return rules.h_index_last  # 最大値
+    else:
+        return rules.h_index_first + ((height - rules.h_index_min_height) // rules.height_resolution)
+
+
+# ==================== 参照テーブル ====================
+
+# B値の計算方法
+B_MODE_UNDEFINED = 0  # B値が定義されない組み合わせ
+B_MODE_FIXED = 1  # 高さで決まる固定値（200, 201）
+B_MODE_CHAIN = 2  # A値から項を引く計算式（350, 351）
+
+# B値の計算式で引く項の数
+B_TERM_COUNT = 5
+
+
+class LookupGrid:
+    """
+    機種 × インチ数 × 高さ段の全組み合わせを事前計算した参照テーブル
+
+    ルールファイルの読み込みごとに1つ構築され、構築後は変更しません。
+    高さ段は (高さ - 最小の高さ) // 高さの刻み で、最終段は
+    Hインデックスの対象範囲の上限（h_index.max_height）を超えるすべての高さを代表します。
+    各列は平坦なarray.arrayで、セル番号
+    (機種番号 * n_inches + インチ番号) * n_steps + 高さ段 で参照します。
+    NumPyからはnumpy.frombufferでコピーせずに参照できます。
+
+    compute()用に、セルごとの値をまとめたタプルのリスト（cells）も保持します。
+
+    Attributes:
+        rules (RuleSet): 構築元の計算ルール
+        min_height (int): 最小の高さ
+        height_resolution (int): 高さの刻み
+        machines (tuple): 機種コード（機種番号順）
+        inches (tuple): 機種ごとのインチ数のタプル
+        n_inches (int): インチ数の軸の長さ
+        n_steps (int): 高さ段の数
+        cells_per_machine (int): 機種あたりのセル数
+        shape (tuple): (機種数, n_inches, n_steps)
+        machine_rows (tuple): 機種ごとの (chain_data, data1, st, elb, elc, erb, erc, er, el)
+        ring (array): リング数
+        c (array): C値（0クランプ前）
+        d (array): D値（0クランプ前）
+        h (array): H値
+        b_mode (array): B値の計算方法（B_MODE_*）
+        b_base (array): B値（B_MODE_FIXEDの場合）
+        b_terms (array): A値から引く項（セルごとにB_TERM_COUNT個、B_MODE_CHAINの場合）
+        cells (list): セルごとの (リング数, C値, D値, H値, B値の計算方法, B値, B値の項, 機種の定数)。
+            C値、D値、H値は0クランプ済み
+    """
+
+    def __init__(self, rules):
+        """
+        参照テーブルの構築
+
+        Args:
+            rules (RuleSet): 計算ルール（rpa_rules.load_rules()で読み込んだもの）
+        """
+        machine_data = rules.machine_data
+        self.rules = rules
+        self.min_height = rules.min_height
+        self.height_resolution = rules.height_resolution
+        self.machines = tuple(machine_data)
+        self.inches = tuple(tuple(machine_data[machine]["inches"]) for machine in self.machines)
+        self.n_inches = max(len(inches) for inches in self.inches)
+        self.n_steps = (rules.h_index_max_height - rules.min_height) // rules.height_resolution + 2
+        self.cells_per_machine = self.n_inches * self.n_steps
+        self.shape = (len(self.machines), self.n_inches, self.n_steps)
+
+        row_keys = ("chain_data", "data1", "st", "elb", "elc", "erb", "erc", "er", "el")
+        self.machine_rows = tuple(tuple(machine_data[machine][key] for key in row_keys) for machine in self.machines)
+
+        size = len(self.machines) * self.cells_per_machine
+        self.ring = array("q", bytes(8 * size))
+        self.c = array("q", bytes(8 * size))
+        self.d = array("q", bytes(8 * size))
+        self.h = array("q", bytes(8 * size))
+        self.b_mode = array("q", bytes(8 * size))
+        self.b_base = array("q", bytes(8 * size))
+        self.b_terms = array("q", bytes(8 * size * B_TERM_COUNT))
+        self.cells = [(0, 0, 0, 0, B_MODE_UNDEFINED, 0, (0,) * B_TERM_COUNT, None)] * size
+
+        # (機種, インチ数) → 行番号（機種番号 * n_inches + インチ番号）
+        self._machine_index = {machine: index for index, machine in enumerate(self.machines)}
+        self._row_index = {}
+
+        for machine_index, machine in enumerate(self.machines):
+            rings = machine_data[machine]["rings"]
+            for inch_index, inch in enumerate(self.inches[machine_index]):
+                row = machine_index * self.n_inches + inch_index
+                self._row_index[(machine, inch)] = row
+                for step in range(self.n_steps):
+                    self._fill_cell(row * self.n_steps + step, machine, inch, rings[inch_index], self.step_height(step))
+
+    def _fill_cell(self, cell, machine, inch, ring_count, height):
+        """ルール定義の関数から1セル分の値を計算して格納"""
+        rules = self.rules
+        if machine in ["350", "351"]:
+            D = calculate_c_value(rules, machine, height, inch) - 160
+            C = calculate_d_value(rules, machine, height) - 160
+        else:
+            C = calculate_c_value(rules, machine, height, inch)
+            D = calculate_d_value(rules, machine, height)
+        H = calculate_h_value(rules, machine, inch)
+
+        self.ring[cell] = ring_count
+        self.c[cell] = C
+        self.d[cell] = D
+        self.h[cell] = H
+
+        terms = (0,) * B_TERM_COUNT
+        b_base = 0
+        if machine in ["350", "351"]:
+            b_mode = B_MODE_UNDEFINED
+            chain_terms = chain_b_terms(machine, inch, height, C, D, H)
+            if chain_terms is not None:
+                b_mode = B_MODE_CHAIN
+                terms = chain_terms
+        else:
+            b_mode = B_MODE_FIXED
+            b_base = calculate_b_value(rules, machine, height)
+
+        self.b_mode[cell] = b_mode
+        self.b_base[cell] = b_base
+        self.b_terms[cell * B_TERM_COUNT : (cell + 1) * B_TERM_COUNT] = array("q", terms)
+        self.cells[cell] = (
+            ring_count,
+            max(0, C),
+            max(0, D),
+            max(0, H),
+            b_mode,
+            b_base,
+            terms,
+            self.machine_rows[cell // self.cells_per_machine],
+        )
+
+    def step_height(self, step):
+        """
+        高さ段に対応する代表の高さ
+
+        Args:
+            step (int): 高さ段
+
+        Returns:
+            int: 高さ(mm)
+        """
+        return self.min_height + step * self.height_resolution
+
+    def cell_index(self, machine, inch, height):
+        """
+        セル番号の取得
+
+        Args:
+            machine (str): 機種コード
+            inch (int): インチ数
+            height (int): 高さ(mm)（validate_heightで検証済みであること）
+
+        Returns:
+            int: セル番号
+
+        Raises:
+            CalculationError: 機種、インチ数が無効な場合
+        """
+        try:
+            row = self._row_index[(machine, inch)]
+        except (KeyError, TypeError):
+            if machine not in self._machine_index:
+                raise CalculationError("無効な機種です") from None
+            raise CalculationError(f"インチ数{inch}は機種{machine}では使用できません") from None
+
+        step = (height - self.min_height) // self.height_resolution
+        if step >= self.n_steps:
+            step = self.n_steps - 1
+        return row * self.n_steps + step
+
+
+# ==================== 現在のルール ====================
+
+# ルールファイルを読み込んで構築した参照テーブル（計算・一括処理・サービスで共有）。
+# ルールファイルが更新されると、次の呼び出し時に構築し直して差し替える
+_RULES = RuleWatcher(LookupGrid)
+
+
+def current_grid():
+    """
+    現在の参照テーブル
+
+    ルールファイルの更新日時は一定間隔（rpa_rules.RELOAD_CHECK_INTERVAL）で確認されます。
+    1回の処理の中では同じ参照テーブル（とその計算ルール）を使用してください。
+
+    Returns:
+        LookupGrid: 参照テーブル
+    """
+    return _RULES.get()
+
+
+def current_rules():
+    """
+    現在の計算ルール
+
+    Returns:
+        RuleSet: 計算ルール（機種データ、テーブル、高さの制約）
+    """
+    return _RULES.get().rules
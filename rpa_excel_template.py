@@ -0,0 +1,249 @@
+"""
+Excelテンプレート（check1.xlsx）のキャッシュと一括書き込み
+
+テンプレートは一度だけ読み込んでメモリ上に保持し、受注ごとに
+組立チェック表、フレームテスト検査表、フレーム組立検査表の決まったセルへ値を書き込んで保存します。
+通常は書き込み先のワークシートのパートだけを書き換え（rpa_xlsx_patch）、その他のパートは元のまま出力します。
+高速版で書き込めないテンプレートはopenpyxlで読み込み、保存後は書き込んだセルを元の値に戻すため、
+次の受注も元のテンプレートから作成されます。
+
+テンプレートファイルの更新日時またはサイズが変わると、次の取得時に読み込み直します。
+"""
+
+import logging
+import os
+import threading
+import zipfile
+
+from rpa_metrics import stage
+from rpa_word_template import order_output_path
+from rpa_xlsx_patch import CellPatch, UnsupportedCellError
+
+logger = logging.getLogger(__name__)
+
+# シートごとの書き込み先セルと項目
+CHECK_SHEET_CELLS = {
+    "組立チェック表": {"B4": "username", "B5": "model", "F4": "order", "F5": "manufacturing"},
+    "フレームテスト検査表": {"B3": "username", "B4": "model", "F2": "order", "F3": "manufacturing"},
+    "フレーム組立検査表": {"B3": "username", "B4": "model", "F2": "order", "F3": "manufacturing"},
+}
+
+# 項目の見出し（セルには "見出し：値" を書き込む）
+FIELD_LABELS = {
+    "username": "ユーザー名",
+    "model": "機種-型番",
+    "order": "受注番号",
+    "manufacturing": "製造番号",
+}
+
+# 処理時間の計測（テンプレートの読み込み、openpyxlでの書き込みと保存。高速版の書き込みと出力はrpa_xlsx_patchで計測）
+_TEMPLATE_LOAD = stage("template_load", kind="excel")
+_CELL_STAMP = stage("cell_stamp", kind="excel")
+_SAVE = stage("save", kind="excel")
+
+
+def check_sheet_values(username, model, manufacturing, order):
+    """
+    検査表の各シートに書き込む値
+
+    Args:
+        username (str): ユーザ名
+        model (str): 型番
+        manufacturing (str): 製造番号
+        order (str): 受注番号
+
+    Returns:
+        dict: シート名 → {セル番地: 書き込む文字列}
+    """
+    fields = {"username": username, "model": model, "manufacturing": manufacturing, "order": order}
+    return {
+        sheet_name: {cell: f"{FIELD_LABELS[field]}：{fields[field]}" for cell, field in cells.items()}
+        for sheet_name, cells in CHECK_SHEET_CELLS.items()
+    }
+
+
+def file_signature(path):
+    """
+    テンプレートの変更検出用の値
+
+    Args:
+        path (str): ファイル
+
+    Returns:
+        tuple: (更新日時（ナノ秒）, サイズ)
+    """
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+class ExcelTemplate:
+    """
+    読み込み済みのExcelテンプレート
+
+    書き込み先のセル（CHECK_SHEET_CELLS）はrpa_xlsx_patchでコンパイルし、該当するワークシートだけを
+    書き換えて出力します（その他のパートは元のまま）。数式のセルなど高速版で書き込めない場合は、
+    openpyxlで読み込んだブックに書き込んで保存します。
+
+    fill()は書き込み、保存、元の値への復元をまとめて行うため、ロックで排他します。
+    """
+
+    def __init__(self, path, cells=None):
+        """
+        Args:
+            path (str): テンプレート（.xlsx）
+            cells (dict): シート名 → 書き込み先のセル番地のリスト（省略時はCHECK_SHEET_CELLS）
+        """
+        if cells is None:
+            cells = {sheet_name: list(sheet_cells) for sheet_name, sheet_cells in CHECK_SHEET_CELLS.items()}
+        self.path = path
+        self.signature = file_signature(path)
+        self._workbook = None
+        self._lock = threading.Lock()
+        try:
+            with _TEMPLATE_LOAD.time(), zipfile.ZipFile(path) as source:
+                self.patch = CellPatch.compile(source, cells)
+        except UnsupportedCellError as e:
+            logger.warning("高速版で書き込めないため、openpyxlで処理します: %s", e)
+            self.patch = None
+
+    @property
+    def workbook(self):
+        """openpyxlで読み込んだブック（必要になった時に読み込む）"""
+        if self._workbook is None:
+            from openpyxl import load_workbook
+
+            with _TEMPLATE_LOAD.time():
+                self._workbook = load_workbook(self.path)
+        return self._workbook
+
+    def fill(self, values, output_path):
+        """
+        値を書き込んだコピーを保存
+
+        テンプレートにないシートは無視します。
+
+        Args:
+            values (dict): シート名 → {セル番地: 書き込む値}（check_sheet_values()の結果）
+            output_path (str): 出力ファイル
+
+        Returns:
+            list: 書き込んだシート名
+        """
+        with self._lock:
+            if self._can_patch(values):
+                self._fill_patch(values, output_path)
+                return self.patch.sheet_names
+            return self._fill_workbook(values, output_path)
+
+    def _can_patch(self, values):
+        """書き込むセルがすべてコンパイル済みか"""
+        if self.patch is None:
+            return False
+        slots = set(self.patch.slots)
+        sheet_names = set(self.patch.sheet_names)
+        return all(
+            (sheet_name, coordinate) in slots
+            for sheet_name, cells in values.items()
+            if sheet_name in sheet_names
+            for coordinate in cells
+        ) and all(sheet_name in values for sheet_name in sheet_names)
+
+    def _fill_patch(self, values, output_path):
+        """ワークシートのパートだけを書き換えて出力"""
+        try:
+            with zipfile.ZipFile(self.path) as source, zipfile.ZipFile(output_path, "w") as target:
+                self.patch.write(source, target, values)
+        except BaseException:
+            if os.path.exists(output_path):
+                os.remove(output_path)
+            raise
+
+    def _fill_workbook(self, values, output_path):
+        """openpyxlのブックに書き込んで保存し、書き込んだセルを元の値に戻す"""
+        workbook = self.workbook
+        pristine = []
+        try:
+            with _CELL_STAMP.time():
+                for sheet_name, cells in values.items():
+                    if sheet_name not in workbook.sheetnames:
+                        continue
+                    worksheet = workbook[sheet_name]
+                    for coordinate, value in cells.items():
+                        cell = worksheet[coordinate]
+                        pristine.append((cell, cell.value))
+                        cell.value = value
+            with _SAVE.time():
+                workbook.save(output_path)
+        finally:
+            # 次の受注のためにテンプレートの値に戻す
+            for cell, value in reversed(pristine):
+                cell.value = value
+        return [sheet_name for sheet_name in values if sheet_name in workbook.sheetnames]
+
+    def fill_many(self, items):
+        """
+        複数の受注の書き込み
+
+        Args:
+            items: (書き込む値, 出力ファイル) の反復
+
+        Yields:
+            str: 出力ファイル
+        """
+        for values, output_path in items:
+            self.fill(values, output_path)
+            yield output_path
+
+
+# 読み込み済みのテンプレート（絶対パス → ExcelTemplate）
+_TEMPLATES = {}
+_TEMPLATES_LOCK = threading.Lock()
+
+
+def get_template(path):
+    """
+    テンプレートの取得（読み込み済みで変更がなければキャッシュを使用）
+
+    Args:
+        path (str): テンプレート（.xlsx）
+
+    Returns:
+        ExcelTemplate: 読み込み済みのテンプレート
+    """
+    key = os.path.abspath(path)
+    with _TEMPLATES_LOCK:
+        template = _TEMPLATES.get(key)
+        if template is None or template.signature != file_signature(key):
+            template = ExcelTemplate(key)
+            _TEMPLATES[key] = template
+        return template
+
+
+def clear_templates():
+    """読み込み済みのテンプレートを破棄"""
+    with _TEMPLATES_LOCK:
+        _TEMPLATES.clear()
+
+
+def fill_orders(template_path, orders, output_dir):
+    """
+    受注ごとに検査表（Excel）を出力
+
+    Args:
+        template_path (str): テンプレート（check1.xlsxなど）
+        orders: (ユーザ名, 型番, 製造番号, 受注番号) の反復
+        output_dir (str): 出力フォルダー
+
+    Returns:
+        int: 出力したファイル数
+    """
+    template = get_template(template_path)
+    os.makedirs(output_dir, exist_ok=True)
+    items = (
+        (
+            check_sheet_values(username, model, manufacturing, order),
+            order_output_path(output_dir, template_path, order, manufacturing),
+        )
+        for username, model, manufacturing, order in orders
+    )
+    return sum(1 for _ in template.fill_many(items))
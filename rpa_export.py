@@ -0,0 +1,127 @@
+"""
+計算履歴のExcel出力
+
+計算履歴をopenpyxlの書き込み専用（write_only）ワークブックに1行ずつ書き込みます。
+DataFrameやセルオブジェクトの一覧をメモリ上に保持しないため、
+数十万行の履歴でもメモリ使用量はほぼ一定です。
+openpyxlは出力時に読み込みます（列定義だけを使用する計算履歴の保存やGUIの起動時には読み込まない）。
+"""
+
+# 計算履歴の列
+HISTORY_COLUMNS = [
+    "timestamp",
+    "machine",
+    "shelf_count",
+    "inch",
+    "height",
+    "ring_count",
+    "chain_data",
+    "data1",
+    "A",
+    "B",
+    "C",
+    "D",
+    "H",
+]
+
+# ヘッダーの名前付きスタイル
+HEADER_STYLE_NAME = "HistoryHeader"
+
+# 列幅の上限
+MAX_COLUMN_WIDTH = 50
+
+
+class ColumnWidthTracker:
+    """
+    列幅の集計
+
+    書き込み専用ワークシートでは列幅を最初の行より前に出力する必要があるため、
+    履歴に行を追加するたびに各列の最大文字数を更新しておきます。
+    """
+
+    def __init__(self, columns=HISTORY_COLUMNS):
+        """
+        Args:
+            columns (list): 列名（ヘッダーの文字数も列幅に含める）
+        """
+        self.max_lengths = [len(str(column)) for column in columns]
+
+    def update(self, values):
+        """
+        1行分の値で列幅を更新
+
+        Args:
+            values (list): 列の順に並んだ値
+        """
+        max_lengths = self.max_lengths
+        for index, value in enumerate(values):
+            length = len(str(value))
+            if length > max_lengths[index]:
+                max_lengths[index] = length
+
+    def widths(self):
+        """
+        列幅の取得
+
+        Returns:
+            list: 列ごとの幅（最大文字数 + 2、上限MAX_COLUMN_WIDTH）
+        """
+        return [min(length + 2, MAX_COLUMN_WIDTH) for length in self.max_lengths]
+
+
+def _header_style():
+    """ヘッダーの名前付きスタイル（ワークブックごとに1つ登録して全ヘッダーセルで共有）"""
+    from openpyxl.styles import Font, NamedStyle, PatternFill
+
+    return NamedStyle(
+        name=HEADER_STYLE_NAME,
+        font=Font(bold=True, color="FFFFFF"),
+        fill=PatternFill(start_color="366092", end_color="366092", fill_type="solid"),
+    )
+
+
+def write_history_xlsx(filename, rows, widths, columns=HISTORY_COLUMNS, sheet_name="計算結果"):
+    """
+    計算履歴をExcelファイルに逐次出力
+
+    Args:
+        filename (str): 出力ファイル
+        rows: 行のイテレータ（各行は列の順に並んだ値）
+        widths (list): 列幅（ColumnWidthTracker.widths()）
+        columns (list): 列名
+        sheet_name (str): シート名
+
+    Returns:
+        int: 出力した行数（ヘッダーを除く）
+    """
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.utils import get_column_letter
+
+    workbook = Workbook(write_only=True)
+    workbook.add_named_style(_header_style())
+    worksheet = workbook.create_sheet(sheet_name)
+
+    # 列幅は最初の行より前に設定する
+    for index, width in enumerate(widths, start=1):
+        worksheet.column_dimensions[get_column_letter(index)].width = width
+
+    header = []
+    for column in columns:
+        cell = WriteOnlyCell(worksheet, value=column)
+        cell.style = HEADER_STYLE_NAME
+        header.append(cell)
+    worksheet.append(header)
+
+    count = 0
+    try:
+        for row in rows:
+            worksheet.append(row)
+            count += 1
+    except BaseException:
+        # 行の取得が中断された場合（キャンセルなど）は書きかけのワークシートを閉じ、ファイルは保存しない
+        worksheet.close()
+        raise
+
+    workbook.save(filename)
+    return count
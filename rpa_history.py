@@ -0,0 +1,219 @@
+"""
+計算履歴の保存
+
+計算結果を1件ごとの辞書ではなく、列ごとの型付き配列（array.array）で保持します。
+機種コードは番号に置き換え、日時はエポック秒で保持します（文字列への整形は読み出し時）。
+メモリ上の件数が上限に達すると、古い行を一時ファイルに書き出します。
+読み出し（反復、件数）は一時ファイルとメモリ上の行を合わせた全件が対象です。
+反復は開始時点の全件を返すため、別スレッドでExcel出力している間も計算結果を追加できます。
+"""
+
+import struct
+import tempfile
+import threading
+import time
+from array import array
+from datetime import datetime
+from itertools import islice
+
+from rpa_export import HISTORY_COLUMNS, ColumnWidthTracker
+
+# メモリ上に保持する最大件数の既定値
+DEFAULT_MAX_ROWS_IN_MEMORY = 100000
+
+# 日時の表示形式
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# 列ごとの型（timestamp: エポック秒、machine: 機種番号）
+_COLUMN_TYPES = {
+    "timestamp": "d",
+    "machine": "B",
+    "shelf_count": "q",
+    "inch": "q",
+    "height": "q",
+    "ring_count": "q",
+    "chain_data": "d",
+    "data1": "q",
+    "A": "d",
+    "B": "d",
+    "C": "q",
+    "D": "q",
+    "H": "q",
+}
+
+# A値、B値は0に切り上げた場合や固定値の場合に整数になるため、整数かどうかを別に保持する
+_INT_FLAGS = {"A": 1, "B": 2}
+
+# 一時ファイルの1行の形式（HISTORY_COLUMNSの順 + 整数フラグ）
+_RECORD = struct.Struct("<" + "".join(_COLUMN_TYPES[column] for column in HISTORY_COLUMNS) + "B")
+
+# 一時ファイルから一度に読み込む件数
+_READ_BLOCK_ROWS = 4096
+
+
+class HistoryStore:
+    """
+    計算履歴
+
+    append()で計算結果を追加し、反復で履歴の各行（HISTORY_COLUMNSの順の値のリスト）を取得します。
+    Excel出力用の列幅も追加時に集計します。
+    """
+
+    def __init__(self, max_rows_in_memory=DEFAULT_MAX_ROWS_IN_MEMORY, spill_dir=None):
+        """
+        Args:
+            max_rows_in_memory (int): メモリ上に保持する最大件数（超えた分は一時ファイルへ）
+            spill_dir (str): 一時ファイルの作成先（Noneの場合はOSの既定）
+        """
+        if max_rows_in_memory < 1:
+            raise ValueError("max_rows_in_memory は1以上を指定してください")
+        self.max_rows_in_memory = max_rows_in_memory
+        self.spill_dir = spill_dir
+        self.machines = []
+        self._machine_index = {}
+        self._spill_file = None
+        self._spilled_rows = 0
+        self._lock = threading.Lock()
+        self._reset_columns()
+        self.widths = ColumnWidthTracker(HISTORY_COLUMNS)
+
+    def _reset_columns(self):
+        """メモリ上の列を空にする"""
+        self.columns = [array(_COLUMN_TYPES[column]) for column in HISTORY_COLUMNS]
+        self.flags = array("B")
+
+    def __len__(self):
+        """全件数（一時ファイルに書き出した行を含む）"""
+        return self._spilled_rows + len(self.flags)
+
+    @property
+    def spilled_rows(self):
+        """一時ファイルに書き出した件数"""
+        return self._spilled_rows
+
+    def append(self, result, timestamp=None):
+        """
+        計算結果を1件追加
+
+        Args:
+            result (CalcResult): 計算結果
+            timestamp (float): 計算日時のエポック秒（Noneの場合は現在時刻）
+        """
+        if timestamp is None:
+            timestamp = time.time()
+
+        machine = result.machine
+        machine_number = self._machine_index.get(machine)
+        if machine_number is None:
+            machine_number = len(self.machines)
+            self._machine_index[machine] = machine_number
+            self.machines.append(machine)
+
+        row = [
+            timestamp,
+            machine_number,
+            result.shelf_count,
+            result.inch,
+            result.height,
+            result.ring_count,
+            result.chain_data,
+            result.data1,
+            result.A,
+            result.B,
+            result.C,
+            result.D,
+            result.H,
+        ]
+        flags = 0
+        for column, flag in _INT_FLAGS.items():
+            if isinstance(getattr(result, column), int):
+                flags |= flag
+
+        with self._lock:
+            for values, value in zip(self.columns, row):
+                values.append(value)
+            self.flags.append(flags)
+            if len(self.flags) >= self.max_rows_in_memory:
+                self._spill()
+
+        # 列幅は表示される値（整形済みの日時、機種コード）で集計する
+        row[0] = _format_timestamp(timestamp)
+        row[1] = machine
+        self.widths.update(row)
+
+    def clear(self):
+        """全件を削除（一時ファイルも削除）"""
+        self.close()
+        with self._lock:
+            self._reset_columns()
+        self.widths = ColumnWidthTracker(HISTORY_COLUMNS)
+
+    def close(self):
+        """一時ファイルを閉じる（閉じると削除される）"""
+        with self._lock:
+            if self._spill_file is not None:
+                self._spill_file.close()
+                self._spill_file = None
+            self._spilled_rows = 0
+
+    def _spill(self):
+        """メモリ上の行をすべて一時ファイルに追記（ロックを取得して呼び出す）"""
+        if self._spill_file is None:
+            self._spill_file = tempfile.TemporaryFile(prefix="rpa_history_", dir=self.spill_dir)
+        pack = _RECORD.pack
+        self._spill_file.seek(0, 2)
+        self._spill_file.write(b"".join(pack(*row) for row in zip(*self.columns, self.flags)))
+        self._spilled_rows += len(self.flags)
+        self._reset_columns()
+
+    def _iter_spilled(self, spill_file, rows):
+        """一時ファイルの先頭からrows件を順に読み出す"""
+        position = 0
+        end = rows * _RECORD.size
+        while position < end:
+            # 反復中に追記されても読み出し位置がずれないよう、毎回位置を指定して読む
+            with self._lock:
+                spill_file.flush()
+                spill_file.seek(position)
+                block = spill_file.read(min(_READ_BLOCK_ROWS * _RECORD.size, end - position))
+            position += len(block)
+            yield from _RECORD.iter_unpack(block)
+
+    def __iter__(self):
+        """
+        全件を古い順に反復
+
+        反復を開始した時点の行だけを返します（反復中に追加された行は含まない）。
+        一時ファイルへの書き出しでメモリ上の列は新しい配列に置き換わるため、開始時点の配列はそのまま読み出せます。
+
+        Yields:
+            list: HISTORY_COLUMNSの順に並んだ値（timestampは整形済みの文字列）
+        """
+        with self._lock:
+            spill_file = self._spill_file
+            spilled_rows = self._spilled_rows
+            columns = self.columns
+            flags = self.flags
+            memory_rows = len(flags)
+        if spill_file is not None:
+            for record in self._iter_spilled(spill_file, spilled_rows):
+                yield self._decode(record)
+        for record in islice(zip(*columns, flags), memory_rows):
+            yield self._decode(record)
+
+    def _decode(self, record):
+        """配列の値を表示用の値に戻す"""
+        row = list(record[:-1])
+        flags = record[-1]
+        row[0] = _format_timestamp(row[0])
+        row[1] = self.machines[row[1]]
+        if flags & _INT_FLAGS["A"]:
+            row[8] = int(row[8])
+        if flags & _INT_FLAGS["B"]:
+            row[9] = int(row[9])
+        return row
+
+
+def _format_timestamp(timestamp):
+    """エポック秒を表示用の文字列に変換"""
+    return datetime.fromtimestamp(timestamp).strftime(TIMESTAMP_FORMAT)
@@ -0,0 +1,731 @@
+"""
+書類作成ジョブの永続キュー
+
+Excel（検査表）・Word（検査表）の作成ジョブをSQLite（WALモード）に記録し、1件ずつ実行します。
+ジョブには入力値、状態、出力ファイル、実行時間を記録するため、途中でプロセスが終了しても
+（クラッシュ、ノートPCのスリープなど）、次回の実行で完了済みの書類を作り直さずに続きから再開できます。
+
+- 出力ファイル名は登録時に決め、作成は一時ファイルに書き込んでから置き換えます。
+  出力フォルダーにある出力ファイルはすべて書き込みが完了したものです。
+- 実行中のジョブには期限（リース）を設定し、期限を過ぎた実行中のジョブ（終了したプロセスのもの）は再実行します。
+
+使用方法:
+    python rpa_jobs.py enqueue excel check1.xlsx orders.csv -o output --batch 2024-06
+    python rpa_jobs.py enqueue word check2.docx orders.csv -o output --batch 2024-06
+    python rpa_jobs.py run --batch 2024-06
+    python rpa_jobs.py status
+    python rpa_jobs.py retry --batch 2024-06
+"""
+
+import argparse
+import csv
+import json
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+
+from rpa_excel_template import check_sheet_values, file_signature, get_template
+from rpa_logging import setup_logging
+from rpa_metrics import operation, start_exporter
+from rpa_word import inspection_replacements
+from rpa_word_template import WordTemplate, order_output_path
+
+# キューのファイルの既定値（環境変数RPA_JOBS_DBで変更可能）
+DEFAULT_DB = "rpa_jobs.db"
+DB_ENV = "RPA_JOBS_DB"
+
+# 実行中のジョブの期限（秒）。これを過ぎても完了しないジョブは、終了したプロセスのものとみなして再実行する
+DEFAULT_LEASE_SECONDS = 300
+
+# データベースの形式のバージョン（PRAGMA user_version）
+SCHEMA_VERSION = 1
+
+# GUI（NewRPASystem）から登録するジョブのバッチ名
+GUI_BATCH = "gui"
+
+# 他の実行が実行中のジョブの完了を確認する間隔（秒。run_id）
+RUN_WAIT_INTERVAL = 0.1
+
+# ジョブの種類
+EXCEL = "excel"
+WORD = "word"
+JOB_KINDS = [EXCEL, WORD]
+
+# ジョブの種類ごとの処理時間の計測（出力ファイルの作成）
+_JOB_OPERATIONS = {kind: operation(f"{kind}_job") for kind in JOB_KINDS}
+
+# ジョブの状態
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+JOB_STATES = [PENDING, RUNNING, DONE, FAILED]
+
+# 入力値の項目と、受注一覧（CSV）の列名
+INPUT_COLUMNS = {
+    "username": "ユーザ名",
+    "model": "型番",
+    "manufacturing": "製造番号",
+    "order": "受注番号",
+}
+
+# ジョブの種類ごとに必要な入力値
+REQUIRED_INPUTS = {
+    EXCEL: ["username", "model", "manufacturing", "order"],
+    WORD: ["manufacturing", "order"],
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    batch TEXT NOT NULL DEFAULT '',
+    kind TEXT NOT NULL,
+    template TEXT NOT NULL,
+    inputs TEXT NOT NULL,
+    output_path TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    result TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    lease_until REAL,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    UNIQUE (kind, output_path)
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, id);
+CREATE INDEX IF NOT EXISTS jobs_batch ON jobs (batch, state);
+"""
+
+
+class JobError(Exception):
+    """ジョブの登録・実行のエラー"""
+
+
+def default_db_path():
+    """キューのファイル（環境変数RPA_JOBS_DB、なければカレントフォルダーのrpa_jobs.db）"""
+    return os.environ.get(DB_ENV) or DEFAULT_DB
+
+
+def part_path(output_path):
+    """作成中の一時ファイル（出力ファイルと同じフォルダー。置き換えを1回の操作で行うため）"""
+    directory, name = os.path.split(output_path)
+    return os.path.join(directory, f".{name}.part")
+
+
+class Job:
+    """キューに記録されたジョブ（1行）"""
+
+    def __init__(self, row):
+        """
+        Args:
+            row (sqlite3.Row): jobsテーブルの行
+        """
+        self.id = row["id"]
+        self.batch = row["batch"]
+        self.kind = row["kind"]
+        self.template = row["template"]
+        self.inputs = json.loads(row["inputs"])
+        self.output_path = row["output_path"]
+        self.state = row["state"]
+        self.result = json.loads(row["result"]) if row["result"] else None
+        self.error = row["error"]
+        self.attempts = row["attempts"]
+        self.created_at = row["created_at"]
+        self.started_at = row["started_at"]
+        self.finished_at = row["finished_at"]
+
+    @property
+    def elapsed(self):
+        """実行時間（秒。未完了の場合はNone）"""
+        if self.started_at is None or self.finished_at is None:
+            return None
+        return self.finished_at - self.started_at
+
+
+class JobQueue:
+    """
+    SQLiteによるジョブのキュー
+
+    接続はスレッドごとに作成するため、GUIのワーカースレッドからも使用できます。
+    複数のプロセスから同じファイルを使用でき、ジョブの取得はトランザクションで排他します。
+    """
+
+    def __init__(self, path=None, lease_seconds=DEFAULT_LEASE_SECONDS):
+        """
+        Args:
+            path (str): キューのファイル（Noneの場合はdefault_db_path()）
+            lease_seconds (float): 実行中のジョブの期限（秒）
+        """
+        self.path = path or default_db_path()
+        self.lease_seconds = lease_seconds
+        self.worker = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._local = threading.local()
+        self._connect()
+
+    def _connect(self):
+        """このスレッドの接続（初回はテーブルを作成）"""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            # トランザクションは明示的に開始する（BEGIN IMMEDIATEで書き込みを排他）
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode=WAL")
+            # WALではNORMALでもプロセスの異常終了でコミット済みの内容は失われない
+            connection.execute("PRAGMA synchronous=NORMAL")
+            version = connection.execute("PRAGMA user_version").fetchone()[0]
+            if version > SCHEMA_VERSION:
+                connection.close()
+                raise JobError(f"キューの形式（{version}）に対応していません: {self.path}")
+            if version < SCHEMA_VERSION:
+                connection.executescript(_SCHEMA)
+                connection.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+            self._local.connection = connection
+        return connection
+
+    def close(self):
+        """このスレッドの接続を閉じる"""
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _transaction(self):
+        """書き込みのトランザクション（開始時に書き込みロックを取得）"""
+        return _Transaction(self._connect())
+
+    # ==================== 登録 ====================
+
+    def enqueue(self, kind, template, inputs, output_path, batch=""):
+        """
+        ジョブの登録
+
+        Args:
+            kind (str): ジョブの種類（"excel"、"word"）
+            template (str): テンプレート
+            inputs (dict): 入力値（username、model、manufacturing、order）
+            output_path (str): 出力ファイル
+            batch (str): バッチ名
+
+        Returns:
+            int: ジョブID（同じ出力ファイルのジョブが登録済みの場合はそのID。enqueue_many()を参照）
+        """
+        ids, _ = self.enqueue_many([(kind, template, inputs, output_path)], batch)
+        return ids[0]
+
+    def enqueue_many(self, jobs, batch="", replace=False):
+        """
+        複数のジョブを1回のトランザクションで登録
+
+        同じ種類・出力ファイルのジョブが登録済みの場合は既存のジョブIDを返します
+        （同じ受注一覧を登録し直しても、ジョブが重複せず完了済みの書類も作り直さない）。
+        テンプレートまたは入力値が異なる場合は、待機中・失敗したジョブを新しい内容で待機中に戻します。
+        完了済みのジョブはreplace=Trueの場合だけ戻し、実行中のジョブは戻しません（どちらもJobError）。
+
+        Args:
+            jobs: (種類, テンプレート, 入力値, 出力ファイル) の反復
+            batch (str): バッチ名
+            replace (bool): 入力値が異なる完了済みのジョブを作り直すか
+
+        Returns:
+            tuple: (ジョブIDのリスト（jobsの順）, 新しく登録・登録し直した件数)
+
+        Raises:
+            JobError: 入力値が異なる完了済み（replace=Falseの場合）・実行中のジョブがある場合（何も登録しない）
+        """
+        now = time.time()
+        ids = []
+        added = 0
+        with self._transaction() as connection:
+            for kind, template, inputs, output_path in jobs:
+                _check_inputs(kind, inputs)
+                output_path = os.path.abspath(output_path)
+                template = os.path.abspath(template)
+                encoded = json.dumps(inputs, ensure_ascii=False, sort_keys=True)
+                row = connection.execute(
+                    "SELECT id, template, inputs, state FROM jobs WHERE kind = ? AND output_path = ?", (kind, output_path)
+                ).fetchone()
+                if row is None:
+                    cursor = connection.execute(
+                        "INSERT INTO jobs (batch, kind, template, inputs, output_path, created_at) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        (batch, kind, template, encoded, output_path, now),
+                    )
+                    ids.append(cursor.lastrowid)
+                    added += 1
+                    continue
+                if row["template"] != template or row["inputs"] != encoded:
+                    # 別の入力の書類を上書きしない（作成済み、または作成中）
+                    if row["state"] == RUNNING or (row["state"] == DONE and not replace):
+                        raise JobError(
+                            f"出力ファイルが同じで入力値が異なるジョブ{row['id']}があります"
+                            f"（状態: {row['state']}）: {output_path}"
+                        )
+                    connection.execute(
+                        "UPDATE jobs SET batch = ?, template = ?, inputs = ?, state = ?, result = NULL, error = NULL, "
+                        "worker = NULL, lease_until = NULL, created_at = ?, started_at = NULL, finished_at = NULL "
+                        "WHERE id = ?",
+                        (batch, template, encoded, PENDING, now, row["id"]),
+                    )
+                    added += 1
+                ids.append(row["id"])
+        return ids, added
+
+    # ==================== 取得・状態の更新 ====================
+
+    def claim(self, job_id=None, batch=None):
+        """
+        実行するジョブの取得（状態を実行中にする）
+
+        待機中のジョブと、期限を過ぎた実行中のジョブが対象です。
+
+        Args:
+            job_id (int): 取得するジョブ（Noneの場合は最も古いもの）
+            batch (str): 対象のバッチ（Noneの場合はすべて）
+
+        Returns:
+            Job: 取得したジョブ（対象がない場合はNone）
+        """
+        now = time.time()
+        conditions = ["(state = ? OR (state = ? AND lease_until < ?))"]
+        parameters = [PENDING, RUNNING, now]
+        if job_id is not None:
+            conditions.append("id = ?")
+            parameters.append(job_id)
+        if batch is not None:
+            conditions.append("batch = ?")
+            parameters.append(batch)
+
+        with self._transaction() as connection:
+            row = connection.execute(
+                f"SELECT id FROM jobs WHERE {' AND '.join(conditions)} ORDER BY id LIMIT 1", parameters
+            ).fetchone()
+            if row is None:
+                return None
+            connection.execute(
+                "UPDATE jobs SET state = ?, worker = ?, lease_until = ?, started_at = ?, finished_at = NULL, "
+                "attempts = attempts + 1 WHERE id = ?",
+                (RUNNING, self.worker, now + self.lease_seconds, now, row["id"]),
+            )
+            return Job(connection.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone())
+
+    def complete(self, job, result=None):
+        """
+        ジョブの完了
+
+        Args:
+            job (Job): 完了したジョブ
+            result (dict): 実行結果（置換回数など）
+        """
+        self._finish(job, DONE, json.dumps(result, ensure_ascii=False) if result is not None else None, None)
+
+    def fail(self, job, error):
+        """
+        ジョブの失敗
+
+        Args:
+            job (Job): 失敗したジョブ
+            error (str): エラー内容
+        """
+        self._finish(job, FAILED, None, str(error))
+
+    def _finish(self, job, state, result, error):
+        """ジョブの終了（別のプロセスに取得し直されたジョブは更新しない）"""
+        with self._transaction() as connection:
+            connection.execute(
+                "UPDATE jobs SET state = ?, result = ?, error = ?, finished_at = ?, lease_until = NULL "
+                "WHERE id = ? AND worker = ?",
+                (state, result, error, time.time(), job.id, self.worker),
+            )
+
+    def get(self, job_id):
+        """
+        ジョブの取得（状態は変更しない）
+
+        Returns:
+            Job: ジョブ（ない場合はNone）
+        """
+        row = self._connect().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return Job(row) if row is not None else None
+
+    def retry(self, batch=None):
+        """
+        失敗したジョブを待機中に戻す
+
+        Args:
+            batch (str): 対象のバッチ（Noneの場合はすべて）
+
+        Returns:
+            int: 待機中に戻した件数
+        """
+        return self._reset([FAILED], batch)
+
+    def reclaim(self, batch=None):
+        """
+        実行中のジョブを期限前でも待機中に戻す（他に実行中のプロセスがないことが分かっている場合）
+
+        Args:
+            batch (str): 対象のバッチ（Noneの場合はすべて）
+
+        Returns:
+            int: 待機中に戻した件数
+        """
+        return self._reset([RUNNING], batch)
+
+    def _reset(self, states, batch):
+        """指定した状態のジョブを待機中に戻す"""
+        conditions = [f"state IN ({', '.join('?' for _ in states)})"]
+        parameters = list(states)
+        if batch is not None:
+            conditions.append("batch = ?")
+            parameters.append(batch)
+        with self._transaction() as connection:
+            cursor = connection.execute(
+                f"UPDATE jobs SET state = ?, worker = NULL, lease_until = NULL WHERE {' AND '.join(conditions)}",
+                [PENDING] + parameters,
+            )
+            return cursor.rowcount
+
+    def counts(self, batch=None):
+        """
+        バッチ・状態ごとの件数と平均実行時間
+
+        Args:
+            batch (str): 対象のバッチ（Noneの場合はすべて）
+
+        Returns:
+            list: (バッチ名, 状態, 件数, 平均実行時間（秒）) のリスト
+        """
+        sql = (
+            "SELECT batch, state, COUNT(*) AS count, AVG(finished_at - started_at) AS elapsed FROM jobs "
+            + ("WHERE batch = ? " if batch is not None else "")
+            + "GROUP BY batch, state ORDER BY batch, state"
+        )
+        rows = self._connect().execute(sql, [batch] if batch is not None else []).fetchall()
+        return [(row["batch"], row["state"], row["count"], row["elapsed"]) for row in rows]
+
+    def failures(self, batch=None):
+        """
+        失敗したジョブ
+
+        Returns:
+            list: Jobのリスト
+        """
+        sql = "SELECT * FROM jobs WHERE state = ?" + (" AND batch = ?" if batch is not None else "") + " ORDER BY id"
+        parameters = [FAILED] + ([batch] if batch is not None else [])
+        return [Job(row) for row in self._connect().execute(sql, parameters).fetchall()]
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE〜COMMIT（例外の場合はROLLBACK）"""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        self.connection.execute("BEGIN IMMEDIATE")
+        return self.connection
+
+    def __exit__(self, exc_type, exc, tb):
+        self.connection.execute("ROLLBACK" if exc_type is not None else "COMMIT")
+
+
+def _check_inputs(kind, inputs):
+    """ジョブの種類と入力値の確認"""
+    if kind not in REQUIRED_INPUTS:
+        raise JobError(f"ジョブの種類が正しくありません: {kind}（{', '.join(JOB_KINDS)}）")
+    missing = [INPUT_COLUMNS[name] for name in REQUIRED_INPUTS[kind] if not inputs.get(name)]
+    if missing:
+        raise JobError(f"入力値がありません: {', '.join(missing)}")
+
+
+# ==================== 実行 ====================
+
+
+class JobRunner:
+    """
+    ジョブの実行
+
+    テンプレートは実行中のプロセスで一度だけ読み込み（ファイルが更新されていれば読み込み直す）、
+    出力は一時ファイルに書き込んでから出力ファイルに置き換えます。
+    """
+
+    def __init__(self, queue):
+        """
+        Args:
+            queue (JobQueue): ジョブのキュー
+        """
+        self.queue = queue
+        self._word_templates = {}
+
+    def run_job(self, job):
+        """
+        取得済みのジョブを実行して結果を記録
+
+        Args:
+            job (Job): claim()で取得したジョブ
+
+        Returns:
+            Job: 実行後のジョブ（状態はdoneまたはfailed）
+        """
+        try:
+            result = self.execute(job)
+        except Exception as e:
+            self.queue.fail(job, e)
+        else:
+            self.queue.complete(job, result)
+        return self.queue.get(job.id)
+
+    def run_id(self, job_id, poll_interval=RUN_WAIT_INTERVAL):
+        """
+        登録したジョブを実行
+
+        他の実行（GUIの中断したジョブの再開など）が先に取得して実行中の場合は、その完了を待ちます
+        （期限を過ぎても完了しない場合は取得し直して実行します）。
+
+        Args:
+            job_id (int): ジョブID
+            poll_interval (float): 実行中のジョブの完了を確認する間隔（秒）
+
+        Returns:
+            Job: 実行後のジョブ（他の実行が完了させた場合はその結果）
+
+        Raises:
+            JobError: ジョブがない、または失敗したジョブの場合
+        """
+        waited = False
+        while True:
+            job = self.queue.claim(job_id)
+            if job is not None:
+                return self.run_job(job)
+            job = self.queue.get(job_id)
+            if job is not None and (job.state == DONE or (job.state == FAILED and waited)):
+                return job
+            if job is None or job.state != RUNNING:
+                raise JobError(f"ジョブ{job_id}は実行できません（状態: {job.state if job else 'なし'}）")
+            waited = True
+            time.sleep(poll_interval)
+
+    def run_pending(self, batch=None, limit=None, progress=None, should_stop=None):
+        """
+        待機中のジョブを順に実行
+
+        Args:
+            batch (str): 対象のバッチ（Noneの場合はすべて）
+            limit (int): 実行する最大件数
+            progress (callable): ジョブごとに呼び出す関数 progress(実行後のJob)
+            should_stop (callable): Trueを返すと次のジョブを取得せずに終了する
+
+        Returns:
+            tuple: (完了件数, 失敗件数)
+        """
+        done = failed = 0
+        while limit is None or done + failed < limit:
+            if should_stop is not None and should_stop():
+                break
+            job = self.queue.claim(batch=batch)
+            if job is None:
+                break
+            job = self.run_job(job)
+            if job.state == DONE:
+                done += 1
+            else:
+                failed += 1
+            if progress is not None:
+                progress(job)
+        return done, failed
+
+    def execute(self, job):
+        """
+        ジョブの出力ファイルの作成
+
+        Args:
+            job (Job): ジョブ
+
+        Returns:
+            dict: 実行結果（Wordの場合は置換回数）
+        """
+        if job.kind not in _JOB_OPERATIONS:
+            raise JobError(f"ジョブの種類が正しくありません: {job.kind}")
+        os.makedirs(os.path.dirname(job.output_path), exist_ok=True)
+        temporary = part_path(job.output_path)
+        try:
+            with _JOB_OPERATIONS[job.kind].time():
+                result = self._write_output(job, temporary)
+            # 書き込みが完了してから出力ファイルに置き換える
+            os.replace(temporary, job.output_path)
+        finally:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+        return result
+
+    def _write_output(self, job, temporary):
+        """一時ファイルへの出力"""
+        if job.kind == EXCEL:
+            inputs = job.inputs
+            values = check_sheet_values(inputs["username"], inputs["model"], inputs["manufacturing"], inputs["order"])
+            return {"sheets": get_template(job.template).fill(values, temporary)}
+        replacements = inspection_replacements(job.inputs["order"], job.inputs["manufacturing"])
+        return {"counts": self._word_template(job.template, replacements).fill(replacements, temporary)}
+
+    def load_template(self, kind, template_path):
+        """
+        テンプレートの読み込み（GUIの事前読み込み用。以後のジョブは読み込み済みのものを使用する）
+
+        Args:
+            kind (str): ジョブの種類（EXCEL、WORD）
+            template_path (str): テンプレート
+
+        Raises:
+            JobError: ジョブの種類が正しくない場合
+        """
+        template_path = os.path.abspath(template_path)
+        if kind == EXCEL:
+            get_template(template_path)
+        elif kind == WORD:
+            self._word_template(template_path, inspection_replacements("", ""))
+        else:
+            raise JobError(f"ジョブの種類が正しくありません: {kind}")
+
+    def _word_template(self, path, replacements):
+        """コンパイル済みのWordテンプレート（ファイルが更新されていれば読み込み直す）"""
+        key = (path, tuple(sorted(replacements)))
+        signature = file_signature(path)
+        cached = self._word_templates.get(key)
+        if cached is None or cached[0] != signature:
+            cached = (signature, WordTemplate.load(path, replacements))
+            self._word_templates[key] = cached
+        return cached[1]
+
+
+# ==================== コマンドライン ====================
+
+
+def read_job_inputs(orders_path, kind, encoding="utf-8-sig"):
+    """
+    受注一覧（CSV）からジョブの入力値を読み込み
+
+    Args:
+        orders_path (str): CSVファイル（列: ユーザ名,型番,製造番号,受注番号。Wordの場合は製造番号,受注番号のみでも可）
+        kind (str): ジョブの種類
+        encoding (str): 文字コード
+
+    Yields:
+        dict: 入力値
+    """
+    with open(orders_path, newline="", encoding=encoding) as f:
+        reader = csv.DictReader(f)
+        header = [column.strip() for column in reader.fieldnames or []]
+        missing = [INPUT_COLUMNS[name] for name in REQUIRED_INPUTS[kind] if INPUT_COLUMNS[name] not in header]
+        if missing:
+            raise JobError(f"列がありません: {', '.join(missing)}")
+        reader.fieldnames = header
+        for row in reader:
+            inputs = {name: (row.get(column) or "").strip() for name, column in INPUT_COLUMNS.items() if column in header}
+            if not any(inputs.values()):
+                continue
+            yield inputs
+
+
+def _command_enqueue(queue, args):
+    """enqueue: 受注一覧のジョブを登録"""
+    jobs = [
+        (args.kind, args.template, inputs, order_output_path(args.output_dir, args.template, inputs["order"], inputs["manufacturing"]))
+        for inputs in read_job_inputs(args.orders, args.kind, args.encoding)
+    ]
+    _, added = queue.enqueue_many(jobs, args.batch, args.replace)
+    print(f"登録完了: {added}件（登録済み {len(jobs) - added}件）", file=sys.stderr)
+    return 0
+
+
+def _command_run(queue, args):
+    """run: 待機中のジョブを実行"""
+    if args.reclaim:
+        count = queue.reclaim(args.batch)
+        print(f"実行中のジョブを待機中に戻しました: {count}件", file=sys.stderr)
+
+    start = time.perf_counter()
+
+    def progress(job):
+        if job.state == FAILED:
+            print(f"失敗: ジョブ{job.id} {job.output_path}: {job.error}", file=sys.stderr)
+
+    done, failed = JobRunner(queue).run_pending(args.batch, args.limit, progress)
+    elapsed = time.perf_counter() - start
+    print(f"実行完了: 完了 {done}件 失敗 {failed}件 {elapsed:.2f}秒", file=sys.stderr)
+    return 1 if failed else 0
+
+
+def _command_status(queue, args):
+    """status: バッチ・状態ごとの件数"""
+    for batch, state, count, elapsed in queue.counts(args.batch):
+        average = f" 平均 {elapsed:.3f}秒" if elapsed is not None and state == DONE else ""
+        print(f"{batch or '(なし)'}\t{state}\t{count}件{average}")
+    for job in queue.failures(args.batch):
+        print(f"失敗: ジョブ{job.id} {job.output_path}: {job.error}")
+    return 0
+
+
+def _command_retry(queue, args):
+    """retry: 失敗したジョブを待機中に戻す"""
+    count = queue.retry(args.batch)
+    print(f"待機中に戻しました: {count}件", file=sys.stderr)
+    return 0
+
+
+def main(argv=None):
+    """コマンドラインからの実行"""
+    parser = argparse.ArgumentParser(description="書類作成ジョブの永続キュー")
+    parser.add_argument("--db", default=None, help=f"キューのファイル（既定: 環境変数{DB_ENV}または{DEFAULT_DB}）")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    enqueue = commands.add_parser("enqueue", help="受注一覧のジョブを登録")
+    enqueue.add_argument("kind", choices=JOB_KINDS, help="ジョブの種類")
+    enqueue.add_argument("template", help="テンプレート（check1.xlsx、check2.docxなど）")
+    enqueue.add_argument("orders", help="受注一覧のCSVファイル（ユーザ名,型番,製造番号,受注番号）")
+    enqueue.add_argument("-o", "--output-dir", default="output", help="出力フォルダー（既定: output）")
+    enqueue.add_argument("--batch", default="", help="バッチ名")
+    enqueue.add_argument("--encoding", default="utf-8-sig", help="受注一覧の文字コード（既定: utf-8-sig）")
+    enqueue.add_argument("--replace", action="store_true", help="入力値が変わった完了済みのジョブを作り直す")
+    enqueue.set_defaults(handler=_command_enqueue)
+
+    run = commands.add_parser("run", help="待機中のジョブを実行")
+    run.add_argument("--batch", default=None, help="対象のバッチ（既定: すべて）")
+    run.add_argument("--limit", type=int, default=None, help="実行する最大件数")
+    run.add_argument("--reclaim", action="store_true", help="実行中のジョブを期限前でも再実行する（他に実行中のプロセスがない場合）")
+    run.set_defaults(handler=_command_run)
+
+    status = commands.add_parser("status", help="バッチ・状態ごとの件数")
+    status.add_argument("--batch", default=None, help="対象のバッチ（既定: すべて）")
+    status.set_defaults(handler=_command_status)
+
+    retry = commands.add_parser("retry", help="失敗したジョブを待機中に戻す")
+    retry.add_argument("--batch", default=None, help="対象のバッチ（既定: すべて）")
+    retry.set_defaults(handler=_command_retry)
+
+    args = parser.parse_args(argv)
+    try:
+        with JobQueue(args.db) as queue:
+            return args.handler(queue, args)
+    except (OSError, ValueError, JobError, sqlite3.Error) as e:
+        print(f"エラー: {e}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    setup_logging()
+    start_exporter()
+    sys.exit(main())
@@ -0,0 +1,87 @@
+"""
+ログの設定（キュー経由の非同期出力）
+
+各モジュールはlogging.getLogger(__name__)でログを記録し、アプリケーション（GUI、コマンドライン）の
+起動時にsetup_logging()を1回呼び出します。ログはキューに入れるだけで呼び出し元に戻り、
+標準エラー出力・ファイルへの書き込みは専用のスレッド（QueueListener）が行うため、
+ワーカースレッドやGUIのメインループがディスクの書き込みを待ちません。
+
+環境変数:
+    RPA_LOG_LEVEL: ログレベル（既定: INFO）
+    RPA_LOG_FILE: ログファイル（指定した場合は標準エラー出力と両方に出力。5MBごとに3世代まで保持）
+"""
+
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+
+# 環境変数
+LOG_LEVEL_ENV = "RPA_LOG_LEVEL"
+LOG_FILE_ENV = "RPA_LOG_FILE"
+
+DEFAULT_LEVEL = "INFO"
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s [%(threadName)s] %(message)s"
+
+# ログファイルの切り替え
+MAX_LOG_BYTES = 5 * 1024 * 1024
+LOG_BACKUP_COUNT = 3
+
+_listener = None
+
+
+def setup_logging(level=None, log_file=None):
+    """
+    ルートロガーにキュー経由の出力を設定（2回目以降の呼び出しは何もしない）
+
+    Args:
+        level (str): ログレベル（省略時は環境変数RPA_LOG_LEVEL、なければINFO）
+        log_file (str): ログファイル（省略時は環境変数RPA_LOG_FILE、なければ標準エラー出力のみ）
+
+    Returns:
+        logging.handlers.QueueListener: 出力スレッド
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    level = (level or os.environ.get(LOG_LEVEL_ENV) or DEFAULT_LEVEL).upper()
+    log_file = log_file or os.environ.get(LOG_FILE_ENV)
+
+    formatter = logging.Formatter(LOG_FORMAT)
+    handlers = [logging.StreamHandler(sys.stderr)]
+    if log_file:
+        handlers.append(
+            logging.handlers.RotatingFileHandler(
+                log_file, maxBytes=MAX_LOG_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8"
+            )
+        )
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+    return _listener
+
+
+def stop_logging():
+    """キューに残ったログを出力して出力スレッドを終了"""
+    global _listener
+    if _listener is None:
+        return
+    listener, _listener = _listener, None
+    listener.stop()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        if isinstance(handler, logging.handlers.QueueHandler):
+            root.removeHandler(handler)
+    for handler in listener.handlers:
+        handler.close()
@@ -0,0 +1,622 @@
+"""
+処理時間の計測（ヒストグラム）と出力
+
+テンプレートの読み込み、セルの書き込み、キー文字列の置換、保存、変換、計算などの段階ごとに
+処理時間をヒストグラム（固定のバケット）に集計します。計測はperf_counterの差を取って
+バケットの件数を加算するだけのため、1回あたり数マイクロ秒です。
+
+集計結果はJSON（平均、最大、推定パーセンタイル付き）と、Prometheusのテキスト形式
+（node_exporterのtextfile collector用）で出力できます。
+環境変数RPA_METRICS_PROM、RPA_METRICS_JSONに出力ファイルを指定すると、
+start_exporter()の呼び出し後、一定間隔（RPA_METRICS_INTERVAL秒）と終了時に書き出します。
+
+使用例:
+    from rpa_metrics import stage, timed
+
+    _SAVE = stage("save", kind="word")
+
+    with _SAVE.time():
+        ...
+
+    @timed("replace_text_in_word")
+    def replace_text_in_word(...):
+        ...
+
+JSONの出力の確認:
+    python rpa_metrics.py metrics.json
+"""
+
+import argparse
+import atexit
+import functools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# バケットの上限（秒）。1ミリ秒未満から数分（.docの変換）まで
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0,
+)
+
+# 段階ごと・操作ごとの処理時間のメトリクス名
+STAGE_METRIC = "rpa_stage_seconds"
+OPERATION_METRIC = "rpa_operation_seconds"
+
+# キャッシュの件数のメトリクス名（カウンター）
+CACHE_HIT_METRIC = "rpa_cache_hits_total"
+CACHE_MISS_METRIC = "rpa_cache_misses_total"
+CACHE_EVICTION_METRIC = "rpa_cache_evictions_total"
+
+METRIC_DESCRIPTIONS = {
+    STAGE_METRIC: "Duration of document generation and calculation stages",
+    OPERATION_METRIC: "Duration of user-facing operations",
+    CACHE_HIT_METRIC: "Number of cache lookups that found an entry",
+    CACHE_MISS_METRIC: "Number of cache lookups that did not find an entry",
+    CACHE_EVICTION_METRIC: "Number of entries removed from a full cache",
+}
+
+# JSONに出力する推定パーセンタイル
+QUANTILES = (0.5, 0.9, 0.99)
+
+# 出力先の環境変数
+PROMETHEUS_ENV = "RPA_METRICS_PROM"
+JSON_ENV = "RPA_METRICS_JSON"
+INTERVAL_ENV = "RPA_METRICS_INTERVAL"
+
+# 定期出力の間隔（秒）の既定値
+DEFAULT_INTERVAL = 15.0
+
+
+class Histogram:
+    """
+    1つのメトリクス（名前とラベルの組み合わせ）の処理時間の分布
+
+    observe()は複数のスレッドから呼び出せます。
+    """
+
+    def __init__(self, name, labels, buckets=DEFAULT_BUCKETS):
+        """
+        Args:
+            name (str): メトリクス名
+            labels (dict): ラベル
+            buckets (tuple): バケットの上限（秒、昇順）
+        """
+        self.name = name
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """集計のクリア"""
+        with self._lock:
+            # 最後の要素は上限を超えた件数（+Inf）
+            self.bucket_counts = [0] * (len(self.buckets) + 1)
+            self.count = 0
+            self.sum = 0.0
+            self.max = 0.0
+            self.failures = 0
+
+    def observe(self, seconds, failed=False):
+        """
+        処理時間の記録
+
+        Args:
+            seconds (float): 処理時間（秒）
+            failed (bool): 例外で終了したか
+        """
+        index = bisect_left(self.buckets, seconds)
+        with self._lock:
+            self.bucket_counts[index] += 1
+            self.count += 1
+            self.sum += seconds
+            if seconds > self.max:
+                self.max = seconds
+            if failed:
+                self.failures += 1
+
+    def time(self):
+        """
+        処理時間を記録するコンテキストマネージャー（例外で終了した場合は失敗として記録）
+
+        Returns:
+            Span: with文で使用する計測区間
+        """
+        return Span(self)
+
+    def quantile(self, q):
+        """
+        パーセンタイルの推定（バケット内は線形補間。Prometheusのhistogram_quantileと同じ方法）
+
+        Args:
+            q (float): 0～1
+
+        Returns:
+            float: 推定値（秒）。記録がない場合はNone
+        """
+        with self._lock:
+            counts = list(self.bucket_counts)
+            total = self.count
+            maximum = self.max
+        if total == 0:
+            return None
+        rank = q * total
+        cumulative = 0
+        for index, count in enumerate(counts):
+            if cumulative + count >= rank and count:
+                lower = self.buckets[index - 1] if index else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else maximum
+                return min(lower + (upper - lower) * (rank - cumulative) / count, maximum)
+            cumulative += count
+        return maximum
+
+    def snapshot(self):
+        """
+        集計結果
+
+        Returns:
+            dict: name, labels, count, sum, mean, max, failures, 推定パーセンタイル、buckets（上限 → 累積件数）
+        """
+        with self._lock:
+            counts = list(self.bucket_counts)
+            count, total, maximum, failures = self.count, self.sum, self.max, self.failures
+        cumulative = 0
+        buckets = {}
+        for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += bucket_count
+            buckets[_format_bound(bound)] = cumulative
+        result = {
+            "name": self.name,
+            "labels": dict(self.labels),
+            "count": count,
+            "sum": total,
+            "mean": total / count if count else None,
+            "max": maximum,
+            "failures": failures,
+        }
+        for q in QUANTILES:
+            result[f"p{round(q * 100)}"] = self.quantile(q)
+        result["buckets"] = buckets
+        return result
+
+
+class Span:
+    """計測区間（with文の開始から終了までの時間をヒストグラムに記録）"""
+
+    __slots__ = ("histogram", "start", "elapsed")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+        self.start = None
+        self.elapsed = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.elapsed = time.perf_counter() - self.start
+        self.histogram.observe(self.elapsed, exc_type is not None)
+        return False
+
+
+class Counter:
+    """
+    件数のカウンター（キャッシュのヒット数など）
+
+    inc()は複数のスレッドから呼び出せます。
+    """
+
+    def __init__(self, name, labels):
+        """
+        Args:
+            name (str): メトリクス名
+            labels (dict): ラベル
+        """
+        self.name = name
+        self.labels = labels
+        self._lock = threading.Lock()
+        self.value = 0
+
+    def reset(self):
+        """集計のクリア"""
+        with self._lock:
+            self.value = 0
+
+    def inc(self, amount=1):
+        """
+        件数の加算
+
+        Args:
+            amount (int): 加算する件数
+        """
+        with self._lock:
+            self.value += amount
+
+    def snapshot(self):
+        """
+        集計結果
+
+        Returns:
+            dict: name, labels, value
+        """
+        return {"name": self.name, "labels": dict(self.labels), "value": self.value}
+
+
+class MetricsRegistry:
+    """
+    プロセス内のヒストグラムとカウンターの一覧
+
+    同じ名前とラベルのヒストグラム・カウンターは1つだけ作成します。頻繁に計測する箇所では、
+    モジュールの読み込み時に取得したヒストグラム・カウンターを使い回してください。
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        """
+        Args:
+            buckets (tuple): バケットの上限（秒、昇順）
+        """
+        self.buckets = tuple(buckets)
+        self.started = time.time()
+        self._histograms = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name, **labels):
+        """
+        ヒストグラムの取得（なければ作成）
+
+        Args:
+            name (str): メトリクス名
+            **labels: ラベル
+
+        Returns:
+            Histogram: ヒストグラム
+        """
+        key = (name, tuple(sorted(labels.items())))
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.get(key)
+                if histogram is None:
+                    histogram = Histogram(name, dict(key[1]), self.buckets)
+                    self._histograms[key] = histogram
+        return histogram
+
+    def counter(self, name, **labels):
+        """
+        カウンターの取得（なければ作成）
+
+        Args:
+            name (str): メトリクス名（Prometheusの慣例に合わせて末尾を_totalにする）
+            **labels: ラベル
+
+        Returns:
+            Counter: カウンター
+        """
+        key = (name, tuple(sorted(labels.items())))
+        counter = self._counters.get(key)
+        if counter is None:
+            with self._lock:
+                counter = self._counters.get(key)
+                if counter is None:
+                    counter = Counter(name, dict(key[1]))
+                    self._counters[key] = counter
+        return counter
+
+    def histograms(self):
+        """ヒストグラムの一覧（名前、ラベルの順）"""
+        with self._lock:
+            return [self._histograms[key] for key in sorted(self._histograms)]
+
+    def counters(self):
+        """カウンターの一覧（名前、ラベルの順）"""
+        with self._lock:
+            return [self._counters[key] for key in sorted(self._counters)]
+
+    def reset(self):
+        """すべての集計のクリア（ヒストグラム・カウンター自体は残す）"""
+        for histogram in self.histograms():
+            histogram.reset()
+        for counter in self.counters():
+            counter.reset()
+
+    def snapshot(self):
+        """
+        集計結果
+
+        Returns:
+            dict: started（計測開始日時）, written（出力日時）, pid, metrics（記録のあるヒストグラムの集計結果）,
+                counters（カウンターの値）
+        """
+        return {
+            "started": datetime.fromtimestamp(self.started).isoformat(timespec="seconds"),
+            "written": datetime.now().isoformat(timespec="seconds"),
+            "pid": os.getpid(),
+            "metrics": [histogram.snapshot() for histogram in self.histograms() if histogram.count],
+            "counters": [counter.snapshot() for counter in self.counters()],
+        }
+
+    def to_prometheus(self):
+        """
+        Prometheusのテキスト形式
+
+        ヒストグラムごとに_bucket、_sum、_countを、例外で終了した件数を<名前>_failures_total
+        （名前の末尾の_secondsを除いたもの）として出力します。カウンターは値をそのまま出力します。
+
+        Returns:
+            str: テキスト
+        """
+        histograms = self.histograms()
+        lines = []
+        for name in sorted({histogram.name for histogram in histograms}):
+            group = [histogram for histogram in histograms if histogram.name == name]
+            lines.append(f"# HELP {name} {METRIC_DESCRIPTIONS.get(name, name)}")
+            lines.append(f"# TYPE {name} histogram")
+            for histogram in group:
+                snapshot = histogram.snapshot()
+                for bound, count in snapshot["buckets"].items():
+                    lines.append(f"{name}_bucket{_format_labels(histogram.labels, le=bound)} {count}")
+                lines.append(f"{name}_sum{_format_labels(histogram.labels)} {snapshot['sum']!r}")
+                lines.append(f"{name}_count{_format_labels(histogram.labels)} {snapshot['count']}")
+
+            failures = f"{name.removesuffix('_seconds')}_failures_total"
+            lines.append(f"# HELP {failures} Number of {name} observations that ended with an exception")
+            lines.append(f"# TYPE {failures} counter")
+            for histogram in group:
+                lines.append(f"{failures}{_format_labels(histogram.labels)} {histogram.failures}")
+
+        counters = self.counters()
+        for name in sorted({counter.name for counter in counters}):
+            lines.append(f"# HELP {name} {METRIC_DESCRIPTIONS.get(name, name)}")
+            lines.append(f"# TYPE {name} counter")
+            for counter in counters:
+                if counter.name == name:
+                    lines.append(f"{name}{_format_labels(counter.labels)} {counter.value}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_bound(bound):
+    """バケットの上限の文字列（Prometheusのle）"""
+    return "+Inf" if bound == float("inf") else repr(float(bound))
+
+
+def _format_labels(labels, **extra):
+    """Prometheusのラベルの文字列"""
+    items = list(labels.items()) + list(extra.items())
+    if not items:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape_label(value)}"' for key, value in items) + "}"
+
+
+def _escape_label(value):
+    """ラベルの値のエスケープ（\\、"、改行）"""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# ==================== プロセス全体の計測 ====================
+
+REGISTRY = MetricsRegistry()
+
+
+def stage(name, **labels):
+    """
+    段階ごとの処理時間のヒストグラム
+
+    Args:
+        name (str): 段階（template_load、cell_stamp、run_replace、xml_replace、save、conversion、calculation）
+        **labels: 追加のラベル（kind="word" など）
+
+    Returns:
+        Histogram: ヒストグラム
+    """
+    return REGISTRY.histogram(STAGE_METRIC, stage=name, **labels)
+
+
+def operation(name):
+    """
+    操作（画面のボタン、ジョブ）ごとの処理時間のヒストグラム
+
+    Args:
+        name (str): 操作名
+
+    Returns:
+        Histogram: ヒストグラム
+    """
+    return REGISTRY.histogram(OPERATION_METRIC, operation=name)
+
+
+def timed(name):
+    """
+    関数の処理時間を操作として記録するデコレーター
+
+    Args:
+        name (str): 操作名
+    """
+    histogram = operation(name)
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with histogram.time():
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+# ==================== 出力 ====================
+
+
+def _write_atomic(path, text):
+    """一時ファイルに書いてから置き換える（読み取り側が書き込み途中のファイルを読まないようにする）"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    temp_file = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_file, "w", encoding="utf-8", newline="\n") as f:
+            f.write(text)
+        os.replace(temp_file, path)
+    finally:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+
+
+def write_json(path, registry=REGISTRY):
+    """
+    集計結果をJSONで出力
+
+    Args:
+        path (str): 出力ファイル
+        registry (MetricsRegistry): 出力するヒストグラムの一覧
+    """
+    _write_atomic(path, json.dumps(registry.snapshot(), ensure_ascii=False, indent=2))
+
+
+def write_prometheus(path, registry=REGISTRY):
+    """
+    集計結果をPrometheusのテキスト形式で出力（textfile collectorのフォルダーに.promとして置く）
+
+    Args:
+        path (str): 出力ファイル
+        registry (MetricsRegistry): 出力するヒストグラムの一覧
+    """
+    _write_atomic(path, registry.to_prometheus())
+
+
+class MetricsExporter:
+    """集計結果の定期出力（デーモンスレッド）"""
+
+    def __init__(self, prometheus_path=None, json_path=None, interval=DEFAULT_INTERVAL, registry=REGISTRY):
+        """
+        Args:
+            prometheus_path (str): Prometheusのテキスト形式の出力ファイル
+            json_path (str): JSONの出力ファイル
+            interval (float): 出力の間隔（秒）
+            registry (MetricsRegistry): 出力するヒストグラムの一覧
+        """
+        self.prometheus_path = prometheus_path
+        self.json_path = json_path
+        self.interval = interval
+        self.registry = registry
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="rpa-metrics", daemon=True)
+
+    def start(self):
+        """定期出力の開始"""
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """定期出力の終了（最後に1回出力する）"""
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        self.write()
+
+    def write(self):
+        """集計結果の出力（書き込めない場合は次の出力で再試行する）"""
+        try:
+            if self.prometheus_path:
+                write_prometheus(self.prometheus_path, self.registry)
+            if self.json_path:
+                write_json(self.json_path, self.registry)
+        except OSError as e:
+            logger.warning("メトリクスを出力できません: %s", e)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.write()
+
+
+_exporter = None
+
+
+def start_exporter(prometheus_path=None, json_path=None, interval=None):
+    """
+    集計結果の定期出力の開始（プロセスで1回だけ。終了時にも出力する）
+
+    引数を省略した場合は環境変数（RPA_METRICS_PROM、RPA_METRICS_JSON、RPA_METRICS_INTERVAL）を使用します。
+
+    Args:
+        prometheus_path (str): Prometheusのテキスト形式の出力ファイル
+        json_path (str): JSONの出力ファイル
+        interval (float): 出力の間隔（秒）
+
+    Returns:
+        MetricsExporter: 定期出力（出力先の指定がない場合はNone）
+    """
+    global _exporter
+    if _exporter is not None:
+        return _exporter
+    prometheus_path = prometheus_path or os.environ.get(PROMETHEUS_ENV)
+    json_path = json_path or os.environ.get(JSON_ENV)
+    if not prometheus_path and not json_path:
+        return None
+    if interval is None:
+        interval = float(os.environ.get(INTERVAL_ENV) or DEFAULT_INTERVAL)
+    _exporter = MetricsExporter(prometheus_path, json_path, interval).start()
+    atexit.register(_exporter.stop)
+    return _exporter
+
+
+# ==================== コマンドライン ====================
+
+
+def format_table(snapshot):
+    """
+    JSONの集計結果を表にする
+
+    Args:
+        snapshot (dict): write_json()で出力した集計結果
+
+    Returns:
+        str: 表のテキスト（時間はミリ秒）
+    """
+    header = ["metric", "labels", "count", "failures", "mean_ms", "p50_ms", "p90_ms", "p99_ms", "max_ms"]
+    rows = [header]
+    for metric in snapshot["metrics"]:
+        labels = ",".join(f"{key}={value}" for key, value in metric["labels"].items())
+        milliseconds = [
+            "-" if metric[field] is None else f"{metric[field] * 1000:.1f}"
+            for field in ("mean", "p50", "p90", "p99", "max")
+        ]
+        rows.append([metric["name"], labels, str(metric["count"]), str(metric["failures"])] + milliseconds)
+    widths = [max(len(row[index]) for row in rows) for index in range(len(header))]
+    return "\n".join(
+        "  ".join(cell.ljust(width) if index < 2 else cell.rjust(width) for index, (cell, width) in enumerate(zip(row, widths)))
+        for row in rows
+    )
+
+
+def main(argv=None):
+    """コマンドラインからの実行"""
+    parser = argparse.ArgumentParser(description="処理時間の集計結果（JSON）の表示")
+    parser.add_argument("metrics", help=f"write_json()または環境変数{JSON_ENV}で出力したファイル")
+    args = parser.parse_args(argv)
+
+    try:
+        with open(args.metrics, encoding="utf-8") as f:
+            snapshot = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"エラー: {e}", file=sys.stderr)
+        return 1
+    print(f"計測開始: {snapshot['started']}  出力: {snapshot['written']}  PID: {snapshot['pid']}")
+    print(format_table(snapshot))
+    # 以前の形式のファイルにはcountersがない
+    for counter in snapshot.get("counters", []):
+        labels = ",".join(f"{key}={value}" for key, value in counter["labels"].items())
+        print(f"{counter['name']}  {labels}  {counter['value']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
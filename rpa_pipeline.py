@@ -0,0 +1,570 @@
+"""
+受注一覧からの書類一括作成（検証 → Excel → Word）
+
+NewRPASystemで受注ごとに行っている「入力の検証」「検査表（check1.xlsx）への書き込み」
+「検査表（check2.docx）のキー文字列の置換」を、受注一覧（CSV）の全行についてまとめて行います。
+
+各工程（ステージ）は指定した数のワーカープロセスで実行し、工程の間は上限のあるキューでつなぎます。
+検証の済んだチャンクから順にExcel、Wordの工程へ渡すため、XMLの作成（CPU）とファイルの書き込み（ディスク）が
+工程をまたいで並行して進みます。後ろの工程が追いつかない場合は前の工程がキューの空きを待つため、
+メモリ使用量は受注一覧の行数によらず (キューの長さ × チャンクの行数) 程度で一定です。
+
+ある工程で処理できなかった受注は以降の工程に渡さず、理由を付けてリジェクトファイルに出力します。
+同じ受注番号・製造番号の行は出力ファイルが同じになるため、2行目以降をリジェクトにします。
+出力ファイルは一時ファイルに書き込んでから置き換えるため、途中で中断しても書きかけのファイルは残りません。
+
+使用方法:
+    python rpa_pipeline.py orders.csv -o output
+    python rpa_pipeline.py orders.csv --excel-template check1.xlsx --word-template check2.docx -o output
+    python rpa_pipeline.py orders.csv -o output --excel-workers 2 --word-workers 2 --queue-size 8
+    （orders.csvの列: ユーザ名,型番,製造番号,受注番号）
+"""
+
+import argparse
+import contextlib
+import csv
+import itertools
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+import time
+import zipfile
+
+from rpa_excel_template import check_sheet_values, get_template
+from rpa_jobs import EXCEL, WORD, part_path
+from rpa_logging import setup_logging
+from rpa_metrics import operation, start_exporter
+from rpa_validate import ORDER_FIELDS, validate_orders
+from rpa_word import inspection_replacements
+from rpa_word_template import WordTemplate, order_output_path
+
+# 工程（実行順）
+VALIDATE = "validate"
+STAGES = [VALIDATE, EXCEL, WORD]
+
+# 工程の表示名
+STAGE_LABELS = {VALIDATE: "検証", EXCEL: "Excel", WORD: "Word"}
+
+# リジェクトファイルの列（行番号、入力値、リジェクトした工程、理由）
+REJECT_COLUMNS = ["line"] + ORDER_FIELDS + ["stage", "errors"]
+
+DEFAULT_EXCEL_TEMPLATE = "check1.xlsx"
+DEFAULT_WORD_TEMPLATE = "check2.docx"
+DEFAULT_CHUNK_SIZE = 50
+DEFAULT_QUEUE_SIZE = 4
+
+# ワーカーの異常終了を確認する間隔（秒）
+_POLL_INTERVAL = 0.5
+
+
+class PipelineError(Exception):
+    """一括作成を続けられないエラー（ワーカーの異常終了など）"""
+
+
+# ==================== 入力 ====================
+
+
+def read_order_chunks(stream, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    受注一覧をチャンク単位で読み込み
+
+    1行目はヘッダー（ユーザ名,型番,製造番号,受注番号を含む。列の順序は問わない）です。
+    値の前後の空白は除き（画面からの入力と同じ）、すべての値が空の行は読み飛ばします。
+
+    Args:
+        stream: 入力ファイルオブジェクト
+        chunk_size (int): 1チャンクの行数
+
+    Yields:
+        list: (行番号, [ユーザ名, 型番, 製造番号, 受注番号]) のリスト
+
+    Raises:
+        ValueError: 必要な列がない場合
+    """
+    reader = csv.reader(stream)
+    header = [column.strip() for column in next(reader, None) or []]
+    missing = [field for field in ORDER_FIELDS if field not in header]
+    if missing:
+        raise ValueError(f"列がありません: {', '.join(missing)}")
+    indexes = [header.index(field) for field in ORDER_FIELDS]
+
+    chunk = []
+    for fields in reader:
+        values = [fields[index].strip() if index < len(fields) else "" for index in indexes]
+        if not any(values):
+            continue
+        chunk.append((reader.line_num, values))
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _reason(errors):
+    """エラーメッセージのリストをリジェクトファイルの1列にする"""
+    return " / ".join(error.replace("\n", " ") for error in errors)
+
+
+# ==================== 工程 ====================
+
+
+class ValidateStage:
+    """入力の検証（rpa_validateの入力規則。チャンクの各列をまとめて検証）"""
+
+    def __init__(self, config):
+        """
+        Args:
+            config (dict): 実行時の設定（使用しない）
+        """
+
+    def __call__(self, chunk):
+        """
+        チャンクの処理
+
+        Args:
+            chunk (list): (行番号, 入力値のリスト) のリスト
+
+        Returns:
+            tuple: (次の工程に渡す行のリスト, (行番号, 入力値のリスト, 理由) のリスト)
+        """
+        result = validate_orders(*zip(*(values for _, values in chunk)))
+        passed = [row for row, valid in zip(chunk, result.valid) if valid]
+        rejects = [(chunk[row][0], chunk[row][1], _reason(errors)) for row, errors in result.iter_errors()]
+        return passed, rejects
+
+
+class _DocumentStage:
+    """書類の作成（受注ごとに一時ファイルへ書き込んでから出力ファイルに置き換える）"""
+
+    def __init__(self, config, template_path):
+        """
+        Args:
+            config (dict): 実行時の設定（output_dir、excel_template、word_template）
+            template_path (str): テンプレート
+        """
+        self.output_dir = config["output_dir"]
+        self.template_path = template_path
+
+    def __call__(self, chunk):
+        """
+        チャンクの処理（失敗した受注だけをリジェクトにする）
+
+        Args:
+            chunk (list): (行番号, 入力値のリスト) のリスト
+
+        Returns:
+            tuple: (次の工程に渡す行のリスト, (行番号, 入力値のリスト, 理由) のリスト)
+        """
+        passed = []
+        rejects = []
+        with self.open() as source:
+            for line, values in chunk:
+                try:
+                    self.create(values, source)
+                except Exception as e:
+                    rejects.append((line, values, f"{e.__class__.__name__}: {e}"))
+                else:
+                    passed.append((line, values))
+        return passed, rejects
+
+    def create(self, values, source):
+        """1件の受注の書類を作成"""
+        username, model, manufacturing, order = values
+        output_path = order_output_path(self.output_dir, self.template_path, order, manufacturing)
+        temporary = part_path(output_path)
+        try:
+            self.write(values, temporary, source)
+            # 書き込みが完了してから出力ファイルに置き換える
+            os.replace(temporary, output_path)
+        finally:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+
+    def open(self):
+        """チャンクの処理中に開いておくテンプレート（コンテキストマネージャー）"""
+        return contextlib.nullcontext()
+
+    def write(self, values, temporary, source):
+        """一時ファイルへの出力"""
+        raise NotImplementedError
+
+
+class ExcelStage(_DocumentStage):
+    """検査表（Excel）への書き込み"""
+
+    def __init__(self, config):
+        super().__init__(config, config["excel_template"])
+        self.template = get_template(self.template_path)
+
+    def write(self, values, temporary, source):
+        self.template.fill(check_sheet_values(*values), temporary)
+
+
+class WordStage(_DocumentStage):
+    """検査表（Word）のキー文字列の置換"""
+
+    def __init__(self, config):
+        super().__init__(config, config["word_template"])
+        self.template = WordTemplate.load(self.template_path, inspection_replacements("", ""))
+
+    def open(self):
+        # テンプレートはチャンクごとに1回だけ開く
+        return zipfile.ZipFile(self.template.path)
+
+    def write(self, values, temporary, source):
+        username, model, manufacturing, order = values
+        self.template.fill(inspection_replacements(order, manufacturing), temporary, source)
+
+
+# 工程 → 処理するクラス
+STAGE_CLASSES = {VALIDATE: ValidateStage, EXCEL: ExcelStage, WORD: WordStage}
+
+
+class _FailedStage:
+    """準備に失敗した工程（受け取った行をすべてリジェクトにする）"""
+
+    def __init__(self, error):
+        self.reason = f"ワーカーエラー: {error.__class__.__name__}: {error}"
+
+    def __call__(self, chunk):
+        return [], [(line, values, self.reason) for line, values in chunk]
+
+
+def _stage_worker(stage_name, config, inbox, outbox, results):
+    """
+    ワーカープロセスで1つの工程を実行
+
+    inboxからNone（終了の合図）を受け取るまでチャンクを処理し、通過した行をoutbox（最後の工程はNone）に、
+    処理結果をresultsに送ります。終了時にはresultsに ("finished", 工程) を送ります。
+
+    resultsに送るメッセージ:
+        ("chunk", 工程, プロセスID, 行数, 通過した行数, リジェクトのリスト, 開始時刻, 処理時間（秒）, 待ち時間（秒）)
+        待ち時間は、次の工程のキューが空くのを待った時間です。
+    """
+    try:
+        handler = STAGE_CLASSES[stage_name](config)
+    except Exception as e:
+        handler = _FailedStage(e)
+    while True:
+        chunk = inbox.get()
+        if chunk is None:
+            break
+        started = time.time()
+        start = time.perf_counter()
+        passed, rejects = handler(chunk)
+        busy = time.perf_counter() - start
+        blocked = 0.0
+        if outbox is not None and passed:
+            start = time.perf_counter()
+            outbox.put(passed)
+            blocked = time.perf_counter() - start
+        results.put(("chunk", stage_name, os.getpid(), len(chunk), len(passed), rejects, started, busy, blocked))
+    results.put(("finished", stage_name))
+
+
+# ==================== 実行 ====================
+
+
+class StageStats:
+    """工程ごとの処理件数と処理時間"""
+
+    def __init__(self, workers):
+        """
+        Args:
+            workers (int): ワーカープロセス数
+        """
+        self.workers = workers
+        self.rows = 0
+        self.passed = 0
+        self.rejected = 0
+        self.chunks = 0
+        self.busy = 0.0
+        self.blocked = 0.0
+        self.first_start = None
+        self.last_end = None
+        self.pids = set()
+
+    def add(self, pid, rows, passed, rejected, started, busy, blocked):
+        """1チャンクの処理結果を集計"""
+        self.rows += rows
+        self.passed += passed
+        self.rejected += rejected
+        self.chunks += 1
+        self.busy += busy
+        self.blocked += blocked
+        self.pids.add(pid)
+        if self.first_start is None or started < self.first_start:
+            self.first_start = started
+        if self.last_end is None or started + busy > self.last_end:
+            self.last_end = started + busy
+
+    @property
+    def active(self):
+        """最初のチャンクの開始から最後のチャンクの終了までの時間（秒）"""
+        if self.first_start is None:
+            return 0.0
+        return self.last_end - self.first_start
+
+    @property
+    def rate(self):
+        """処理量（件/秒。処理していた時間あたり）"""
+        return self.rows / self.active if self.active > 0 else 0.0
+
+    @property
+    def worker_rate(self):
+        """ワーカー1つあたりの処理量（件/秒。処理時間あたり）"""
+        return self.rows / self.busy if self.busy > 0 else 0.0
+
+    @property
+    def utilization(self):
+        """ワーカーの稼働率（処理時間の合計 ÷ (処理していた時間 × ワーカー数)）"""
+        capacity = self.active * self.workers
+        return self.busy / capacity if capacity > 0 else 0.0
+
+
+def _feed(chunks, inbox, workers, results, errors):
+    """
+    受注一覧を読み込んで検証のキューに送る（読み込みのスレッド）
+
+    同じ受注番号・製造番号の2行目以降はここでリジェクトにします。最後に検証のワーカー数だけ終了の合図を送ります。
+    """
+    seen = {}
+    try:
+        for chunk in chunks:
+            unique = []
+            for line, values in chunk:
+                key = (values[3], values[2])
+                if all(key) and key in seen:
+                    reason = f"同じ受注番号・製造番号の行があります（{seen[key]}行目）"
+                    results.put(("rejected", VALIDATE, line, values, reason))
+                    continue
+                seen.setdefault(key, line)
+                unique.append((line, values))
+            if unique:
+                inbox.put(unique)
+    except Exception as e:
+        errors.append(e)
+    finally:
+        for _ in range(workers):
+            inbox.put(None)
+
+
+def run_pipeline(orders_path, output_dir, excel_template=DEFAULT_EXCEL_TEMPLATE, word_template=DEFAULT_WORD_TEMPLATE,
+                 rejects_path=None, workers=None, chunk_size=DEFAULT_CHUNK_SIZE, queue_size=DEFAULT_QUEUE_SIZE,
+                 encoding="utf-8-sig"):
+    """
+    受注一覧からの書類一括作成
+
+    Args:
+        orders_path (str): 受注一覧のCSVファイル（ユーザ名,型番,製造番号,受注番号）
+        output_dir (str): 出力フォルダー
+        excel_template (str): 検査表（Excel）のテンプレート
+        word_template (str): 検査表（Word）のテンプレート
+        rejects_path (str): リジェクトファイル（Noneの場合は <出力フォルダー>/rejects.csv）
+        workers (dict): 工程 → ワーカープロセス数（省略した工程は1）
+        chunk_size (int): 1チャンクの行数
+        queue_size (int): 工程の間のキューに置けるチャンク数
+        encoding (str): 受注一覧の文字コード
+
+    Returns:
+        dict: {"rows", "done", "rejected", "elapsed", "rejects_path", "stages"}。
+            "stages"は工程 → StageStats
+
+    Raises:
+        OSError: 受注一覧やテンプレートを読み込めない場合
+        ValueError: 受注一覧に必要な列がない場合
+        PipelineError: ワーカーが異常終了した場合
+    """
+    workers = {stage_name: (workers or {}).get(stage_name, 1) for stage_name in STAGES}
+    if rejects_path is None:
+        rejects_path = os.path.join(output_dir, "rejects.csv")
+    config = {
+        "output_dir": os.path.abspath(output_dir),
+        "excel_template": os.path.abspath(excel_template),
+        "word_template": os.path.abspath(word_template),
+    }
+    # テンプレートは開始前に読み込んで確認する（Wordはコンパイル結果のキャッシュも作成され、ワーカーはそれを読み込む）
+    get_template(config["excel_template"])
+    WordTemplate.load(config["word_template"], inspection_replacements("", ""))
+    os.makedirs(output_dir, exist_ok=True)
+
+    stats = {stage_name: StageStats(workers[stage_name]) for stage_name in STAGES}
+    start = time.perf_counter()
+    with open(orders_path, newline="", encoding=encoding) as stream, \
+            open(rejects_path, "w", newline="", encoding="utf-8-sig") as rejects_stream:
+        rejects = csv.writer(rejects_stream)
+        rejects.writerow(REJECT_COLUMNS)
+        # ヘッダーはワーカーを起動する前に確認する
+        chunks = read_order_chunks(stream, chunk_size)
+        first = next(chunks, None)
+        if first is not None:
+            chunks = itertools.chain([first], chunks)
+
+        inboxes = [multiprocessing.Queue(queue_size) for _ in STAGES]
+        results = multiprocessing.Queue()
+        processes = {stage_name: [] for stage_name in STAGES}
+        for index, stage_name in enumerate(STAGES):
+            outbox = inboxes[index + 1] if index + 1 < len(STAGES) else None
+            for _ in range(workers[stage_name]):
+                process = multiprocessing.Process(
+                    target=_stage_worker, args=(stage_name, config, inboxes[index], outbox, results), daemon=True
+                )
+                process.start()
+                processes[stage_name].append(process)
+
+        feed_errors = []
+        feeder = threading.Thread(
+            target=_feed,
+            args=(chunks, inboxes[0], workers[VALIDATE], results, feed_errors),
+            daemon=True,
+        )
+        try:
+            with operation("order_pipeline").time():
+                feeder.start()
+                _collect(results, inboxes, processes, workers, stats, rejects)
+                feeder.join()
+        finally:
+            for process in (process for stage_processes in processes.values() for process in stage_processes):
+                if process.is_alive():
+                    process.terminate()
+                process.join()
+        if feed_errors:
+            raise feed_errors[0]
+
+    return {
+        "rows": stats[VALIDATE].rows,
+        "done": stats[WORD].passed,
+        "rejected": sum(stage_stats.rejected for stage_stats in stats.values()),
+        "elapsed": time.perf_counter() - start,
+        "rejects_path": rejects_path,
+        "stages": stats,
+    }
+
+
+def _collect(results, inboxes, processes, workers, stats, rejects):
+    """
+    処理結果の集計とリジェクトファイルへの出力（最後の工程のワーカーがすべて終了するまで）
+
+    ある工程のワーカーがすべて終了したら、次の工程のワーカー数だけ終了の合図を送ります。
+    """
+    finished = {stage_name: 0 for stage_name in STAGES}
+    while finished[STAGES[-1]] < workers[STAGES[-1]]:
+        try:
+            message = results.get(timeout=_POLL_INTERVAL)
+        except queue.Empty:
+            _check_workers(processes, finished, workers)
+            continue
+        kind, stage_name = message[:2]
+        if kind == "chunk":
+            pid, rows, passed, stage_rejects, started, busy, blocked = message[2:]
+            stats[stage_name].add(pid, rows, passed, len(stage_rejects), started, busy, blocked)
+            for line, values, reason in stage_rejects:
+                rejects.writerow([line] + values + [stage_name, reason])
+        elif kind == "rejected":
+            line, values, reason = message[2:]
+            stats[stage_name].rows += 1
+            stats[stage_name].rejected += 1
+            rejects.writerow([line] + values + [stage_name, reason])
+        elif kind == "finished":
+            finished[stage_name] += 1
+            index = STAGES.index(stage_name)
+            if finished[stage_name] == workers[stage_name] and index + 1 < len(STAGES):
+                for _ in range(workers[STAGES[index + 1]]):
+                    inboxes[index + 1].put(None)
+
+
+def _check_workers(processes, finished, workers):
+    """終了の合図を送る前に終了したワーカーがあればPipelineErrorを送出"""
+    for stage_name, stage_processes in processes.items():
+        if finished[stage_name] == workers[stage_name]:
+            continue
+        for process in stage_processes:
+            if process.exitcode not in (None, 0):
+                raise PipelineError(
+                    f"{STAGE_LABELS[stage_name]}のワーカー（PID {process.pid}）が異常終了しました（終了コード {process.exitcode}）"
+                )
+
+
+# ==================== コマンドライン ====================
+
+
+def format_summary(result):
+    """
+    実行結果の表示用テキスト
+
+    Args:
+        result (dict): run_pipeline()の戻り値
+
+    Returns:
+        list: 表示する行のリスト
+    """
+    rate = result["done"] / result["elapsed"] if result["elapsed"] > 0 else 0.0
+    lines = [
+        f"処理完了: {result['rows']}件（作成 {result['done']}件、リジェクト {result['rejected']}件）"
+        f" {result['elapsed']:.2f}秒 {rate:,.1f}件/秒"
+    ]
+    for stage_name in STAGES:
+        stage_stats = result["stages"][stage_name]
+        lines.append(
+            f"  {STAGE_LABELS[stage_name]}: {stage_stats.rows}件（リジェクト {stage_stats.rejected}件）"
+            f" {stage_stats.rate:,.1f}件/秒 ワーカー{stage_stats.workers}"
+            f"（処理時間 {stage_stats.busy:.2f}秒 {stage_stats.worker_rate:,.1f}件/秒/ワーカー 稼働率 {stage_stats.utilization:.0%}）"
+            f" 次の工程の待ち {stage_stats.blocked:.2f}秒"
+        )
+    return lines
+
+
+def main(argv=None):
+    """コマンドラインからの実行"""
+    parser = argparse.ArgumentParser(description="受注一覧からの書類一括作成（検証 → Excel → Word）")
+    parser.add_argument("orders", help="受注一覧のCSVファイル（ユーザ名,型番,製造番号,受注番号）")
+    parser.add_argument("-o", "--output-dir", default="output", help="出力フォルダー（既定: output）")
+    parser.add_argument(
+        "--excel-template", default=DEFAULT_EXCEL_TEMPLATE, help=f"検査表（Excel）のテンプレート（既定: {DEFAULT_EXCEL_TEMPLATE}）"
+    )
+    parser.add_argument(
+        "--word-template", default=DEFAULT_WORD_TEMPLATE, help=f"検査表（Word）のテンプレート（既定: {DEFAULT_WORD_TEMPLATE}）"
+    )
+    parser.add_argument("--rejects", help="リジェクトファイル（既定: <出力フォルダー>/rejects.csv）")
+    parser.add_argument("--validate-workers", type=int, default=1, help="検証のワーカープロセス数（既定: 1）")
+    parser.add_argument("--excel-workers", type=int, default=1, help="Excelのワーカープロセス数（既定: 1）")
+    parser.add_argument("--word-workers", type=int, default=1, help="Wordのワーカープロセス数（既定: 1）")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help=f"1チャンクの行数（既定: {DEFAULT_CHUNK_SIZE}）")
+    parser.add_argument(
+        "--queue-size", type=int, default=DEFAULT_QUEUE_SIZE, help=f"工程の間のキューに置けるチャンク数（既定: {DEFAULT_QUEUE_SIZE}）"
+    )
+    parser.add_argument("--encoding", default="utf-8-sig", help="受注一覧の文字コード（既定: utf-8-sig）")
+    args = parser.parse_args(argv)
+
+    workers = {VALIDATE: args.validate_workers, EXCEL: args.excel_workers, WORD: args.word_workers}
+    for stage_name, count in workers.items():
+        if count <= 0:
+            parser.error(f"--{stage_name}-workers は1以上を指定してください")
+    if args.chunk_size <= 0:
+        parser.error("--chunk-size は1以上を指定してください")
+    if args.queue_size <= 0:
+        parser.error("--queue-size は1以上を指定してください")
+
+    try:
+        result = run_pipeline(
+            args.orders, args.output_dir, args.excel_template, args.word_template, args.rejects, workers,
+            args.chunk_size, args.queue_size, args.encoding,
+        )
+    except (OSError, ValueError, zipfile.BadZipFile, PipelineError) as e:
+        print(f"エラー: {e}", file=sys.stderr)
+        return 1
+
+    for line in format_summary(result):
+        print(line, file=sys.stderr)
+    if result["rejected"]:
+        print(f"リジェクト: {result['rejects_path']}", file=sys.stderr)
+    return 1 if result["rejected"] else 0
+
+
+if __name__ == "__main__":
+    setup_logging()
+    start_exporter()
+    sys.exit(main())
@@ -0,0 +1,74 @@
+"""
+GUI起動後の事前読み込み
+
+GUIはopenpyxl、NumPyなど読み込みに時間のかかるモジュールを起動時には読み込まず、
+最初のExcel・Word操作の時に読み込みます。メインウィンドウの表示後にバックグラウンドのスレッドで
+これらのモジュールとテンプレート（check1.xlsx、check2.docx）を読み込んでおき、最初の操作も待たせないようにします。
+
+事前読み込みの途中で操作された場合は、同じモジュールの読み込みの完了を待ってから処理します
+（Pythonのインポートはモジュールごとに排他されるため、二重に読み込むことはありません）。
+"""
+
+import importlib
+import logging
+import threading
+
+from rpa_metrics import stage
+
+logger = logging.getLogger(__name__)
+
+# メインウィンドウの表示から事前読み込みを開始するまでの時間（ミリ秒）。最初の描画を優先する
+PREWARM_DELAY_MS = 300
+
+# 処理時間の計測（事前読み込み全体）
+_PREWARM = stage("prewarm")
+
+
+def prewarm(modules=(), steps=()):
+    """
+    モジュールの読み込みと準備処理の実行（失敗しても無視し、実際の操作時に改めてエラーを表示させる）
+
+    Args:
+        modules: 読み込むモジュール名
+        steps: 引数なしで呼び出す準備処理（テンプレートの読み込みなど）
+    """
+    with _PREWARM.time():
+        for name in modules:
+            try:
+                importlib.import_module(name)
+            except ImportError as e:
+                logger.warning("事前読み込みに失敗しました（無視）: %s: %s", name, e)
+        for step in steps:
+            try:
+                step()
+            except Exception as e:
+                logger.warning("事前読み込みに失敗しました（無視）: %s", e)
+    logger.debug("事前読み込みが完了しました")
+
+
+def start_prewarm(modules=(), steps=()):
+    """
+    バックグラウンドのスレッドで事前読み込みを開始
+
+    Args:
+        modules: 読み込むモジュール名
+        steps: 引数なしで呼び出す準備処理
+
+    Returns:
+        threading.Thread: 事前読み込みのスレッド（デーモンスレッドのため終了を待たない）
+    """
+    thread = threading.Thread(target=prewarm, args=(tuple(modules), tuple(steps)), name="rpa-prewarm", daemon=True)
+    thread.start()
+    return thread
+
+
+def schedule_prewarm(root, modules=(), steps=()):
+    """
+    メインウィンドウの表示後に事前読み込みを開始
+
+    Args:
+        root (tk.Tk): メインウィンドウ
+        modules: 読み込むモジュール名
+        steps: 引数なしで呼び出す準備処理
+    """
+    root.after(PREWARM_DELAY_MS, lambda: start_prewarm(modules, steps))
@@ -0,0 +1,492 @@
+"""
+計算ルールファイルの読み込み
+
+機種データ、B値・H値・C値・D値のテーブル、高さの制約を1つのルールファイル（rpa_rules.json）から
+読み込みます。読み込み時に内容を検証し（インチ数とリング数の個数、Hインデックスの連続性など）、
+不正な場合はRuleErrorを送出します。
+
+RuleWatcherはルールファイルの更新日時を監視し、変更されていれば読み込み・コンパイルし直して
+丸ごと差し替えます。計算中の処理は差し替え前のルールで最後まで計算し、次の呼び出しから新しいルールを
+使用するため、GUIや一括処理のワーカーを再起動する必要はありません。
+変更後のファイルが不正な場合はエラーをログに記録し、変更前のルールで計算を続けます。
+
+ルールファイルの形式:
+    format: ファイル形式の版（RULES_FORMAT）
+    version: ルールの版数（任意の文字列。計算履歴やログで使用）
+    height: 高さの最小値（min）、刻み（resolution）、Hインデックスの対象範囲（h_index）
+    machines: 機種データ（chain_data, inches, rings, data1, elb, elc, erb, erc, er, el, st）。
+        stは数値、または内訳の数値のリスト（合計を使用）
+    b_values: 機種 → {高さ（以上）: B値}（200, 201のみ。最小の高さ未満は0）
+    h_values: 機種 → {インチ数: H値}（350, 351のみ。ないインチ数は0）
+    c_values, d_values: 機種 → {Hインデックス: 値}（連続した範囲。範囲外は0）
+    c_inch_values: 機種 → {Hインデックス: {インチ数: C値}}（インチ数によってC値が異なる段）
+
+使用方法（ルールファイルの検証）:
+    python rpa_rules.py
+    python rpa_rules.py new_rules.json
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from typing import NamedTuple
+
+from rpa_metrics import stage
+
+logger = logging.getLogger(__name__)
+
+# ルールファイル（環境変数で変更可能）
+RULES_FILE_ENV = "RPA_RULES_FILE"
+DEFAULT_RULES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "rpa_rules.json")
+
+# 対応しているファイル形式の版
+RULES_FORMAT = 1
+
+# ルールファイルの更新を確認する間隔（秒）
+RELOAD_CHECK_INTERVAL = 1.0
+
+# 機種データの項目
+MACHINE_NUMBER_KEYS = ("chain_data", "data1", "elb", "elc", "erb", "erc", "er", "el")
+
+# 処理時間の計測（読み込み・検証・参照テーブルの構築）
+_RULE_LOAD = stage("rule_load")
+
+
+class RuleError(ValueError):
+    """
+    ルールファイルが読み込めない、または内容が不正な場合の例外
+
+    Attributes:
+        errors (list): 不正な箇所ごとのメッセージ
+    """
+
+    def __init__(self, message, errors=()):
+        super().__init__(message)
+        self.errors = list(errors)
+
+
+class RuleSet(NamedTuple):
+    """
+    検証済みの計算ルール
+
+    テーブルのキーは整数（機種コードのみ文字列）に変換済みです。
+    各テーブルは読み取り専用として扱ってください（変更する場合はルールファイルを編集します）。
+    """
+
+    version: str
+    machine_data: dict
+    b_values: dict
+    h_values: dict
+    c_values: dict
+    c_inch_values: dict
+    d_values: dict
+    min_height: int
+    height_resolution: int
+    h_index_min_height: int
+    h_index_max_height: int
+    h_index_first: int
+    h_index_last: int
+    path: str = None
+    signature: tuple = None
+    digest: str = None
+
+    @property
+    def machine_inches(self):
+        """有効な (機種, インチ数) の組み合わせ"""
+        return frozenset((machine, inch) for machine, info in self.machine_data.items() for inch in info["inches"])
+
+    def height_examples(self, count=3):
+        """
+        高さの入力例
+
+        Args:
+            count (int): 個数
+
+        Returns:
+            str: "2500, 2750, 3000" の形式
+        """
+        return ", ".join(str(self.min_height + self.height_resolution * step) for step in range(count))
+
+
+# ==================== 検証 ====================
+
+
+def _is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _int_keys(table, where, errors):
+    """文字列のキーを整数に変換（変換できないキーはエラーに追加して除外）"""
+    if not isinstance(table, dict):
+        errors.append(f"{where}: オブジェクトではありません")
+        return {}
+    converted = {}
+    for key, value in table.items():
+        try:
+            converted[int(key)] = value
+        except ValueError:
+            errors.append(f"{where}: キー「{key}」が整数ではありません")
+    return converted
+
+
+def _int_values(table, where, errors):
+    """値がすべて整数であることの確認"""
+    for key, value in table.items():
+        if not _is_int(value):
+            errors.append(f"{where}.{key}: 整数ではありません: {value!r}")
+    return {key: value for key, value in table.items() if _is_int(value)}
+
+
+def _machine_tables(data, name, machines, errors):
+    """機種ごとのテーブル（機種コードが定義済みであることを確認）"""
+    tables = data.get(name, {})
+    if not isinstance(tables, dict):
+        errors.append(f"{name}: オブジェクトではありません")
+        return {}
+    for machine in tables:
+        if machine not in machines:
+            errors.append(f"{name}.{machine}: machinesに定義されていない機種です")
+    return {machine: table for machine, table in tables.items() if machine in machines}
+
+
+def _parse_height(height, errors):
+    """高さの制約の検証"""
+    if not isinstance(height, dict) or not isinstance(height.get("h_index"), dict):
+        errors.append("height: min、resolution、h_indexを指定してください")
+        return None
+    h_index = height["h_index"]
+    values = {
+        "min": height.get("min"),
+        "resolution": height.get("resolution"),
+        "h_index.min_height": h_index.get("min_height"),
+        "h_index.max_height": h_index.get("max_height"),
+        "h_index.first": h_index.get("first"),
+        "h_index.last": h_index.get("last"),
+    }
+    invalid = [key for key, value in values.items() if not _is_int(value)]
+    if invalid:
+        errors.extend(f"height.{key}: 整数ではありません" for key in invalid)
+        return None
+    if values["min"] <= 0 or values["resolution"] <= 0:
+        errors.append("height: minとresolutionは正の整数を指定してください")
+        return None
+    span = values["h_index.max_height"] - values["h_index.min_height"]
+    if span < 0 or span % values["resolution"] != 0:
+        errors.append("height.h_index: max_heightはmin_height以上で、resolutionの刻みに合わせてください")
+        return None
+    if values["h_index.max_height"] < values["min"] or (values["h_index.max_height"] - values["min"]) % values["resolution"]:
+        errors.append("height.h_index: max_heightはmin以上で、minからresolutionの刻みに合わせてください")
+        return None
+    if values["h_index.first"] > values["h_index.last"]:
+        errors.append("height.h_index: lastはfirst以上を指定してください")
+        return None
+    return values
+
+
+def _parse_machine(machine, info, errors):
+    """1機種分の機種データの検証"""
+    where = f"machines.{machine}"
+    if not isinstance(info, dict):
+        errors.append(f"{where}: オブジェクトではありません")
+        return None
+
+    parsed = {}
+    for key in MACHINE_NUMBER_KEYS:
+        if not _is_number(info.get(key)):
+            errors.append(f"{where}.{key}: 数値を指定してください")
+        parsed[key] = info.get(key)
+
+    # stは内訳のリストも可（合計を使用）
+    st = info.get("st")
+    if isinstance(st, list) and st and all(_is_number(part) for part in st):
+        st = sum(st)
+    if not _is_number(st):
+        errors.append(f"{where}.st: 数値、または数値のリストを指定してください")
+    parsed["st"] = st
+
+    inches = info.get("inches")
+    rings = info.get("rings")
+    if not isinstance(inches, list) or not inches or not all(_is_int(inch) and inch > 0 for inch in inches):
+        errors.append(f"{where}.inches: 正の整数のリストを指定してください")
+    elif len(set(inches)) != len(inches):
+        errors.append(f"{where}.inches: インチ数が重複しています")
+    if not isinstance(rings, list) or not all(_is_int(ring) and ring > 0 for ring in rings):
+        errors.append(f"{where}.rings: 正の整数のリストを指定してください")
+    elif isinstance(inches, list) and len(rings) != len(inches):
+        errors.append(f"{where}: インチ数（{len(inches)}個）とリング数（{len(rings)}個）の個数が一致しません")
+    parsed["inches"] = inches
+    parsed["rings"] = rings
+    return parsed
+
+
+def _check_index_range(indexes, height, where, errors):
+    """Hインデックスが連続し、対象範囲内であることの確認"""
+    if not indexes:
+        return
+    first = min(indexes)
+    last = max(indexes)
+    # 対象範囲の上限の高さちょうどの場合はlastの次のインデックスになる
+    limit = height["h_index.first"] + (height["h_index.max_height"] - height["h_index.min_height"]) // height["resolution"]
+    if first < height["h_index.first"] or last > limit:
+        errors.append(f"{where}: Hインデックスは{height['h_index.first']}〜{limit}の範囲で指定してください")
+    missing = sorted(set(range(first, last + 1)) - set(indexes))
+    if missing:
+        errors.append(f"{where}: Hインデックスが連続していません（{', '.join(map(str, missing))}がありません）")
+
+
+def parse_rules(data):
+    """
+    ルールファイルの内容の検証と変換
+
+    Args:
+        data (dict): ルールファイルのJSON
+
+    Returns:
+        RuleSet: 検証済みの計算ルール（path、signature、digestはNone）
+
+    Raises:
+        RuleError: 内容が不正な場合（不正な箇所をすべてerrorsに含む）
+    """
+    errors = []
+    if not isinstance(data, dict):
+        raise RuleError("ルールファイルの内容がオブジェクトではありません")
+    if data.get("format") != RULES_FORMAT:
+        raise RuleError(f"対応していないルールファイルの形式です: {data.get('format')!r}（対応: {RULES_FORMAT}）")
+
+    version = data.get("version")
+    if not isinstance(version, str) or not version:
+        errors.append("version: 版数を文字列で指定してください")
+
+    height = _parse_height(data.get("height"), errors)
+
+    machines = data.get("machines")
+    machine_data = {}
+    if not isinstance(machines, dict) or not machines:
+        errors.append("machines: 機種データを指定してください")
+        machines = {}
+    for machine, info in machines.items():
+        machine_data[machine] = _parse_machine(machine, info, errors)
+
+    b_values = {}
+    for machine, table in _machine_tables(data, "b_values", machines, errors).items():
+        ladder = _int_values(_int_keys(table, f"b_values.{machine}", errors), f"b_values.{machine}", errors)
+        # 高さの降順（高い方から順に判定する）
+        b_values[machine] = tuple(sorted(ladder.items(), reverse=True))
+
+    h_values = {}
+    for machine, table in _machine_tables(data, "h_values", machines, errors).items():
+        h_values[machine] = _int_values(_int_keys(table, f"h_values.{machine}", errors), f"h_values.{machine}", errors)
+
+    c_values = {}
+    d_values = {}
+    for name, tables in (("c_values", c_values), ("d_values", d_values)):
+        for machine, table in _machine_tables(data, name, machines, errors).items():
+            where = f"{name}.{machine}"
+            tables[machine] = _int_values(_int_keys(table, where, errors), where, errors)
+            if height is not None:
+                _check_index_range(list(tables[machine]), height, where, errors)
+
+    c_inch_values = {}
+    for machine, table in _machine_tables(data, "c_inch_values", machines, errors).items():
+        c_inch_values[machine] = {}
+        for h_index, inch_table in _int_keys(table, f"c_inch_values.{machine}", errors).items():
+            where = f"c_inch_values.{machine}.{h_index}"
+            if h_index not in c_values.get(machine, {}):
+                errors.append(f"{where}: c_values.{machine}にないHインデックスです")
+            c_inch_values[machine][h_index] = _int_values(_int_keys(inch_table, where, errors), where, errors)
+
+    # インチ数ごとのテーブルは機種のインチ数のみ
+    for name, tables in (("h_values", h_values), ("c_inch_values", c_inch_values)):
+        for machine, table in tables.items():
+            inches = (machine_data.get(machine) or {}).get("inches") or []
+            rows = table.values() if name == "c_inch_values" else [table]
+            for row in rows:
+                for inch in row:
+                    if inch not in inches:
+                        errors.append(f"{name}.{machine}: インチ数{inch}は機種{machine}にありません")
+
+    if errors:
+        raise RuleError("ルールファイルの内容が不正です:\n" + "\n".join(f"- {error}" for error in errors), errors)
+
+    return RuleSet(
+        version=version,
+        machine_data=machine_data,
+        b_values=b_values,
+        h_values=h_values,
+        c_values=c_values,
+        c_inch_values=c_inch_values,
+        d_values=d_values,
+        min_height=height["min"],
+        height_resolution=height["resolution"],
+        h_index_min_height=height["h_index.min_height"],
+        h_index_max_height=height["h_index.max_height"],
+        h_index_first=height["h_index.first"],
+        h_index_last=height["h_index.last"],
+    )
+
+
+# ==================== 読み込み ====================
+
+
+def rules_path(path=None):
+    """
+    ルールファイルのパス
+
+    Args:
+        path (str): ルールファイル（省略時は環境変数RPA_RULES_FILE、なければrpa_rules.json）
+
+    Returns:
+        str: 絶対パス
+    """
+    return os.path.abspath(path or os.environ.get(RULES_FILE_ENV) or DEFAULT_RULES_FILE)
+
+
+def load_rules(path=None):
+    """
+    ルールファイルの読み込み
+
+    Args:
+        path (str): ルールファイル（省略時はrules_path()）
+
+    Returns:
+        RuleSet: 検証済みの計算ルール
+
+    Raises:
+        RuleError: 読み込めない、または内容が不正な場合
+    """
+    path = rules_path(path)
+    try:
+        # 読み込み中に書き換えられた場合は、次の確認で改めて読み込まれるよう読み込み前の値を使用する
+        stat = os.stat(path)
+        with open(path, "rb") as f:
+            content = f.read()
+        data = json.loads(content.decode("utf-8"))
+    except OSError as e:
+        raise RuleError(f"ルールファイルを読み込めません: {path}: {e}") from e
+    except (UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise RuleError(f"ルールファイルの形式が不正です: {path}: {e}") from e
+
+    try:
+        rules = parse_rules(data)
+    except RuleError as e:
+        raise RuleError(f"{path}: {e}", e.errors) from None
+    return rules._replace(
+        path=path,
+        signature=(stat.st_mtime_ns, stat.st_size),
+        digest=hashlib.sha256(content).hexdigest(),
+    )
+
+
+class RuleWatcher:
+    """
+    ルールファイルの変更を監視し、変更時にコンパイルし直す
+
+    get()はRELOAD_CHECK_INTERVAL秒に1回だけファイルの更新日時を確認します（それ以外は属性の参照のみ）。
+    変更されていれば読み込み・コンパイルした結果で丸ごと差し替えます。
+    確認中に他のスレッドから呼び出された場合は、待たずに差し替え前の結果を返します。
+    """
+
+    def __init__(self, compile, path=None, interval=RELOAD_CHECK_INTERVAL):
+        """
+        ルールファイルの読み込みとコンパイル
+
+        Args:
+            compile (callable): RuleSetを受け取り、計算用の構造（参照テーブルなど）を返す関数
+            path (str): ルールファイル（省略時はrules_path()）
+            interval (float): 更新を確認する間隔（秒）
+
+        Raises:
+            RuleError: 読み込めない、または内容が不正な場合
+        """
+        self.path = rules_path(path)
+        self.interval = interval
+        self._compile = compile
+        self._lock = threading.Lock()
+        with _RULE_LOAD.time():
+            rules = load_rules(self.path)
+            self.current = compile(rules)
+        self._signature = rules.signature
+        self._next_check = time.monotonic() + interval
+
+    def get(self):
+        """
+        現在のコンパイル結果（必要に応じてルールファイルの更新を確認）
+
+        Returns:
+            コンパイル結果
+        """
+        if time.monotonic() >= self._next_check:
+            self.check()
+        return self.current
+
+    def check(self):
+        """
+        ルールファイルの更新を確認し、変更されていれば読み込み直す
+
+        Returns:
+            bool: 新しいルールに差し替えた場合はTrue
+        """
+        if not self._lock.acquire(blocking=False):
+            return False
+        try:
+            self._next_check = time.monotonic() + self.interval
+            try:
+                stat = os.stat(self.path)
+            except OSError as e:
+                logger.warning("ルールファイルを確認できません。変更前のルールで計算を続けます: %s", e)
+                return False
+            signature = (stat.st_mtime_ns, stat.st_size)
+            if signature == self._signature:
+                return False
+
+            try:
+                with _RULE_LOAD.time():
+                    rules = load_rules(self.path)
+                    compiled = self._compile(rules)
+            except RuleError as e:
+                # 同じ内容で繰り返しエラーにならないよう、次にファイルが変更されるまで読み込まない
+                self._signature = signature
+                logger.error("ルールファイルを読み込めません。変更前のルールで計算を続けます: %s", e)
+                return False
+
+            self.current = compiled
+            self._signature = rules.signature
+            logger.info("ルールファイルを読み込み直しました: %s（版数 %s）", self.path, rules.version)
+            return True
+        finally:
+            self._lock.release()
+
+
+# ==================== コマンドライン ====================
+
+
+def main(argv=None):
+    """コマンドラインからの実行（ルールファイルの検証）"""
+    parser = argparse.ArgumentParser(description="計算ルールファイルの検証")
+    parser.add_argument("path", nargs="?", help=f"ルールファイル（既定: 環境変数{RULES_FILE_ENV}、なければrpa_rules.json）")
+    args = parser.parse_args(argv)
+
+    try:
+        rules = load_rules(args.path)
+    except RuleError as e:
+        print(f"エラー: {e}", file=sys.stderr)
+        return 1
+
+    print(f"{rules.path}: 版数 {rules.version}", file=sys.stderr)
+    for machine, info in rules.machine_data.items():
+        print(f"  機種{machine}: インチ数 {', '.join(map(str, info['inches']))}", file=sys.stderr)
+    print(f"  高さ: {rules.min_height}mm以上、{rules.height_resolution}mm刻み", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
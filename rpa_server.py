@@ -0,0 +1,374 @@
+"""
+検査表計算サービス（ローカルHTTP/JSON）
+
+MESやラベルプリンターから検査表の計算を直接呼び出せるよう、rpa_engineの計算をHTTP/JSONで提供します。
+asyncioの1プロセス・1スレッドで動作し、HTTP/1.1のキープアライブに対応します。
+計算ルールはプロセスで1回だけ読み込み（ルールファイルの更新時は自動で読み込み直し）、
+計算結果はrpa_cacheのキャッシュで再利用します。
+
+エンドポイント:
+    GET  /health           状態とルールの版数
+    POST /calculate        1件の計算
+        {"machine": "200", "shelf_count": 16, "inch": 12, "height": 3000}
+        → 200: 計算結果（CalcResultの項目とneeds_drawing_check、rules_version）
+        → 422: 入力値が計算ルールに合わない場合 {"error": "...", "title": "高さエラー"}
+    POST /calculate/batch  複数件の計算（最大MAX_BATCH_ITEMS件）
+        {"items": [{...}, {...}]}
+        → 200: {"rules_version": "...", "results": [計算結果、または {"error": ..., "title": ...}]}
+          （不正な項目があっても他の項目は計算する）
+
+使用方法:
+    python rpa_server.py
+    python rpa_server.py --host 0.0.0.0 --port 8765
+
+負荷試験:
+    python benchmarks/bench_server.py --start-server
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import sys
+from http import HTTPStatus
+
+from rpa_cache import get_cache
+from rpa_engine import CalculationError, current_grid, current_rules
+from rpa_logging import setup_logging
+from rpa_metrics import operation, start_exporter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# リクエストの大きさの上限
+MAX_HEADER_BYTES = 16 * 1024
+MAX_BODY_BYTES = 4 * 1024 * 1024
+MAX_BATCH_ITEMS = 10000
+
+# キープアライブの接続で次のリクエストを待つ時間（秒）
+KEEPALIVE_TIMEOUT = 30.0
+
+# 入力の項目
+INPUT_FIELDS = ("machine", "shelf_count", "inch", "height")
+
+# 数値の項目の絶対値の上限（rpa_batchと同じint64の範囲。これを超える値は計算できない）
+MAX_INPUT_VALUE = 2**63 - 1
+
+# 処理時間の計測（エンドポイントごと）
+_REQUESTS = {
+    "/health": operation("http_health"),
+    "/calculate": operation("http_calculate"),
+    "/calculate/batch": operation("http_calculate_batch"),
+}
+
+
+class RequestError(Exception):
+    """リクエストが不正な場合の例外（status属性はHTTPのステータスコード）"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+# ==================== 計算 ====================
+
+
+def parse_item(item):
+    """
+    入力の検証
+
+    Args:
+        item (dict): {"machine", "shelf_count", "inch", "height"}（数値は整数、または整数の文字列）
+
+    Returns:
+        tuple: (機種, 棚数, インチ数, 高さ)
+
+    Raises:
+        RequestError: 項目がない、整数ではない、または値が大きすぎる場合
+    """
+    if not isinstance(item, dict):
+        raise RequestError(HTTPStatus.BAD_REQUEST, "入力はオブジェクトで指定してください")
+    missing = [field for field in INPUT_FIELDS if field not in item]
+    if missing:
+        raise RequestError(HTTPStatus.BAD_REQUEST, f"項目がありません: {', '.join(missing)}")
+
+    machine = item["machine"]
+    if isinstance(machine, int) and not isinstance(machine, bool):
+        machine = str(machine)
+    if not isinstance(machine, str):
+        raise RequestError(HTTPStatus.BAD_REQUEST, "machineは文字列で指定してください")
+
+    values = [machine]
+    for field in INPUT_FIELDS[1:]:
+        value = item[field]
+        if isinstance(value, bool) or not isinstance(value, (int, str)):
+            raise RequestError(HTTPStatus.BAD_REQUEST, f"{field}は整数で指定してください")
+        try:
+            number = int(value)
+        except ValueError:
+            raise RequestError(HTTPStatus.BAD_REQUEST, f"{field}は整数で指定してください: {value}") from None
+        if abs(number) > MAX_INPUT_VALUE:
+            raise RequestError(HTTPStatus.BAD_REQUEST, f"{field}の値が大きすぎます（絶対値は{MAX_INPUT_VALUE}まで）")
+        values.append(number)
+    return tuple(values)
+
+
+def result_payload(result, rules_version):
+    """
+    計算結果のJSON
+
+    Args:
+        result (CalcResult): 計算結果
+        rules_version (str): 計算ルールの版数
+
+    Returns:
+        dict: CalcResultの項目、needs_drawing_check、rules_version
+    """
+    payload = result._asdict()
+    payload["needs_drawing_check"] = result.needs_drawing_check
+    payload["rules_version"] = rules_version
+    return payload
+
+
+def calculate(item, cache=None, grid=None):
+    """
+    1件の計算
+
+    Args:
+        item (dict): 入力
+        cache (ResultCache): キャッシュ（省略時はget_cache()）
+        grid (LookupGrid): 計算に使用する参照テーブル（省略時は現在のルールのもの）
+
+    Returns:
+        tuple: (ステータスコード, レスポンスのJSON)。rules_versionは計算に使用したルールの版数
+    """
+    cache = cache or get_cache()
+    grid = grid or current_grid()
+    try:
+        result = cache.compute(*parse_item(item), grid)
+    except RequestError as e:
+        return e.status, {"error": str(e)}
+    except CalculationError as e:
+        return HTTPStatus.UNPROCESSABLE_ENTITY, {"error": str(e), "title": e.title}
+    except OverflowError:
+        # 範囲内の値でも計算の途中で桁があふれた場合は、その入力だけをエラーにする
+        return HTTPStatus.UNPROCESSABLE_ENTITY, {"error": "入力値が大きすぎるため計算できません"}
+    return HTTPStatus.OK, result_payload(result, grid.rules.version)
+
+
+def calculate_batch(request, cache=None):
+    """
+    複数件の計算
+
+    Args:
+        request (dict): {"items": [入力, ...]}
+        cache (ResultCache): キャッシュ（省略時はget_cache()）
+
+    Returns:
+        tuple: (ステータスコード, レスポンスのJSON)
+    """
+    items = request.get("items") if isinstance(request, dict) else None
+    if not isinstance(items, list):
+        return HTTPStatus.BAD_REQUEST, {"error": "itemsに入力のリストを指定してください"}
+    if len(items) > MAX_BATCH_ITEMS:
+        return HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {"error": f"1回に計算できるのは{MAX_BATCH_ITEMS}件までです"}
+
+    cache = cache or get_cache()
+    # すべての項目を同じルールで計算する（途中でルールファイルが読み込み直されても混ざらない）
+    grid = current_grid()
+    results = []
+    for item in items:
+        status, payload = calculate(item, cache, grid)
+        if status == HTTPStatus.OK:
+            del payload["rules_version"]
+        results.append(payload)
+    return HTTPStatus.OK, {"rules_version": grid.rules.version, "results": results}
+
+
+def dispatch(method, path, body):
+    """
+    リクエストの処理
+
+    Args:
+        method (str): メソッド
+        path (str): パス（クエリ文字列を除く）
+        body (bytes): 本文
+
+    Returns:
+        tuple: (ステータスコード, レスポンスのJSON)
+    """
+    if path == "/health":
+        if method != "GET":
+            return HTTPStatus.METHOD_NOT_ALLOWED, {"error": "GETで呼び出してください"}
+        return HTTPStatus.OK, {"status": "ok", "rules_version": current_rules().version}
+
+    handler = {"/calculate": calculate, "/calculate/batch": calculate_batch}.get(path)
+    if handler is None:
+        return HTTPStatus.NOT_FOUND, {"error": f"パスがありません: {path}"}
+    if method != "POST":
+        return HTTPStatus.METHOD_NOT_ALLOWED, {"error": "POSTで呼び出してください"}
+    try:
+        request = json.loads(body)
+    except ValueError as e:
+        return HTTPStatus.BAD_REQUEST, {"error": f"JSONの形式が不正です: {e}"}
+    return handler(request)
+
+
+# ==================== HTTP ====================
+
+
+async def read_request(reader):
+    """
+    1件のリクエストの読み込み
+
+    Args:
+        reader (asyncio.StreamReader): 接続
+
+    Returns:
+        tuple: (メソッド, パス, ヘッダー（小文字のキー）, 本文, HTTPのバージョン)。接続が閉じられた場合はNone
+
+    Raises:
+        RequestError: リクエストの形式が不正、または大きすぎる場合
+    """
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+    except asyncio.IncompleteReadError as e:
+        if e.partial.strip():
+            raise RequestError(HTTPStatus.BAD_REQUEST, "リクエストが途中で終了しました") from None
+        return None
+    except asyncio.LimitOverrunError:
+        raise RequestError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "ヘッダーが大きすぎます") from None
+
+    lines = head.decode("latin-1").split("\r\n")
+    try:
+        method, target, version = lines[0].split(" ")
+    except ValueError:
+        raise RequestError(HTTPStatus.BAD_REQUEST, "リクエスト行の形式が不正です") from None
+    headers = {}
+    for line in lines[1:]:
+        if line:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+    if "chunked" in headers.get("transfer-encoding", "").lower():
+        raise RequestError(HTTPStatus.LENGTH_REQUIRED, "Content-Lengthを指定してください")
+    try:
+        length = int(headers.get("content-length", "0"))
+    except ValueError:
+        raise RequestError(HTTPStatus.BAD_REQUEST, "Content-Lengthが整数ではありません") from None
+    if length < 0 or length > MAX_BODY_BYTES:
+        raise RequestError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"本文は{MAX_BODY_BYTES}バイトまでです")
+    try:
+        body = await reader.readexactly(length) if length else b""
+    except asyncio.IncompleteReadError:
+        raise RequestError(HTTPStatus.BAD_REQUEST, "本文が途中で終了しました") from None
+    return method, target.split("?", 1)[0], headers, body, version
+
+
+def format_response(status, payload, keep_alive):
+    """
+    レスポンスのバイト列
+
+    Args:
+        status (int): ステータスコード
+        payload (dict): JSON
+        keep_alive (bool): 接続を維持するか
+
+    Returns:
+        bytes: ステータス行、ヘッダー、本文
+    """
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    status = HTTPStatus(status)
+    head = (
+        f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+        f"Content-Type: application/json; charset=utf-8\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+    )
+    return head.encode("latin-1") + body
+
+
+async def handle_connection(reader, writer):
+    """1つの接続の処理（キープアライブの場合は複数のリクエストを順に処理）"""
+    try:
+        while True:
+            try:
+                request = await asyncio.wait_for(read_request(reader), KEEPALIVE_TIMEOUT)
+            except RequestError as e:
+                writer.write(format_response(e.status, {"error": str(e)}, keep_alive=False))
+                await writer.drain()
+                break
+            except asyncio.TimeoutError:
+                break
+            if request is None:
+                break
+
+            method, path, headers, body, version = request
+            connection = headers.get("connection", "").lower()
+            keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+
+            histogram = _REQUESTS.get(path)
+            try:
+                if histogram is None:
+                    status, payload = dispatch(method, path, body)
+                else:
+                    with histogram.time():
+                        status, payload = dispatch(method, path, body)
+            except Exception:
+                logger.exception("リクエストの処理中にエラーが発生しました: %s %s", method, path)
+                status, payload = HTTPStatus.INTERNAL_SERVER_ERROR, {"error": "サーバーでエラーが発生しました"}
+
+            writer.write(format_response(status, payload, keep_alive))
+            await writer.drain()
+            if not keep_alive:
+                break
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, ready=None):
+    """
+    サービスの実行（キャンセルされるまで）
+
+    Args:
+        host (str): 待ち受けるアドレス
+        port (int): ポート番号（0の場合は空いているポート）
+        ready (callable): 待ち受けを開始したときに、ポート番号を引数に呼び出す関数
+    """
+    # 計算ルールとキャッシュは最初のリクエストの前に準備する
+    rules = current_rules()
+    get_cache()
+    server = await asyncio.start_server(handle_connection, host, port, limit=MAX_HEADER_BYTES)
+    async with server:
+        bound_port = server.sockets[0].getsockname()[1]
+        logger.info("計算サービスを開始しました: http://%s:%d（ルールの版数 %s）", host, bound_port, rules.version)
+        if ready is not None:
+            ready(bound_port)
+        await server.serve_forever()
+
+
+def main(argv=None):
+    """コマンドラインからの実行"""
+    parser = argparse.ArgumentParser(description="検査表計算サービス（HTTP/JSON）")
+    parser.add_argument("--host", default=DEFAULT_HOST, help=f"待ち受けるアドレス（既定: {DEFAULT_HOST}）")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"ポート番号（既定: {DEFAULT_PORT}）")
+    args = parser.parse_args(argv)
+
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except OSError as e:
+        print(f"エラー: {e}", file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    setup_logging()
+    start_exporter()
+    sys.exit(main())
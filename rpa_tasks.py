@@ -0,0 +1,381 @@
+"""
+GUIのバックグラウンド処理
+
+ファイルの読み書きや変換など時間のかかる処理をワーカースレッドで実行し、
+結果をTkのメインループ（after()による定期確認）で受け取ります。
+ワーカースレッドからはウィジェットやmessageboxを操作せず、完了時の処理（on_done、on_error）は
+すべてメインスレッドで呼び出します。
+
+複数の処理を続けて登録でき、同じkeyを指定した処理は登録順に1つずつ実行します
+（同じテンプレートへの書き込みなど）。進捗の通知は確認の間隔ごとに最新の1件だけを画面に反映します。
+"""
+
+import itertools
+import logging
+import queue
+import threading
+import tkinter as tk
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from tkinter import ttk
+
+logger = logging.getLogger(__name__)
+
+# ワーカースレッド数の既定値
+DEFAULT_WORKERS = 2
+
+# 処理中に結果・進捗を確認する間隔（ミリ秒）。約60fps
+POLL_INTERVAL_MS = 16
+
+# 処理の状態
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+STATE_LABELS = {
+    QUEUED: "待機中",
+    RUNNING: "実行中",
+    DONE: "完了",
+    FAILED: "エラー",
+    CANCELLED: "キャンセル",
+}
+
+
+class TaskCancelled(Exception):
+    """処理がキャンセルされた"""
+
+
+class Task:
+    """
+    バックグラウンドで実行する1件の処理
+
+    処理の関数は第1引数にこのオブジェクトを受け取り、report()で進捗を通知します。
+    report()とcheck()はキャンセルされていればTaskCancelledを送出します。
+    """
+
+    _ids = itertools.count(1)
+
+    def __init__(self, runner, name, func, args, key=None, on_done=None, on_error=None):
+        """
+        Args:
+            runner (TaskRunner): 実行元
+            name (str): 表示名
+            func (callable): 処理の関数 func(task, *args)
+            args (tuple): 処理の関数の引数
+            key (str): 同時に実行しない処理のグループ（Noneの場合は制限なし）
+            on_done (callable): 完了時にメインスレッドで呼び出す関数 on_done(結果)
+            on_error (callable): 失敗時にメインスレッドで呼び出す関数 on_error(例外)
+        """
+        self.id = next(self._ids)
+        self.name = name
+        self.func = func
+        self.args = args
+        self.key = key
+        self.on_done = on_done
+        self.on_error = on_error
+        self.state = QUEUED
+        self.done_count = 0
+        self.total = None
+        self.message = ""
+        self.future = None
+        self._runner = runner
+        self._cancel_event = threading.Event()
+
+    @property
+    def cancelled(self):
+        """キャンセルが要求されたか"""
+        return self._cancel_event.is_set()
+
+    @property
+    def active(self):
+        """待機中または実行中か"""
+        return self.state in (QUEUED, RUNNING)
+
+    def cancel(self):
+        """キャンセルを要求（実行中の処理は次のreport()またはcheck()で中断する）"""
+        self._cancel_event.set()
+
+    def check(self):
+        """
+        キャンセルの確認
+
+        Raises:
+            TaskCancelled: キャンセルされた場合
+        """
+        if self._cancel_event.is_set():
+            raise TaskCancelled(self.name)
+
+    def report(self, done, total=None, message=""):
+        """
+        進捗の通知（ワーカースレッドから呼び出す）
+
+        Args:
+            done (int): 処理済みの件数
+            total (int): 全体の件数（不明な場合はNone）
+            message (str): 表示するメッセージ
+
+        Raises:
+            TaskCancelled: キャンセルされた場合
+        """
+        self.check()
+        self._runner._events.put(("progress", self, (done, total, message)))
+
+    def _run(self):
+        """ワーカースレッドで処理を実行し、結果をメインスレッドに渡す"""
+        events = self._runner._events
+        events.put(("started", self, None))
+        try:
+            self.check()
+            result = self.func(self, *self.args)
+        except TaskCancelled:
+            events.put(("cancelled", self, None))
+        except BaseException as e:
+            events.put(("failed", self, e))
+        else:
+            events.put(("done", self, result))
+
+
+class TaskRunner:
+    """
+    ワーカースレッドによる処理の実行
+
+    submit()、cancel()などはすべてメインスレッドから呼び出します。
+    処理が残っている間だけafter()で結果と進捗を確認します。
+    """
+
+    def __init__(self, root, workers=DEFAULT_WORKERS, poll_interval=POLL_INTERVAL_MS):
+        """
+        Args:
+            root (tk.Tk): メインウィンドウ
+            workers (int): ワーカースレッド数
+            poll_interval (int): 結果・進捗を確認する間隔（ミリ秒）
+        """
+        self.root = root
+        self.poll_interval = poll_interval
+        self.tasks = []
+        self.listeners = []
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rpa-task")
+        self._events = queue.SimpleQueue()
+        self._waiting = {}
+        self._busy_keys = set()
+        self._poll_id = None
+        self._closed = False
+
+    def submit(self, name, func, *args, key=None, on_done=None, on_error=None):
+        """
+        処理の登録
+
+        Args:
+            name (str): 表示名
+            func (callable): 処理の関数 func(task, *args)（ワーカースレッドで実行）
+            *args: 処理の関数の引数
+            key (str): 同時に実行しない処理のグループ
+            on_done (callable): 完了時の処理 on_done(結果)
+            on_error (callable): 失敗時の処理 on_error(例外)
+
+        Returns:
+            Task: 登録した処理
+        """
+        if self._closed:
+            raise RuntimeError("TaskRunnerは終了しています")
+        task = Task(self, name, func, args, key=key, on_done=on_done, on_error=on_error)
+        self.tasks.append(task)
+        if key is not None and key in self._busy_keys:
+            self._waiting.setdefault(key, deque()).append(task)
+        else:
+            self._start(task)
+        self._schedule()
+        self._notify()
+        return task
+
+    def _start(self, task):
+        """ワーカースレッドに処理を渡す"""
+        if task.key is not None:
+            self._busy_keys.add(task.key)
+        task.future = self._executor.submit(task._run)
+
+    def active_tasks(self):
+        """待機中・実行中の処理（登録順）"""
+        return [task for task in self.tasks if task.active]
+
+    def cancel(self, task):
+        """
+        処理のキャンセル
+
+        Args:
+            task (Task): キャンセルする処理
+        """
+        if not task.active:
+            return
+        task.cancel()
+        if task.state == QUEUED:
+            waiting = self._waiting.get(task.key)
+            if waiting is not None and task in waiting:
+                waiting.remove(task)
+                self._finish(task, CANCELLED)
+            elif task.future is not None and task.future.cancel():
+                self._finish(task, CANCELLED)
+        self._notify()
+
+    def cancel_all(self):
+        """すべての処理のキャンセル"""
+        for task in self.active_tasks():
+            self.cancel(task)
+
+    def close(self):
+        """全処理をキャンセルしてワーカースレッドを終了（実行中の処理の完了は待たない）"""
+        self._closed = True
+        self.cancel_all()
+        if self._poll_id is not None:
+            self.root.after_cancel(self._poll_id)
+            self._poll_id = None
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _schedule(self):
+        """結果・進捗の確認を予約"""
+        if self._poll_id is None and not self._closed:
+            self._poll_id = self.root.after(self.poll_interval, self._poll)
+
+    def _poll(self):
+        """ワーカースレッドからの通知を処理（メインスレッド）"""
+        self._poll_id = None
+        changed = False
+        while True:
+            try:
+                kind, task, payload = self._events.get_nowait()
+            except queue.Empty:
+                break
+            changed = True
+            if kind == "started":
+                if task.state == QUEUED:
+                    task.state = RUNNING
+            elif kind == "progress":
+                task.done_count, task.total, message = payload
+                if message:
+                    task.message = message
+            elif kind == "done":
+                self._finish(task, DONE)
+                self._callback(task.on_done, payload)
+            elif kind == "failed":
+                self._finish(task, FAILED)
+                task.message = str(payload)
+                if task.on_error is not None:
+                    self._callback(task.on_error, payload)
+                else:
+                    logger.error("%sでエラーが発生しました", task.name, exc_info=payload)
+            else:
+                self._finish(task, CANCELLED)
+
+        if changed:
+            self._notify()
+        if any(task.active for task in self.tasks):
+            self._schedule()
+
+    def _finish(self, task, state):
+        """処理の終了（同じkeyの次の処理を開始）"""
+        if not task.active:
+            return
+        task.state = state
+        # 終了した処理は最後の1件だけ残す（状態表示用）
+        self.tasks = [other for other in self.tasks if other.active or other is task]
+        if task.key is not None and task.key in self._busy_keys and task.future is not None:
+            self._busy_keys.discard(task.key)
+            waiting = self._waiting.get(task.key)
+            if waiting:
+                self._start(waiting.popleft())
+
+    def _callback(self, callback, value):
+        """完了時の処理の呼び出し（例外で確認のループが止まらないようにする）"""
+        if callback is None:
+            return
+        try:
+            callback(value)
+        except Exception:
+            logger.exception("完了時の処理でエラーが発生しました")
+
+    def _notify(self):
+        """状態の変更を通知"""
+        for listener in self.listeners:
+            listener(self)
+
+
+class TaskPanel(ttk.Frame):
+    """
+    処理の進捗表示（プログレスバー、状態、キャンセルボタン）
+
+    先頭の処理（実行中のもの）の進捗と、待機中の件数を表示します。
+    キャンセルボタンは表示中の処理をキャンセルします。
+    """
+
+    def __init__(self, parent, runner, **kwargs):
+        """
+        Args:
+            parent: 親ウィジェット
+            runner (TaskRunner): 表示する処理の実行元
+        """
+        super().__init__(parent, **kwargs)
+        self.runner = runner
+        self.current = None
+        self.status_var = tk.StringVar(value="待機中の処理はありません")
+
+        self.progress = ttk.Progressbar(self, mode="determinate", maximum=100, length=300)
+        self.progress.grid(row=0, column=0, sticky=(tk.W, tk.E), padx=(0, 10))
+        self.cancel_button = ttk.Button(self, text="キャンセル", command=self.cancel, state=tk.DISABLED)
+        self.cancel_button.grid(row=0, column=1)
+        ttk.Label(self, textvariable=self.status_var).grid(row=1, column=0, columnspan=2, sticky=tk.W)
+        self.columnconfigure(0, weight=1)
+
+        runner.listeners.append(self.refresh)
+
+    def cancel(self):
+        """表示中の処理をキャンセル"""
+        if self.current is not None:
+            self.runner.cancel(self.current)
+
+    def refresh(self, runner=None):
+        """表示の更新"""
+        active = self.runner.active_tasks()
+        running = [task for task in active if task.state == RUNNING]
+        task = running[0] if running else (active[0] if active else None)
+        if task is None:
+            self.current = None
+            self.cancel_button.configure(state=tk.DISABLED)
+            last = self.runner.tasks[-1] if self.runner.tasks else None
+            self._set_progress(last)
+            if last is not None:
+                status = f"{last.name}: {STATE_LABELS[last.state]}"
+                if last.state == FAILED and last.message:
+                    status += f" - {last.message}"
+                self.status_var.set(status)
+            return
+
+        self.current = task
+        self.cancel_button.configure(state=tk.NORMAL)
+        self._set_progress(task)
+        status = f"{task.name}: {STATE_LABELS[task.state]}"
+        if task.cancelled:
+            status += "（キャンセル中）"
+        if task.message:
+            status += f" - {task.message}"
+        if len(active) > 1:
+            status += f"（ほか {len(active) - 1}件）"
+        self.status_var.set(status)
+
+    def _set_progress(self, task):
+        """プログレスバーの更新（全体の件数が不明な場合は往復表示）"""
+        if task is None or task.state != RUNNING:
+            if str(self.progress.cget("mode")) == "indeterminate":
+                self.progress.stop()
+                self.progress.configure(mode="determinate")
+            self.progress["value"] = 100 if task is not None and task.state == DONE else 0
+            return
+        if task.total:
+            if str(self.progress.cget("mode")) == "indeterminate":
+                self.progress.stop()
+                self.progress.configure(mode="determinate")
+            self.progress["value"] = min(100, task.done_count * 100 / task.total)
+        elif str(self.progress.cget("mode")) != "indeterminate":
+            self.progress.configure(mode="indeterminate")
+            self.progress.start(POLL_INTERVAL_MS)
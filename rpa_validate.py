@@ -0,0 +1,258 @@
+"""
+受注データの入力規則と一括検証
+
+ユーザ名、型番、製造番号、受注番号の入力規則（NewRPASystemの各検証メソッドと同じ）を定義し、
+ERPから出力した数万行の受注一覧を列単位でまとめて検証します。
+正規表現はコンパイル済みのものを列全体に適用し、行ごとの辞書は作成しません。
+1行に複数のエラーがある場合もすべて報告します。
+NumPy・pandasは一括検証の時に読み込みます（GUIは入力規則だけを使用するため）。
+
+使用方法:
+    python rpa_validate.py orders.csv -o errors.csv
+    （orders.csvの列: ユーザ名,型番,製造番号,受注番号）
+"""
+
+import argparse
+import csv
+import re
+import sys
+import time
+
+# ==================== 入力規則 ====================
+
+# ユーザ名: 日本語文字（ひらがな、カタカナ、漢字、全角英数字・記号）を含む
+USERNAME_PATTERN = re.compile(r"[\u3040-\u309F\u30A0-\u30FF\u4E00-\u9FAF\uFF00-\uFFEF]")
+
+# 型番: 200,201,350,351の4種類+"-"+4桁数字+"."+6桁数字
+MODEL_PATTERN = re.compile(r"^(200|201|350|351)-\d{4}\.\d{6}$")
+
+# 製造番号: J000から始まり、4桁の数字、最後に0n00（nは1-9）
+MANUFACTURING_PATTERN = re.compile(r"^J000\d{4}0[1-9]00$")
+
+# 受注番号: O,N,Tのいずれか+4桁数字
+ORDER_PATTERN = re.compile(r"^[ONT]\d{4}$")
+
+# 整合性: 製造番号の5-8文字目（J000の後の4桁数字）と受注番号の2-5文字目（O/N/Tの後の4桁数字）
+MANUFACTURING_SERIAL = slice(4, 8)
+ORDER_SERIAL = slice(1, 5)
+
+# エラーメッセージ
+MESSAGES = {
+    "username_empty": "ユーザ名を入力してください。",
+    "username_blank": "ユーザ名は空白のみでは入力できません。",
+    "username_not_japanese": "ユーザ名には日本語文字を含む必要があります。",
+    "model_empty": "型番を入力してください。",
+    "model_format": "型番の形式が正しくありません。\n形式: 200,201,350,351のいずれか-4桁数字.6桁数字\n例: 201-2312.003000",
+    "manufacturing_empty": "製造番号を入力してください。",
+    "manufacturing_format": "製造番号の形式が正しくありません。\n形式: J000+4桁数字+0+1-9+00\n例: J00023150100",
+    "order_empty": "受注番号を入力してください。",
+    "order_format": "受注番号の形式が正しくありません。\n形式: O/N/T+4桁数字\n例: O2315",
+}
+
+
+def consistency_message(manufacturing, order):
+    """
+    製造番号と受注番号の不一致のエラーメッセージ
+
+    Args:
+        manufacturing (str): 製造番号
+        order (str): 受注番号
+
+    Returns:
+        str: エラーメッセージ
+    """
+    return (
+        f"製造番号と受注番号が一致しません。\n製造番号の5-8文字目: {manufacturing[MANUFACTURING_SERIAL]}\n"
+        f"受注番号の1-4文字目: {order[ORDER_SERIAL]}\nこれらは同じである必要があります。"
+    )
+
+
+# ==================== 一括検証 ====================
+
+# 入力ファイルの列
+ORDER_FIELDS = ["ユーザ名", "型番", "製造番号", "受注番号"]
+
+# 検証規則の一覧（規則のコード, 項目名）。エラーはこの順に報告する
+RULES = [
+    ("username_empty", "ユーザ名"),
+    ("username_blank", "ユーザ名"),
+    ("username_not_japanese", "ユーザ名"),
+    ("model_empty", "型番"),
+    ("model_format", "型番"),
+    ("manufacturing_empty", "製造番号"),
+    ("manufacturing_format", "製造番号"),
+    ("order_empty", "受注番号"),
+    ("order_format", "受注番号"),
+    ("consistency", None),
+]
+
+
+class BulkValidationResult:
+    """
+    一括検証の結果
+
+    規則ごとに、エラーのある行をTrueとしたbool配列（masks）を保持します。
+    エラーメッセージは、エラーのある行についてだけ作成します。
+    """
+
+    def __init__(self, masks, manufacturing, order):
+        """
+        Args:
+            masks (dict): 規則のコード → bool配列
+            manufacturing (pandas.Series): 製造番号（整合性エラーのメッセージ用）
+            order (pandas.Series): 受注番号（整合性エラーのメッセージ用）
+        """
+        import numpy as np
+
+        self.masks = masks
+        self._manufacturing = manufacturing
+        self._order = order
+        self.valid = ~np.logical_or.reduce(list(masks.values()))
+
+    def __len__(self):
+        return len(self.valid)
+
+    @property
+    def error_count(self):
+        """エラーのある行数"""
+        return int(len(self.valid) - self.valid.sum())
+
+    def row_errors(self, row):
+        """
+        1行のエラーメッセージ（すべて）
+
+        Args:
+            row (int): 行番号（0始まり）
+
+        Returns:
+            list: "項目名: メッセージ" のリスト（整合性エラーは項目名なし）
+        """
+        errors = []
+        for code, field_name in RULES:
+            if not self.masks[code][row]:
+                continue
+            if field_name is None:
+                errors.append(consistency_message(self._manufacturing.iat[row], self._order.iat[row]))
+            else:
+                errors.append(f"{field_name}: {MESSAGES[code]}")
+        return errors
+
+    def iter_errors(self):
+        """
+        エラーのある行を順に取得
+
+        Yields:
+            tuple: (行番号（0始まり）, エラーメッセージのリスト)
+        """
+        import numpy as np
+
+        for row in np.flatnonzero(~self.valid):
+            yield int(row), self.row_errors(row)
+
+
+def validate_orders(username, model, manufacturing, order):
+    """
+    受注データの一括検証
+
+    各列に入力規則を適用します。製造番号と受注番号の整合性は、両方の形式が正しい行だけを対象とします。
+
+    Args:
+        username (array_like): ユーザ名
+        model (array_like): 型番
+        manufacturing (array_like): 製造番号
+        order (array_like): 受注番号
+
+    Returns:
+        BulkValidationResult: 検証結果
+    """
+    import pandas as pd
+
+    # Pythonの正規表現と同じ規則で照合するため、object型の文字列として扱う
+    username, model, manufacturing, order = (
+        pd.Series(column, dtype=object).fillna("").astype(str).reset_index(drop=True)
+        for column in (username, model, manufacturing, order)
+    )
+
+    masks = {}
+    masks["username_empty"] = (username == "").to_numpy()
+    masks["username_blank"] = ~masks["username_empty"] & (username.str.strip() == "").to_numpy()
+    masks["username_not_japanese"] = ~(
+        masks["username_empty"] | masks["username_blank"] | username.str.contains(USERNAME_PATTERN).to_numpy(bool)
+    )
+
+    for field, column, pattern in (
+        ("model", model, MODEL_PATTERN),
+        ("manufacturing", manufacturing, MANUFACTURING_PATTERN),
+        ("order", order, ORDER_PATTERN),
+    ):
+        empty = (column == "").to_numpy()
+        masks[f"{field}_empty"] = empty
+        masks[f"{field}_format"] = ~empty & ~column.str.match(pattern).to_numpy(bool)
+
+    formats_ok = ~(
+        masks["manufacturing_empty"] | masks["manufacturing_format"] | masks["order_empty"] | masks["order_format"]
+    )
+    serial_mismatch = (
+        manufacturing.str.slice(MANUFACTURING_SERIAL.start, MANUFACTURING_SERIAL.stop)
+        != order.str.slice(ORDER_SERIAL.start, ORDER_SERIAL.stop)
+    ).to_numpy()
+    masks["consistency"] = formats_ok & serial_mismatch
+
+    return BulkValidationResult(masks, manufacturing, order)
+
+
+def read_orders_frame(orders_path, encoding="utf-8-sig"):
+    """
+    受注一覧の読み込み
+
+    Args:
+        orders_path (str): CSVファイル（ユーザ名,型番,製造番号,受注番号）
+        encoding (str): 文字コード
+
+    Returns:
+        pandas.DataFrame: 文字列の列（前後の空白は除去済み）
+    """
+    import pandas as pd
+
+    frame = pd.read_csv(orders_path, dtype=str, keep_default_na=False, skip_blank_lines=False, encoding=encoding)
+    missing = [field for field in ORDER_FIELDS if field not in frame.columns]
+    if missing:
+        raise ValueError(f"列がありません: {', '.join(missing)}")
+    # 画面からの入力と同じく前後の空白を除いて検証する
+    return pd.DataFrame({field: frame[field].astype(object).str.strip() for field in ORDER_FIELDS})
+
+
+def main(argv=None):
+    """コマンドラインからの実行"""
+    parser = argparse.ArgumentParser(description="受注一覧の一括検証")
+    parser.add_argument("orders", help="受注一覧のCSVファイル（ユーザ名,型番,製造番号,受注番号）")
+    parser.add_argument("-o", "--output", default="-", help="エラー一覧の出力ファイル。'-'で標準出力（既定）")
+    parser.add_argument("--encoding", default="utf-8-sig", help="受注一覧の文字コード（既定: utf-8-sig）")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    try:
+        frame = read_orders_frame(args.orders, args.encoding)
+    except (OSError, ValueError) as e:
+        print(f"エラー: {e}", file=sys.stderr)
+        return 1
+    result = validate_orders(*(frame[field] for field in ORDER_FIELDS))
+
+    output = sys.stdout if args.output == "-" else open(args.output, "w", newline="", encoding="utf-8-sig")
+    try:
+        writer = csv.writer(output)
+        writer.writerow(["line"] + ORDER_FIELDS + ["errors"])
+        for row, errors in result.iter_errors():
+            # 行番号はヘッダーを1行目とした入力ファイルの行
+            writer.writerow([row + 2] + frame.iloc[row].tolist() + [" / ".join(e.replace("\n", " ") for e in errors)])
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    elapsed = time.perf_counter() - start
+
+    print(f"検証完了: {len(result)}行（エラー {result.error_count}行） {elapsed:.2f}秒", file=sys.stderr)
+    return 1 if result.error_count else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
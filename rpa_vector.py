@@ -0,0 +1,185 @@
+"""
+検査表一括計算（NumPyベクトル化版）
+
+機種、棚数、インチ数、高さの列を配列のまま受け取り、
+A値、A1値、B値、C値、D値、H値、スタビ値およびエンドフレーム仕様を一度に計算します。
+rpa_engine.computeを1行ずつ呼び出す場合と完全に同じ値を返します。
+"""
+
+import numpy as np
+
+from rpa_engine import (
+    B_MODE_CHAIN,
+    B_MODE_FIXED,
+    B_TERM_COUNT,
+    current_grid,
+)
+
+# 出力する列名
+RESULT_COLUMNS = ["ring_count", "A", "A1", "B", "C", "D", "H", "ST", "ELB", "ELC", "ERB", "ERC", "EB", "EC"]
+
+# エンドフレーム仕様の列名とmachine_rowsでの位置
+_END_FRAME_COLUMNS = {"ELB": 3, "ELC": 4, "ERB": 5, "ERC": 6, "EB": 7, "EC": 8}
+
+
+class GridArrays:
+    """
+    参照テーブル（rpa_engine.LookupGrid）のNumPyビュー
+
+    各列はコピーせずにLookupGridのバッファを参照します。
+    """
+
+    def __init__(self, grid):
+        """
+        Args:
+            grid (LookupGrid): 参照テーブル
+        """
+        self.grid = grid
+        self.ring = np.frombuffer(grid.ring, dtype=np.int64)
+        self.c = np.frombuffer(grid.c, dtype=np.int64)
+        self.d = np.frombuffer(grid.d, dtype=np.int64)
+        self.h = np.frombuffer(grid.h, dtype=np.int64)
+        self.b_mode = np.frombuffer(grid.b_mode, dtype=np.int64)
+        self.b_base = np.frombuffer(grid.b_base, dtype=np.int64)
+        self.b_terms = np.frombuffer(grid.b_terms, dtype=np.int64).reshape(-1, B_TERM_COUNT)
+
+        # 機種ごとの定数（機種番号で参照）
+        rows = np.array(grid.machine_rows, dtype=np.float64)
+        self.chain_data = rows[:, 0]
+        self.data1 = rows[:, 1].astype(np.int64)
+        self.st = rows[:, 2]
+        self.end_frame = {column: rows[:, position] for column, position in _END_FRAME_COLUMNS.items()}
+
+        # int64で 棚数 × リング数 - データ1 を計算できる棚数の上限（これを超える行はvalid=False）
+        int64_max = int(np.iinfo(np.int64).max)
+        max_ring = max(1, int(np.abs(self.ring).max(initial=0)))
+        self.max_shelf_count = (int64_max - int(np.abs(self.data1).max(initial=0))) // max_ring
+
+        # インチ数 → インチ番号（機種番号, インチ数で参照。無効なら-1）
+        max_inch = max(max(inches) for inches in grid.inches)
+        self.inch_index = np.full((len(grid.machines), max_inch + 1), -1, dtype=np.int64)
+        for machine_index, inches in enumerate(grid.inches):
+            for inch_index, inch in enumerate(inches):
+                self.inch_index[machine_index, inch] = inch_index
+
+    def machine_index(self, machine):
+        """
+        機種コード配列を機種番号配列に変換
+
+        Args:
+            machine (numpy.ndarray): 機種コード（文字列）
+
+        Returns:
+            numpy.ndarray: 機種番号（無効な機種は-1）
+        """
+        codes, inverse = np.unique(machine, return_inverse=True)
+        lookup = np.array(
+            [self.grid.machines.index(code) if code in self.grid.machines else -1 for code in codes], dtype=np.int64
+        )
+        return lookup[inverse.reshape(-1)]
+
+
+# 直近に使用した参照テーブルのビュー（ルールファイルの読み込み直しで参照テーブルが変わると作り直す）
+_grid_arrays = None
+
+
+def grid_arrays(grid=None):
+    """
+    参照テーブルのNumPyビューの取得
+
+    Args:
+        grid (LookupGrid): 参照テーブル（省略時は現在の参照テーブル）
+
+    Returns:
+        GridArrays: NumPyビュー
+    """
+    global _grid_arrays
+    grid = grid or current_grid()
+    arrays = _grid_arrays
+    if arrays is None or arrays.grid is not grid:
+        arrays = _grid_arrays = GridArrays(grid)
+    return arrays
+
+
+def compute_arrays(machine, shelf_count, inch, height, grid=None):
+    """
+    検査表の一括計算
+
+    入力不正（未知の機種、機種にないインチ数、最小値未満または刻みに合わない高さ、
+    絶対値がGridArrays.max_shelf_countを超える棚数）やB値が定義されない組み合わせの行は、
+    valid=Falseとなり出力値はNaNになります。
+
+    Args:
+        machine (array_like): 機種コード（"200"などの文字列、または整数）
+        shelf_count (array_like): 棚数
+        inch (array_like): インチ数
+        height (array_like): 高さ(mm)
+        grid (LookupGrid): 参照テーブル（省略時は現在の参照テーブル。入力の検証と同じものを使う場合に指定）
+
+    Returns:
+        dict: 列名をキーとしたfloat64配列（RESULT_COLUMNS）と、bool配列"valid"
+    """
+    grid = grid_arrays(grid)
+    min_height = grid.grid.min_height
+    height_resolution = grid.grid.height_resolution
+    machine = np.asarray(machine).astype(str)
+    shelf_count = np.asarray(shelf_count, dtype=np.int64)
+    inch = np.asarray(inch, dtype=np.int64)
+    height = np.asarray(height, dtype=np.int64)
+
+    # 機種番号・インチ番号・高さ段からセル番号を求める
+    machine_index = grid.machine_index(machine)
+    inch_in_range = (inch >= 0) & (inch < grid.inch_index.shape[1])
+    inch_index = np.where(
+        (machine_index >= 0) & inch_in_range,
+        grid.inch_index[np.maximum(machine_index, 0), np.where(inch_in_range, inch, 0)],
+        -1,
+    )
+    # 無効な行は先頭のセルを参照させ、最後にvalidで除外する
+    machine_index = np.maximum(machine_index, 0)
+    step = np.clip((height - min_height) // height_resolution, 0, grid.grid.n_steps - 1)
+    cell = (machine_index * grid.grid.n_inches + np.maximum(inch_index, 0)) * grid.grid.n_steps + step
+
+    ring_count = grid.ring[cell]
+    chain_data = grid.chain_data[machine_index]
+    data1 = grid.data1[machine_index]
+
+    # A値の計算
+    A = ((shelf_count * ring_count - data1) / 2 * chain_data) + 60
+    A1 = (shelf_count * ring_count - data1) / 2 * chain_data
+
+    # B値の計算（項の順序はスカラー版と同じ）
+    b_mode = grid.b_mode[cell]
+    terms = grid.b_terms[cell]
+    b_chain = A - terms[:, 0] - terms[:, 1] - terms[:, 2] - terms[:, 3] - terms[:, 4]
+    B = np.where(b_mode == B_MODE_FIXED, grid.b_base[cell], np.where(b_mode == B_MODE_CHAIN, b_chain, np.nan))
+
+    ST = A1 - grid.st[machine_index]
+
+    # 入力値の検証
+    valid = (
+        (inch_index >= 0)
+        & (shelf_count >= -grid.max_shelf_count)
+        & (shelf_count <= grid.max_shelf_count)
+        & (height >= min_height)
+        & ((height - min_height) % height_resolution == 0)
+        & ~np.isnan(B)
+    )
+
+    # 出力値が0以下の場合は0に設定
+    results = {
+        "ring_count": ring_count.astype(np.float64),
+        "A": np.maximum(0, A),
+        "A1": A1,
+        "B": np.maximum(0, B),
+        "C": np.maximum(0, grid.c[cell]).astype(np.float64),
+        "D": np.maximum(0, grid.d[cell]).astype(np.float64),
+        "H": np.maximum(0, grid.h[cell]).astype(np.float64),
+        "ST": np.maximum(0, ST),
+    }
+    for column, values in grid.end_frame.items():
+        results[column] = values[machine_index]
+    for column in RESULT_COLUMNS:
+        results[column][~valid] = np.nan
+    results["valid"] = valid
+    return results
@@ -0,0 +1,247 @@
+"""
+Word文書のキー文字列置換
+
+キー文字列と置換後の文字列の対応（辞書）を受け取り、文書を1回だけ走査して
+本文、表、テキストボックス・図形、ヘッダー、フッターのキー文字列をまとめて置換します。
+保存も1回だけです。
+
+段落ごとにテキストを連結して照合するため、Wordが複数のrunに分割したキー文字列も置換できます。
+"""
+
+import os
+import re
+from bisect import bisect_right
+from datetime import datetime
+
+# 名前空間
+W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+A_NS = "http://schemas.openxmlformats.org/drawingml/2006/main"
+MC_NS = "http://schemas.openxmlformats.org/markup-compatibility/2006"
+XML_NS = "http://www.w3.org/XML/1998/namespace"
+RELATIONSHIP_TYPE_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+
+# 段落とテキスト要素のタグ（WordprocessingML、DrawingML）
+_TEXT_TAGS = (
+    (f"{{{W_NS}}}p", f"{{{W_NS}}}t"),
+    (f"{{{A_NS}}}p", f"{{{A_NS}}}t"),
+)
+
+# 旧形式のWord向けの代替表示（テキストボックスの複製）。置換はするが回数には数えない
+_FALLBACK_TAG = f"{{{MC_NS}}}Fallback"
+
+_XML_SPACE = f"{{{XML_NS}}}space"
+
+# 本文以外で置換対象とするパート（python-docxのRELATIONSHIP_TYPEと同じ値）
+STORY_RELATIONSHIPS = tuple(
+    f"{RELATIONSHIP_TYPE_NS}/{name}" for name in ("header", "footer", "footnotes", "endnotes")
+)
+
+# 検査表（check2.docx）のキー文字列
+INSPECTION_KEY = "検査対象情報"
+
+
+def compile_placeholders(mapping):
+    """
+    キー文字列の照合パターンを作成
+
+    長いキー文字列を優先します（"日付"と"日付2"がある場合は"日付2"に一致）。
+
+    Args:
+        mapping (dict): キー文字列 → 置換後の文字列
+
+    Returns:
+        re.Pattern: すべてのキー文字列のいずれかに一致するパターン
+    """
+    keys = sorted((key for key in mapping if key), key=len, reverse=True)
+    if not keys:
+        raise ValueError("置換対象のキー文字列がありません")
+    return re.compile("|".join(re.escape(key) for key in keys))
+
+
+def inspection_replacements(order, manufacturing):
+    """
+    検査表のキー文字列と置換後の文字列
+
+    Args:
+        order (str): 受注番号
+        manufacturing (str): 製造番号
+
+    Returns:
+        dict: キー文字列 → 置換後の文字列（"受注番号/製造番号"）
+    """
+    return {INSPECTION_KEY: f"{order}/{manufacturing}"}
+
+
+def replace_in_element(root, mapping, pattern=None, counts=None):
+    """
+    XML要素以下のキー文字列を置換
+
+    Args:
+        root: lxmlの要素（document.xml、header1.xmlなどのルート）
+        mapping (dict): キー文字列 → 置換後の文字列
+        pattern (re.Pattern): compile_placeholders(mapping)の結果（省略時は作成）
+        counts (dict): キー文字列ごとの置換回数（加算される。省略時は集計しない）
+
+    Returns:
+        int: 置換した箇所の数（回数に数えない代替表示を含む。0なら要素は変更されていない）
+    """
+    if pattern is None:
+        pattern = compile_placeholders(mapping)
+    if counts is None:
+        counts = dict.fromkeys(mapping, 0)
+
+    replaced = 0
+    for paragraph_tag, text_tag in _TEXT_TAGS:
+        for paragraph in root.iter(paragraph_tag):
+            # 一致しない段落は連結文字列の照合だけで読み飛ばす
+            if not pattern.search("".join(text.text or "" for text in paragraph.iter(text_tag))):
+                continue
+            # テキストボックス内の段落は別の段落として処理するため除外する
+            texts = [text for text in paragraph.iter(text_tag) if next(text.iterancestors(paragraph_tag)) is paragraph]
+            counted = next(paragraph.iterancestors(_FALLBACK_TAG), None) is None
+            replaced += _replace_in_texts(texts, mapping, pattern, counts if counted else None)
+
+    return replaced
+
+
+def _replace_in_texts(texts, mapping, pattern, counts):
+    """
+    1段落分のテキスト要素のキー文字列を置換
+
+    複数の要素にまたがる一致は、先頭の要素に置換後の文字列を入れ、残りの要素から一致部分を削除します。
+
+    Returns:
+        int: 置換した箇所の数
+    """
+    values = [text.text or "" for text in texts]
+    starts = []
+    position = 0
+    for value in values:
+        starts.append(position)
+        position += len(value)
+
+    matches = list(pattern.finditer("".join(values)))
+    if not matches:
+        return 0
+
+    # 後ろの一致から置換し、前の一致の位置がずれないようにする
+    for match in reversed(matches):
+        start, end = match.span()
+        replacement = mapping[match.group()]
+        first = bisect_right(starts, start) - 1
+        last = bisect_right(starts, end - 1) - 1
+        if first == last:
+            value = values[first]
+            values[first] = value[: start - starts[first]] + replacement + value[end - starts[first] :]
+        else:
+            values[first] = values[first][: start - starts[first]] + replacement
+            for index in range(first + 1, last):
+                values[index] = ""
+            values[last] = values[last][end - starts[last] :]
+        if counts is not None:
+            counts[match.group()] += 1
+
+    for text, value in zip(texts, values):
+        if text.text != value:
+            text.text = value
+            if value != value.strip():
+                text.set(_XML_SPACE, "preserve")
+
+    return len(matches)
+
+
+def iter_story_elements(doc):
+    """
+    置換対象のXML要素（本文、ヘッダー、フッター、脚注、文末脚注）
+
+    Args:
+        doc (docx.Document): Word文書
+
+    Yields:
+        lxmlの要素
+    """
+    yield doc.element
+    seen = set()
+    for rel in doc.part.rels.values():
+        if rel.is_external or rel.reltype not in STORY_RELATIONSHIPS:
+            continue
+        part = rel.target_part
+        element = getattr(part, "element", None)
+        if element is None or id(part) in seen:
+            continue
+        seen.add(id(part))
+        yield element
+
+
+def replace_placeholders(doc, mapping):
+    """
+    Word文書のキー文字列をまとめて置換
+
+    Args:
+        doc (docx.Document): Word文書
+        mapping (dict): キー文字列 → 置換後の文字列
+
+    Returns:
+        dict: キー文字列ごとの置換回数
+    """
+    pattern = compile_placeholders(mapping)
+    counts = dict.fromkeys(mapping, 0)
+    for element in iter_story_elements(doc):
+        replace_in_element(element, mapping, pattern, counts)
+    return counts
+
+
+def processed_path(file_path):
+    """
+    処理済みファイルのパスを生成（タイムスタンプ付き）
+
+    Args:
+        file_path (str): 元ファイル
+
+    Returns:
+        str: "<元ファイル名>_processed_<日時><拡張子>"
+    """
+    base_name, extension = os.path.splitext(file_path)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return f"{base_name}_processed_{timestamp}{extension}"
+
+
+def order_processed_path(file_path, order, manufacturing):
+    """
+    受注ごとの処理済みファイルのパスを生成（受注番号・製造番号とマイクロ秒までのタイムスタンプ付き）
+
+    同じ秒に登録した受注でも出力ファイルが重ならないため、ジョブ（出力ファイルごとに1件）が別になります。
+
+    Args:
+        file_path (str): 元ファイル
+        order (str): 受注番号（検証済み。ファイル名に使用できる文字のみ）
+        manufacturing (str): 製造番号（同上）
+
+    Returns:
+        str: "<元ファイル名>_processed_<受注番号>_<製造番号>_<日時><拡張子>"
+    """
+    base_name, extension = os.path.splitext(file_path)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    return f"{base_name}_processed_{order}_{manufacturing}_{timestamp}{extension}"
+
+
+def fill_word_file(file_path, mapping, output_path=None):
+    """
+    Wordファイルのキー文字列をまとめて置換し、新しいファイルとして1回だけ保存
+
+    Args:
+        file_path (str): 元ファイル（.docx）
+        mapping (dict): キー文字列 → 置換後の文字列
+        output_path (str): 出力ファイル（省略時はprocessed_path(file_path)）
+
+    Returns:
+        tuple: (キー文字列ごとの置換回数, 出力ファイル)
+    """
+    from docx import Document
+
+    doc = Document(file_path)
+    counts = replace_placeholders(doc, mapping)
+    if output_path is None:
+        output_path = processed_path(file_path)
+    doc.save(output_path)
+    return counts, output_path
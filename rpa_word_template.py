@@ -0,0 +1,410 @@
+"""
+Word文書テンプレートのコンパイル（大量の受注の差し込み用）
+
+check2.docxなどのテンプレートを一度だけ解析し、キー文字列の位置（run分割されたものを含む）を
+記録した「コンパイル済みテンプレート」を作成します。差し込み時はキー文字列の検索もXMLの解析も行わず、
+記録した位置に値を埋め込んだパートと、元のまま圧縮済みデータをコピーしたパートから.docxを出力します。
+
+コンパイル結果はテンプレートと同じフォルダーにキャッシュし（.<テンプレート名>.rpatpl.json）、
+テンプレートの内容（SHA-256）が変わると自動的に作り直します。
+
+使用方法:
+    python rpa_word_template.py check2.docx orders.csv -o output
+    （orders.csvの列: 受注番号,製造番号）
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import time
+import zipfile
+from html import escape
+
+from lxml import etree
+
+from rpa_docx_patch import copy_compressed, may_contain, new_part_info, placeholder_needles, story_part_names
+from rpa_logging import setup_logging
+from rpa_metrics import stage, start_exporter
+from rpa_word import W_NS, XML_NS, compile_placeholders, inspection_replacements, replace_in_element
+
+logger = logging.getLogger(__name__)
+
+# キャッシュファイルの形式のバージョン（形式を変えたら上げる）
+CACHE_VERSION = 1
+CACHE_SUFFIX = ".rpatpl.json"
+
+# 一括差し込みの入力ファイルの列
+ORDER_COLUMNS = ["受注番号", "製造番号"]
+
+# コンパイル時にキー文字列の位置へ埋め込む目印（Unicodeの私用領域の文字）
+_MARK_START = "\ue000"
+_MARK_END = "\ue001"
+_MARK_RE = re.compile(f"{_MARK_START}(\\d+){_MARK_END}")
+
+_W_T = f"{{{W_NS}}}t"
+_XML_SPACE = f"{{{XML_NS}}}space"
+
+# ファイル名に使用できない文字
+_UNSAFE_FILENAME_RE = re.compile(r'[\\/:*?"<>|\s]')
+
+_HASH_BLOCK_SIZE = 1024 * 1024
+
+# 処理時間の計測（テンプレートの取得、コンパイル時のパート全体の置換、差し込み、.docxの出力）
+_TEMPLATE_LOAD = stage("template_load", kind="word")
+_XML_REPLACE = stage("xml_replace", kind="word")
+_RUN_REPLACE = stage("run_replace", kind="word")
+_SAVE = stage("save", kind="word")
+
+
+def file_digest(path):
+    """
+    ファイル内容のSHA-256
+
+    Args:
+        path (str): ファイル
+
+    Returns:
+        str: 16進数のハッシュ値
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(_HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_path(template_path):
+    """
+    コンパイル済みテンプレートのキャッシュファイル
+
+    Args:
+        template_path (str): テンプレート
+
+    Returns:
+        str: テンプレートと同じフォルダーの ".<テンプレート名>.rpatpl.json"
+    """
+    directory, name = os.path.split(template_path)
+    return os.path.join(directory, f".{name}{CACHE_SUFFIX}")
+
+
+class WordTemplate:
+    """
+    コンパイル済みのWordテンプレート
+
+    キー文字列を含むパートは、固定部分（バイト列）とキー番号が交互に並んだリストとして保持します。
+    """
+
+    def __init__(self, path, digest, keys, counts, parts):
+        """
+        Args:
+            path (str): テンプレート
+            digest (str): コンパイル時のテンプレートのSHA-256
+            keys (list): キー文字列（キー番号の順）
+            counts (dict): キー文字列ごとの出現回数（差し込み時の置換回数）
+            parts (dict): パート名 → [固定部分, キー番号, 固定部分, ..., 固定部分]
+        """
+        self.path = path
+        self.digest = digest
+        self.keys = keys
+        self.counts = counts
+        self.parts = parts
+
+    # ==================== コンパイル・キャッシュ ====================
+
+    @classmethod
+    def compile(cls, path, keys, digest=None):
+        """
+        テンプレートのコンパイル
+
+        Args:
+            path (str): テンプレート（.docx）
+            keys: キー文字列
+            digest (str): テンプレートのSHA-256（計算済みの場合）
+
+        Returns:
+            WordTemplate: コンパイル済みテンプレート
+        """
+        if digest is None:
+            digest = file_digest(path)
+        keys = list(dict.fromkeys(keys))
+        markers = {key: f"{_MARK_START}{number}{_MARK_END}" for number, key in enumerate(keys)}
+        pattern = compile_placeholders(markers)
+        needles = placeholder_needles(keys)
+        counts = dict.fromkeys(keys, 0)
+        parts = {}
+
+        with _XML_REPLACE.time(), zipfile.ZipFile(path) as source:
+            for name in sorted(story_part_names(source)):
+                data = source.read(name)
+                if _MARK_START.encode("utf-8") in data:
+                    raise ValueError(f"{name} にテンプレートで使用できない文字（U+E000）が含まれています")
+                if not may_contain(data, needles):
+                    continue
+                root = etree.fromstring(data)
+                if not replace_in_element(root, markers, pattern, counts):
+                    continue
+                # 差し込む値の前後の空白が消えないようにする
+                for text in root.iter(_W_T):
+                    if text.text and _MARK_START in text.text:
+                        text.set(_XML_SPACE, "preserve")
+                xml = etree.tostring(root, encoding="UTF-8", standalone=True).decode("utf-8")
+                parts[name] = _split_segments(xml)
+
+        return cls(path, digest, keys, counts, parts)
+
+    @classmethod
+    def load(cls, path, keys, use_cache=True):
+        """
+        コンパイル済みテンプレートの取得
+
+        キャッシュがあり、テンプレートの内容とキー文字列が一致すればキャッシュを使用します。
+        一致しなければコンパイルしてキャッシュを書き直します（書き込めない場合はキャッシュしない）。
+
+        Args:
+            path (str): テンプレート（.docx）
+            keys: キー文字列
+            use_cache (bool): キャッシュを使用するか
+
+        Returns:
+            WordTemplate: コンパイル済みテンプレート
+        """
+        with _TEMPLATE_LOAD.time():
+            keys = list(dict.fromkeys(keys))
+            digest = file_digest(path)
+            if use_cache:
+                template = cls._read_cache(path, digest, keys)
+                if template is not None:
+                    return template
+
+            template = cls.compile(path, keys, digest)
+            if use_cache:
+                try:
+                    template.save(cache_path(path))
+                except OSError as e:
+                    logger.warning("テンプレートのキャッシュを保存できません（無視）: %s", e)
+            return template
+
+    @classmethod
+    def _read_cache(cls, path, digest, keys):
+        """キャッシュの読み込み（無効な場合はNone）"""
+        try:
+            with open(cache_path(path), encoding="utf-8") as f:
+                cache = json.load(f)
+            if cache["version"] != CACHE_VERSION or cache["digest"] != digest or cache["keys"] != keys:
+                return None
+            parts = {
+                name: [segment if isinstance(segment, int) else segment.encode("utf-8") for segment in segments]
+                for name, segments in cache["parts"].items()
+            }
+            return cls(path, digest, keys, cache["counts"], parts)
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            return None
+
+    def save(self, cache_file):
+        """
+        コンパイル結果をキャッシュファイルに保存
+
+        Args:
+            cache_file (str): キャッシュファイル
+        """
+        cache = {
+            "version": CACHE_VERSION,
+            "digest": self.digest,
+            "keys": self.keys,
+            "counts": self.counts,
+            "parts": {
+                name: [segment if isinstance(segment, int) else segment.decode("utf-8") for segment in segments]
+                for name, segments in self.parts.items()
+            },
+        }
+        # 書き込み途中のキャッシュを読まないよう、一時ファイルに書いてから置き換える
+        temp_file = f"{cache_file}.{os.getpid()}.tmp"
+        try:
+            with open(temp_file, "w", encoding="utf-8") as f:
+                json.dump(cache, f, ensure_ascii=False)
+            os.replace(temp_file, cache_file)
+        finally:
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+
+    # ==================== 差し込み ====================
+
+    def render(self, values):
+        """
+        キー文字列の位置に値を埋め込んだパートの作成
+
+        Args:
+            values (dict): キー文字列 → 差し込む文字列
+
+        Returns:
+            dict: パート名 → XMLのバイト列
+        """
+        missing = [key for key in self.keys if key not in values]
+        if missing:
+            raise ValueError(f"差し込む値がありません: {', '.join(missing)}")
+        escaped = [escape(str(values[key]), quote=False).encode("utf-8") for key in self.keys]
+        return {
+            name: b"".join(escaped[segment] if isinstance(segment, int) else segment for segment in segments)
+            for name, segments in self.parts.items()
+        }
+
+    def fill(self, values, output_path, source=None):
+        """
+        値を差し込んだ.docxを出力
+
+        Args:
+            values (dict): キー文字列 → 差し込む文字列
+            output_path (str): 出力ファイル
+            source (zipfile.ZipFile): 開いているテンプレート（fill_manyから使用）
+
+        Returns:
+            dict: キー文字列ごとの置換回数
+        """
+        with _RUN_REPLACE.time():
+            parts = self.render(values)
+        try:
+            with _SAVE.time(), zipfile.ZipFile(output_path, "w") as target:
+                if source is None:
+                    with zipfile.ZipFile(self.path) as template:
+                        self._write(template, target, parts)
+                else:
+                    self._write(source, target, parts)
+        except BaseException:
+            if os.path.exists(output_path):
+                os.remove(output_path)
+            raise
+        return dict(self.counts)
+
+    def fill_many(self, items):
+        """
+        複数の差し込み（テンプレートは1回だけ開く）
+
+        Args:
+            items: (差し込む値の辞書, 出力ファイル) の反復
+
+        Yields:
+            str: 出力ファイル
+        """
+        with zipfile.ZipFile(self.path) as source:
+            for values, output_path in items:
+                self.fill(values, output_path, source)
+                yield output_path
+
+    def _write(self, source, target, parts):
+        """パートを出力（キー文字列を含まないパートは圧縮済みデータのままコピー）"""
+        for info in source.infolist():
+            data = parts.get(info.filename)
+            if data is None:
+                copy_compressed(source, target, info)
+            else:
+                target.writestr(new_part_info(info), data)
+
+
+def _split_segments(xml):
+    """目印で区切り、固定部分（バイト列）とキー番号のリストにする"""
+    pieces = _MARK_RE.split(xml)
+    return [int(piece) if index % 2 else piece.encode("utf-8") for index, piece in enumerate(pieces)]
+
+
+# ==================== 一括差し込み ====================
+
+
+def order_output_path(output_dir, template_path, order, manufacturing):
+    """
+    受注ごとの出力ファイル
+
+    Args:
+        output_dir (str): 出力フォルダー
+        template_path (str): テンプレート
+        order (str): 受注番号
+        manufacturing (str): 製造番号
+
+    Returns:
+        str: "<出力フォルダー>/<テンプレート名>_<受注番号>_<製造番号>.docx"
+    """
+    stem, extension = os.path.splitext(os.path.basename(template_path))
+    order = _UNSAFE_FILENAME_RE.sub("_", order)
+    manufacturing = _UNSAFE_FILENAME_RE.sub("_", manufacturing)
+    return os.path.join(output_dir, f"{stem}_{order}_{manufacturing}{extension}")
+
+
+def read_orders(orders_path, encoding="utf-8-sig"):
+    """
+    受注一覧の読み込み
+
+    Args:
+        orders_path (str): CSVファイル（受注番号,製造番号）
+        encoding (str): 文字コード
+
+    Yields:
+        tuple: (受注番号, 製造番号)
+    """
+    with open(orders_path, newline="", encoding=encoding) as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        if [column.strip() for column in header[: len(ORDER_COLUMNS)]] != ORDER_COLUMNS:
+            raise ValueError(f"ヘッダーが正しくありません（{','.join(ORDER_COLUMNS)}）: {','.join(header)}")
+        for fields in reader:
+            if not fields or not "".join(fields).strip():
+                continue
+            if len(fields) < len(ORDER_COLUMNS):
+                raise ValueError(f"{reader.line_num}行目: 列が不足しています")
+            yield fields[0].strip(), fields[1].strip()
+
+
+def fill_orders(template_path, orders, output_dir, use_cache=True):
+    """
+    受注ごとに検査表を出力
+
+    Args:
+        template_path (str): テンプレート（check2.docxなど）
+        orders: (受注番号, 製造番号) の反復
+        output_dir (str): 出力フォルダー
+        use_cache (bool): コンパイル結果のキャッシュを使用するか
+
+    Returns:
+        int: 出力したファイル数
+    """
+    template = WordTemplate.load(template_path, inspection_replacements("", ""), use_cache)
+    os.makedirs(output_dir, exist_ok=True)
+    items = (
+        (inspection_replacements(order, manufacturing), order_output_path(output_dir, template_path, order, manufacturing))
+        for order, manufacturing in orders
+    )
+    return sum(1 for _ in template.fill_many(items))
+
+
+def main(argv=None):
+    """コマンドラインからの実行"""
+    parser = argparse.ArgumentParser(description="検査表（Word）の一括差し込み")
+    parser.add_argument("template", help="テンプレート（.docx）")
+    parser.add_argument("orders", help="受注一覧のCSVファイル（受注番号,製造番号）")
+    parser.add_argument("-o", "--output-dir", default="output", help="出力フォルダー（既定: output）")
+    parser.add_argument("--encoding", default="utf-8-sig", help="受注一覧の文字コード（既定: utf-8-sig）")
+    parser.add_argument("--no-cache", action="store_true", help="コンパイル結果のキャッシュを使用しない")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    try:
+        count = fill_orders(args.template, read_orders(args.orders, args.encoding), args.output_dir, not args.no_cache)
+    except (OSError, ValueError, zipfile.BadZipFile) as e:
+        print(f"エラー: {e}", file=sys.stderr)
+        return 1
+    elapsed = time.perf_counter() - start
+
+    rate = count / elapsed if elapsed > 0 else 0.0
+    print(f"処理完了: {count}件 {elapsed:.2f}秒 {rate:,.0f}件/秒 → {args.output_dir}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    setup_logging()
+    start_exporter()
+    sys.exit(main())
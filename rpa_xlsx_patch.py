@@ -0,0 +1,228 @@
+"""
+Excelファイル（.xlsx）のセル書き込み（zipを直接処理する高速版）
+
+openpyxlでブック全体を読み込み・保存せず、書き込み先のセルがあるワークシートのパート
+（xl/worksheets/sheetN.xml）だけを書き換えます。値はインライン文字列として書き込むため、
+共有文字列（sharedStrings.xml）も変更しません。その他のパートは圧縮済みのデータのままコピーするため、
+openpyxlが対応していない機能も含めてテンプレートの内容がそのまま残ります。
+
+書き込み先のワークシートは一度だけ解析し、セルの位置に目印を入れて固定部分と差し込み位置に分割しておきます
+（コンパイル）。書き込み時は値を埋め込んで連結するだけです。
+"""
+
+import posixpath
+import re
+from html import escape
+
+from lxml import etree
+
+from rpa_docx_patch import PR_NS, copy_compressed, new_part_info
+from rpa_metrics import stage
+
+# 名前空間
+S_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+R_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+XML_NS = "http://www.w3.org/XML/1998/namespace"
+
+WORKBOOK_PART = "xl/workbook.xml"
+WORKBOOK_RELS = "xl/_rels/workbook.xml.rels"
+
+_SHEET_DATA = f"{{{S_NS}}}sheetData"
+_SHEET = f"{{{S_NS}}}sheet"
+_ROW = f"{{{S_NS}}}row"
+_CELL = f"{{{S_NS}}}c"
+_FORMULA = f"{{{S_NS}}}f"
+_VALUE = f"{{{S_NS}}}v"
+_INLINE_STRING = f"{{{S_NS}}}is"
+_TEXT = f"{{{S_NS}}}t"
+_RELATIONSHIP_ID = f"{{{R_NS}}}id"
+_XML_SPACE = f"{{{XML_NS}}}space"
+
+# コンパイル時にセルの位置へ埋め込む目印（Unicodeの私用領域の文字）
+_MARK_START = "\ue000"
+_MARK_END = "\ue001"
+_MARK_RE = re.compile(f"{_MARK_START}(\\d+){_MARK_END}")
+
+# 処理時間の計測（セルへの値の埋め込み、.xlsxの出力）
+_CELL_STAMP = stage("cell_stamp", kind="excel")
+_SAVE = stage("save", kind="excel")
+
+
+class UnsupportedCellError(ValueError):
+    """高速版で書き込めないセル（数式のセルなど）。openpyxlで処理する"""
+
+
+def sheet_part_names(source):
+    """
+    シート名とワークシートのパート名の対応
+
+    Args:
+        source (zipfile.ZipFile): .xlsx
+
+    Returns:
+        dict: シート名 → パート名（"xl/worksheets/sheet1.xml"など）
+    """
+    targets = {}
+    for rel in etree.fromstring(source.read(WORKBOOK_RELS)).iter(f"{{{PR_NS}}}Relationship"):
+        target = rel.get("Target")
+        if target.startswith("/"):
+            targets[rel.get("Id")] = target.lstrip("/")
+        else:
+            targets[rel.get("Id")] = posixpath.normpath(posixpath.join(posixpath.dirname(WORKBOOK_PART), target))
+
+    return {
+        sheet.get("name"): targets[sheet.get(_RELATIONSHIP_ID)]
+        for sheet in etree.fromstring(source.read(WORKBOOK_PART)).iter(_SHEET)
+        if sheet.get(_RELATIONSHIP_ID) in targets
+    }
+
+
+class CellPatch:
+    """
+    コンパイル済みのセル書き込み
+
+    書き込み先のワークシートを、固定部分（バイト列）とセル番号が交互に並んだリストとして保持します。
+    """
+
+    def __init__(self, slots, parts):
+        """
+        Args:
+            slots (list): (シート名, セル番地)（セル番号の順）
+            parts (dict): パート名 → [固定部分, セル番号, 固定部分, ..., 固定部分]
+        """
+        self.slots = slots
+        self.parts = parts
+
+    @classmethod
+    def compile(cls, source, cells):
+        """
+        書き込み先のワークシートのコンパイル
+
+        テンプレートにないシートは無視します。
+
+        Args:
+            source (zipfile.ZipFile): テンプレート（.xlsx）
+            cells (dict): シート名 → セル番地のリスト
+
+        Returns:
+            CellPatch: コンパイル済みのセル書き込み
+
+        Raises:
+            UnsupportedCellError: 数式のセル、行番号・セル番地が省略されたワークシートの場合
+        """
+        sheet_parts = sheet_part_names(source)
+        slots = []
+        parts = {}
+        for sheet_name, coordinates in cells.items():
+            part_name = sheet_parts.get(sheet_name)
+            if part_name is None:
+                continue
+            data = source.read(part_name)
+            if _MARK_START.encode("utf-8") in data:
+                raise UnsupportedCellError(f"{sheet_name} に使用できない文字（U+E000）が含まれています")
+            root = etree.fromstring(data)
+            sheet_data = root.find(_SHEET_DATA)
+            for coordinate in coordinates:
+                cell = _get_or_add_cell(sheet_data, coordinate, sheet_name)
+                _set_inline_string(cell, f"{_MARK_START}{len(slots)}{_MARK_END}", sheet_name)
+                slots.append((sheet_name, coordinate))
+            xml = etree.tostring(root, encoding="UTF-8", standalone=True).decode("utf-8")
+            pieces = _MARK_RE.split(xml)
+            parts[part_name] = [int(piece) if index % 2 else piece.encode("utf-8") for index, piece in enumerate(pieces)]
+        return cls(slots, parts)
+
+    @property
+    def sheet_names(self):
+        """書き込み先のシート名"""
+        return list(dict.fromkeys(sheet_name for sheet_name, _ in self.slots))
+
+    def render(self, values):
+        """
+        値を埋め込んだワークシートの作成
+
+        Args:
+            values (dict): シート名 → {セル番地: 書き込む文字列}
+
+        Returns:
+            dict: パート名 → XMLのバイト列
+        """
+        escaped = []
+        for sheet_name, coordinate in self.slots:
+            try:
+                value = values[sheet_name][coordinate]
+            except KeyError:
+                raise ValueError(f"{sheet_name}!{coordinate} に書き込む値がありません") from None
+            escaped.append(escape("" if value is None else str(value), quote=False).encode("utf-8"))
+        return {
+            name: b"".join(escaped[segment] if isinstance(segment, int) else segment for segment in segments)
+            for name, segments in self.parts.items()
+        }
+
+    def write(self, source, target, values):
+        """
+        値を書き込んだ.xlsxを出力
+
+        Args:
+            source (zipfile.ZipFile): テンプレート
+            target (zipfile.ZipFile): 出力先（書き込みモード）
+            values (dict): シート名 → {セル番地: 書き込む文字列}
+        """
+        with _CELL_STAMP.time():
+            parts = self.render(values)
+        with _SAVE.time():
+            for info in source.infolist():
+                data = parts.get(info.filename)
+                if data is None:
+                    copy_compressed(source, target, info)
+                else:
+                    target.writestr(new_part_info(info), data)
+
+
+def _get_or_add_cell(sheet_data, coordinate, sheet_name):
+    """セル要素の取得（なければ行・列の順を保って追加）"""
+    # openpyxlの読み込みには時間がかかるため、コンパイル時に読み込む
+    from openpyxl.utils.cell import column_index_from_string, coordinate_from_string
+
+    column_letter, row_number = coordinate_from_string(coordinate)
+    column_number = column_index_from_string(column_letter)
+
+    row = None
+    for candidate in sheet_data.iterchildren(_ROW):
+        number = candidate.get("r")
+        if number is None:
+            raise UnsupportedCellError(f"{sheet_name} の行番号が省略されています")
+        if int(number) == row_number:
+            row = candidate
+            break
+        if int(number) > row_number:
+            row = etree.Element(_ROW, r=str(row_number))
+            candidate.addprevious(row)
+            break
+    if row is None:
+        row = etree.SubElement(sheet_data, _ROW, r=str(row_number))
+
+    for candidate in row.iterchildren(_CELL):
+        reference = candidate.get("r")
+        if reference is None:
+            raise UnsupportedCellError(f"{sheet_name} のセル番地が省略されています")
+        number = column_index_from_string(coordinate_from_string(reference)[0])
+        if number == column_number:
+            return candidate
+        if number > column_number:
+            cell = etree.Element(_CELL, r=coordinate)
+            candidate.addprevious(cell)
+            return cell
+    return etree.SubElement(row, _CELL, r=coordinate)
+
+
+def _set_inline_string(cell, text, sheet_name):
+    """セルの値をインライン文字列にする（書式は元のまま）"""
+    if cell.find(_FORMULA) is not None:
+        raise UnsupportedCellError(f"{sheet_name}!{cell.get('r')} は数式のセルです")
+    for child in cell.findall(_VALUE) + cell.findall(_INLINE_STRING):
+        cell.remove(child)
+    cell.set("t", "inlineStr")
+    inline_string = etree.Element(_INLINE_STRING)
+    etree.SubElement(inline_string, _TEXT).text = text
+    inline_string[0].set(_XML_SPACE, "preserve")
+    cell.insert(0, inline_string)
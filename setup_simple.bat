@@ -2,7 +2,7 @@
 echo RPAシステム用のパッケージをインストールしています...
 
 REM 必要なパッケージのインストール
-pip install pandas openpyxl pyautogui pyperclip pillow
+pip install pandas numpy openpyxl pyautogui pyperclip pillow
 
 echo.
 echo インストールが完了しました！
@@ -3,7 +3,7 @@
 echo "RPAシステム用のパッケージをインストールしています..."
 
 # 必要なパッケージのインストール
-pip install pandas openpyxl pyautogui pyperclip pillow
+pip install pandas numpy openpyxl pyautogui pyperclip pillow
 
 echo ""
 echo "インストールが完了しました！"